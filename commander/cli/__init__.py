@@ -1,16 +1,63 @@
+"""
+The `carter` CLI.
+
+Subcommands are only imported once invoked, so that no subcommand pays for
+the dependencies of the others. See `carter --import-profile`.
+"""
+import sys
 from pathlib import Path
+from typing import Optional
 
 import click
-from mkdocs.__main__ import serve_command as docs
 
-from commander.cli.simexp_base import SimulationExperimentCommand, simexp_command
-from commander.cli.tensorboard import tensorboard
+from commander.cli.constants import SimulationExperimentCommand
+from commander.cli.lazy import LazyGroup
 from commander.log import setup_logging
 
-docs.name = "docs"
+# Subcommands that use the compiled integration kernels
+WARM_UP_COMMANDS = (SimulationExperimentCommand.SIMULATE.value,)
+
+
+def _prepare_subcommand(ctx: click.Context, cmd_name: str) -> None:
+    """
+    Runs before the module of an invoked subcommand is imported, such that the
+    compilation cache applies to all kernels and the warm-up overlaps the slow imports.
+    """
+    numba_cache_dir: Optional[Path] = ctx.params["numba_cache_dir"]
+
+    if numba_cache_dir is not None:
+        from commander.integration import set_cache_dir
+
+        set_cache_dir(numba_cache_dir)
+
+    if cmd_name in WARM_UP_COMMANDS:
+        from commander.integration import warm_up_in_background
+        from commander.ml.configurations import DeepPILCOConfiguration, physical_params
+
+        # The configuration `simulate` makes its agents from
+        warm_up_in_background(physical_params(DeepPILCOConfiguration["agent"]))
+
+
+def _profile_imports(ctx: click.Context, param: click.Parameter, value: bool) -> None:
+    if not value or ctx.resilient_parsing:
+        return
+
+    from commander.cli.import_profile import profile_imports
 
+    ctx.exit(profile_imports([arg for arg in sys.argv[1:] if arg != param.opts[0]]))
 
-@click.group()
+
+@click.group(
+    cls=LazyGroup,
+    prepare_subcommand=_prepare_subcommand,
+    lazy_subcommands={
+        "tensorboard": "commander.cli.tensorboard:tensorboard",
+        SimulationExperimentCommand.SIMULATE.value: "commander.cli.simexp_base:simulate",
+        SimulationExperimentCommand.EXPERIMENT.value: "commander.cli.simexp_base:experiment",
+        "docs": "commander.cli.docs:docs",
+        "bench": "commander.cli.bench:bench",
+    },
+)
 @click.pass_context
 @click.option(
     "-o",
@@ -24,7 +71,23 @@ docs.name = "docs"
     is_flag=True,
     default=False
 )
-def cli(ctx: click.Context, output_dir: Path, verbose: bool) -> None:
+@click.option(
+    "--numba-cache-dir",
+    type=click.Path(file_okay=False, path_type=Path, writable=True, readable=True),
+    default=None,
+    help="Directory for the persistent compilation cache of the integration kernels.",
+)
+@click.option(
+    "--import-profile",
+    is_flag=True,
+    is_eager=True,
+    expose_value=False,
+    callback=_profile_imports,
+    help="Run the command with an import-time breakdown of the modules it loads.",
+)
+def cli(
+    ctx: click.Context, output_dir: Path, verbose: bool, numba_cache_dir: Optional[Path]
+) -> None:
     ctx.ensure_object(dict)
     ctx.obj["output_dir"] = output_dir
     ctx.obj["verbose"] = verbose
@@ -35,12 +98,6 @@ def cli(ctx: click.Context, output_dir: Path, verbose: bool) -> None:
     setup_logging(command=global_ctx.invoked_subcommand, debug=verbose)
 
 
-cli.add_command(tensorboard)
-cli.add_command(simexp_command(SimulationExperimentCommand.SIMULATE))
-cli.add_command(simexp_command(SimulationExperimentCommand.EXPERIMENT))
-cli.add_command(docs)
-
-
 def run() -> None:
     cli(obj={})
 
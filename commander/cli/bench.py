@@ -0,0 +1,89 @@
+import datetime as dt
+import logging
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from commander.integration import IntegratorOptions
+from commander.integration.benchmark import (
+    BENCHMARK_CONFIGURATIONS,
+    format_report,
+    run_benchmarks,
+    write_report,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@click.group()
+def bench() -> None:
+    """
+    Benchmarks of the simulation.
+    """
+
+
+@bench.command()
+@click.pass_context
+@click.option(
+    "-c",
+    "--configuration",
+    "configurations",
+    type=click.Choice(list(BENCHMARK_CONFIGURATIONS), case_sensitive=False),
+    multiple=True,
+    default=tuple(BENCHMARK_CONFIGURATIONS),
+)
+@click.option(
+    "-i",
+    "--integrator",
+    "integrators",
+    type=click.Choice([_.value for _ in IntegratorOptions], case_sensitive=False),
+    multiple=True,
+    default=tuple(_.value for _ in IntegratorOptions),
+)
+@click.option(
+    "-r",
+    "--resolution",
+    "resolutions",
+    type=int,
+    multiple=True,
+    default=(2,),
+    help="Substeps per step for the fixed-step integrators.",
+)
+@click.option("-d", "--duration", type=float, default=10.0, help="Simulated time in seconds.")
+@click.option("--seed", type=int, default=0)
+@click.option(
+    "-f",
+    "--file",
+    type=click.Path(dir_okay=False, path_type=Path, writable=True),
+    default=None,
+    help="JSON file to write the results to.",
+)
+def integrators(
+    ctx: click.Context,
+    configurations: tuple[str, ...],
+    integrators: tuple[str, ...],
+    resolutions: tuple[int, ...],
+    duration: float,
+    seed: int,
+    file: Optional[Path],
+) -> None:
+    """
+    Compares the accuracy and throughput of the integrators.
+    """
+    if file is None:
+        timestamp = dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+        file = ctx.obj["output_dir"] / "benchmarks" / f"integrators_{timestamp}.json"
+
+    report = run_benchmarks(
+        configurations=configurations,
+        integrators=[IntegratorOptions(integrator) for integrator in integrators],
+        resolutions=resolutions,
+        duration=duration,
+        seed=seed,
+    )
+
+    write_report(report, file)
+
+    click.echo(format_report(report))
+    logger.info(f"Wrote benchmark results to: {file}")
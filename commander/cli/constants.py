@@ -0,0 +1,12 @@
+"""
+Contains constants for the CLI, which are kept apart from the subcommands
+so they can be used without importing them.
+"""
+
+from enum import Enum, unique
+
+
+@unique
+class SimulationExperimentCommand(str, Enum):
+    EXPERIMENT = "experiment"
+    SIMULATE = "simulate"
@@ -0,0 +1,5 @@
+from mkdocs.__main__ import serve_command as docs
+
+docs.name = "docs"
+
+__all__ = ("docs",)
@@ -0,0 +1,87 @@
+"""
+Contains the import-time breakdown of `carter --import-profile`.
+"""
+
+import subprocess
+import sys
+from collections.abc import Sequence
+from typing import NamedTuple
+
+import click
+
+IMPORT_TIME_PREFIX = "import time:"
+
+
+class ImportTime(NamedTuple):
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_import_time(line: str) -> ImportTime:
+    """
+    Parses a line of the output of `python -X importtime`, e.g.
+
+        import time:       267 |       3262 |   serial
+    """
+    self_us, cumulative_us, module = line[len(IMPORT_TIME_PREFIX) :].split("|")
+    name = module.rstrip()
+
+    # Nested imports are indented by two spaces per level after the first
+    depth = (len(name) - len(name.lstrip()) - 1) // 2
+
+    return ImportTime(name.strip(), depth, int(self_us), int(cumulative_us))
+
+
+def format_import_times(import_times: Sequence[ImportTime], limit: int = 25) -> str:
+    """
+    Tabulates the top-level imports taking the longest, cumulatively.
+    """
+    top_level = sorted(
+        (import_time for import_time in import_times if import_time.depth == 0),
+        key=lambda import_time: import_time.cumulative_us,
+        reverse=True,
+    )
+    total_us = sum(import_time.cumulative_us for import_time in top_level)
+
+    lines = [f"{'cumulative [ms]':>16} {'self [ms]':>10}  module"]
+    for import_time in top_level[:limit]:
+        lines.append(
+            f"{import_time.cumulative_us / 1000:16.1f} {import_time.self_us / 1000:10.1f}"
+            f"  {import_time.module}"
+        )
+
+    lines.append(f"{total_us / 1000:16.1f} {'':>10}  total of {len(import_times)} modules")
+
+    return "\n".join(lines)
+
+
+def profile_imports(args: Sequence[str]) -> int:
+    """
+    Runs the CLI with `args` in a new interpreter with `-X importtime`, printing the
+    import-time breakdown once it exits. Returns its exit code.
+
+    Imports done by the subcommand are included, so use `--help` to only profile startup.
+    """
+    process = subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-c", "from commander.cli import run; run()", *args],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    assert process.stderr is not None
+
+    import_times = []
+    for line in process.stderr:
+        if line.startswith(IMPORT_TIME_PREFIX):
+            # The header is the only line which is not a number of microseconds
+            if "self [us]" not in line:
+                import_times.append(parse_import_time(line))
+        else:
+            sys.stderr.write(line)
+
+    returncode = process.wait()
+
+    click.echo(format_import_times(import_times), err=True)
+
+    return returncode
@@ -0,0 +1,66 @@
+"""
+Contains a click group which imports its subcommands only when they are invoked.
+"""
+
+import importlib
+from typing import Any, Callable, Optional
+
+import click
+
+
+class LazyGroup(click.Group):
+    """
+    Group whose subcommands are given as import paths of the form 'module:attribute'.
+
+    A subcommand module, with all of its dependencies, is only imported once the
+    subcommand is invoked or its help is shown. Listing the subcommands in the help
+    of the group imports all of them.
+
+    `prepare_subcommand` is called with the context of the group and the name of an
+    invoked lazy subcommand before its module is imported. Note that the callback of
+    the group itself only runs once the module has been imported.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        lazy_subcommands: Optional[dict[str, str]] = None,
+        prepare_subcommand: Optional[Callable[[click.Context, str], None]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+
+        self.lazy_subcommands = lazy_subcommands or {}
+        self.prepare_subcommand = prepare_subcommand
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted([*super().list_commands(ctx), *self.lazy_subcommands])
+
+    def resolve_command(
+        self, ctx: click.Context, args: list[str]
+    ) -> tuple[Optional[str], Optional[click.Command], list[str]]:
+        # Only called for invoked subcommands, unlike `get_command`
+        if (
+            self.prepare_subcommand is not None
+            and not ctx.resilient_parsing
+            and args
+            and args[0] in self.lazy_subcommands
+        ):
+            self.prepare_subcommand(ctx, args[0])
+
+        return super().resolve_command(ctx, args)
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name in self.lazy_subcommands:
+            return self._load(cmd_name)
+
+        return super().get_command(ctx, cmd_name)
+
+    def _load(self, cmd_name: str) -> click.Command:
+        module_name, attribute = self.lazy_subcommands[cmd_name].split(":")
+        command = getattr(importlib.import_module(module_name), attribute)
+
+        if not isinstance(command, click.Command):
+            raise TypeError(f"Lazy subcommand {cmd_name} is not a click command: {command}")
+
+        return command
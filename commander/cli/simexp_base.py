@@ -1,19 +1,16 @@
 import logging
 from enum import Enum, unique
-from typing import Any, Type, Union
+from typing import Any, Optional, Type, Union
 
 import numpy as np
 
 import click
-import matplotlib.pyplot as plt
 import stable_baselines3
-import yappi
 from click.core import Command
-from matplotlib import animation
-from matplotlib.animation import FFMpegWriter
-from serial.tools import list_ports
 from stable_baselines3.common.callbacks import BaseCallback, EvalCallback
 
+from commander.cli.constants import SimulationExperimentCommand
+from commander.integration import IntegratorOptions
 from commander.ml.agent import (
     AgentSwingupGoalMixin,
     AgentTimeGoalMixin,
@@ -34,26 +31,23 @@ from commander.ml.configurations import (
     ExperimentAgentConfiguration,
     SimulatedAgentConfiguration,
 )
+from commander.ml.constants import InfoLevel
 from commander.ml.environment import (
     ExperimentalCartpoleEnv,
     SimulatedCartpoleEnv,
     get_sb3_env_root_env,
     make_sb3_env,
 )
+from commander.ml.recording import FFmpegRecorder
 from commander.ml.tensorboard import GeneralCarterCallback
 from commander.ml.utils import restore_step, vectorise_observations
+from commander.network.constants import ParserMode
 
 SAVE_NAME_BASE: str = "carter_simulation_"
 
 logger = logging.getLogger(__name__)
 
 
-@unique
-class SimulationExperimentCommand(str, Enum):
-    EXPERIMENT = "experiment"
-    SIMULATE = "simulate"
-
-
 @unique
 class Algorithm(str, Enum):
     # Note: Not all of these actually work with our action space and multiple agents
@@ -108,12 +102,29 @@ def simexp_command(command: SimulationExperimentCommand) -> Command:
     @click.pass_context
     @click.option("-p", "--port", type=str, default="AUTODETECT")
     @click.option("--baudrate", type=int, default=115200)
+    @click.option(
+        "--parser-mode",
+        type=click.Choice([_.value for _ in ParserMode], case_sensitive=False),
+        default=ParserMode.BUFFERED,
+        help="How packets from the experiment are read from the serial port.",
+    )
+    @click.option(
+        "--background-reader/--no-background-reader",
+        default=False,
+        help="Read packets from the experiment on a background thread.",
+    )
     @click.option("--train/--no-train", default=True)
     @click.option("--load/--no-load", default=True)
     @click.option("--render/--no-render", default=True)
     @click.option("--render-with-best/--no-render-with-best", default=True)
     @click.option("--tensorboard/--no-tensorboard", default=True)
     @click.option("--record/--no-record", default=True)
+    @click.option(
+        "--record-every",
+        type=click.IntRange(min=1),
+        default=1,
+        help="Only record every nth frame when recording.",
+    )
     @click.option("-t", "--total-timesteps", type=int, default=100000)
     @click.option(
         "-c",
@@ -140,27 +151,71 @@ def simexp_command(command: SimulationExperimentCommand) -> Command:
         default=Algorithm.PPO,
     )
     @click.option("-n", "--num-frame-stacking", type=int, default=-1)
+    @click.option(
+        "-i",
+        "--integrator",
+        type=click.Choice([_.value for _ in IntegratorOptions], case_sensitive=False),
+        default=IntegratorOptions.RK45,
+        help=(
+            "Integrator of simulated carts. The carts of an environment are only advanced "
+            "together by a single batched kernel with one of the fixed-step integrators: "
+            "RK4_FIXED, SEMI_IMPLICIT_EULER or ENERGY_SPLITTING."
+        ),
+    )
+    @click.option(
+        "--track-energy/--no-track-energy",
+        default=False,
+        help="Log the energy drift of simulated episodes to Tensorboard.",
+    )
+    @click.option(
+        "--n-envs",
+        type=click.IntRange(min=1),
+        default=1,
+        help="Number of simulated environments to train on.",
+    )
+    @click.option(
+        "--n-procs",
+        type=click.IntRange(min=1),
+        default=1,
+        help="Number of worker processes to run the simulated environments in.",
+    )
+    @click.option(
+        "--info-level",
+        type=click.Choice([_.value for _ in InfoLevel], case_sensitive=False),
+        default=InfoLevel.FULL,
+        help="Telemetry put into the step infos of simulated environments.",
+    )
     @click.option("--profile/--no-profile", default=False)
     def inner(
         ctx: click.Context,
         port: str,
         baudrate: int,
+        parser_mode: str,
+        background_reader: bool,
         train: bool,
         load: bool,
         render: bool,
         render_with_best: bool,
         tensorboard: bool,
         record: bool,
+        record_every: int,
         total_timesteps: int,
         carts: int,
         goal: str,
         state_spec: str,
         algorithm: str,
         num_frame_stacking: int,
+        integrator: str,
+        track_energy: bool,
+        n_envs: int,
+        n_procs: int,
+        info_level: str,
         profile: bool,
     ) -> None:
 
         if profile:
+            import yappi
+
             yappi.start()
             yappi.set_clock_type("CPU")
 
@@ -168,7 +223,12 @@ def simexp_command(command: SimulationExperimentCommand) -> Command:
             ...
 
         elif command is SimulationExperimentCommand.EXPERIMENT:
+            if n_envs > 1 or n_procs > 1:
+                raise click.BadParameter("Experiments only support a single environment.")
+
             if port == "AUTODETECT":
+                from serial.tools import list_ports
+
                 port = list_ports.comports()[0].device
         else:
             raise NotImplementedError
@@ -210,6 +270,8 @@ def simexp_command(command: SimulationExperimentCommand) -> Command:
 
             agent_params = DeepPILCOConfiguration["agent"].copy()
             agent_params["agent"] = SimulatedCartpoleAgent  # type: ignore [misc]
+            agent_params["integrator"] = IntegratorOptions(integrator)
+            agent_params["track_energy"] = track_energy
             agent_params["goal"] = CONFIGURATION_GOAL_MAP[goal]
             agent_params["state_spec"] = make_state_spec(
                 CONFIGURATION_STATE_SPEC_MAP[state_spec],  # type: ignore [misc]
@@ -254,10 +316,12 @@ def simexp_command(command: SimulationExperimentCommand) -> Command:
             "agents": agents,
         }
         if command is SimulationExperimentCommand.SIMULATE:
-            ...
+            env_params["info_level"] = InfoLevel(info_level)
         elif command is SimulationExperimentCommand.EXPERIMENT:
             env_params["port"] = port
             env_params["baudrate"] = baudrate
+            env_params["parser_mode"] = ParserMode(parser_mode)
+            env_params["background_reader"] = background_reader
 
         # Algorithm-dependent hyperparameters
         policy_params = ALGORITHM_POLICY_PARAMS_MAP[Algorithm(algorithm)]
@@ -277,14 +341,20 @@ def simexp_command(command: SimulationExperimentCommand) -> Command:
 
         algorithm_obj = getattr(stable_baselines3, algorithm)
         try:
-            env = make_sb3_env(env_class, **env_params)
+            env = make_sb3_env(env_class, n_envs=n_envs, n_procs=n_procs, **env_params)
         except KeyboardInterrupt as exc:
             logger.info("Reraising exception for debugging purposes")
             raise Exception from exc
 
+        # The environments may live in worker processes, so ask the vectorised environment
+        agent_observation_space = (
+            env.get_attr("observation_space", 0)[0]
+            if command is SimulationExperimentCommand.SIMULATE
+            else get_sb3_env_root_env(env)._agents[0].observation_space
+        )
         logger.info(
             f"Observation spaces: env={env.observation_space.shape}, "
-            f"agent={get_sb3_env_root_env(env)._agents[0].observation_space.shape}"
+            f"agent={agent_observation_space.shape}"
         )
         if train:
             _kwargs = {
@@ -319,6 +389,10 @@ def simexp_command(command: SimulationExperimentCommand) -> Command:
             else:
                 model.save(model_path)
 
+        if command is SimulationExperimentCommand.SIMULATE:
+            # Stops the worker processes of the environments, if any
+            env.close()
+
         if render:
             sim_env_params = env_params.copy()
             sim_env_params.pop("port", None)
@@ -335,9 +409,14 @@ def simexp_command(command: SimulationExperimentCommand) -> Command:
 
             model = algorithm_obj.load(render_model_path)
 
+            recorder: Optional[FFmpegRecorder] = None
             if record:
-                fig = plt.figure()
-                images = []
+                # Played back in real time
+                recorder = FFmpegRecorder(
+                    animation_path,
+                    fps=1 / (root_env.timestep * record_every),
+                    record_every=record_every,
+                )
 
             obs = env.reset()
             done = False
@@ -355,13 +434,8 @@ def simexp_command(command: SimulationExperimentCommand) -> Command:
 
                 done = any(dones.values())
 
-                if record:
-                    image = plt.imshow(env.render(mode="rgb_array"), animated=True)
-                    plt.axis("off")
-                    plt.title("CartER Simulation")
-
-                    images.append([image])
-
+                if recorder is not None:
+                    recorder.write(env.render(mode="rgb_array"))
                 else:
                     env.render()
 
@@ -369,19 +443,13 @@ def simexp_command(command: SimulationExperimentCommand) -> Command:
                     logger.info(f"Rewards: {total_rewards}")
                     env.close()
 
-                    if record:
+                    if recorder is not None:
                         print("Saving animation...")
-                        ani = animation.ArtistAnimation(
-                            fig,
-                            images,
-                            interval=root_env.timestep * 1000,
-                            blit=True,
-                            repeat_delay=1000,
-                        )
-
-                        writer = FFMpegWriter(fps=30)
-
-                        ani.save(f"{animation_path}", dpi=200, writer=writer)
+                        recorder.close()
                         print(f"Animation saved as {animation_path}")
 
     return inner
+
+
+simulate = simexp_command(SimulationExperimentCommand.SIMULATE)
+experiment = simexp_command(SimulationExperimentCommand.EXPERIMENT)
@@ -1,8 +1,38 @@
+from commander.integration.batched import BatchedCartpolePhysics
+from commander.integration.compilation import set_cache_dir, warm_up, warm_up_in_background
 from commander.integration.constants import IntegratorOptions
-from commander.integration.equations import DerivativesWrapper, derivatives
+from commander.integration.equations import (
+    FIXED_STEP_METHODS,
+    JACOBIAN_METHODS,
+    DerivativesWrapper,
+    derivatives,
+    dissipated_power,
+    energy,
+    integrate_fixed_step,
+    jacobian,
+    make_derivatives,
+    make_jacobian,
+)
+from commander.integration.sweep import load_sweep, parameter_grid, sample_parameters, sweep
 
 __all__ = (
     "IntegratorOptions",
     "derivatives",
+    "make_derivatives",
+    "jacobian",
+    "make_jacobian",
+    "JACOBIAN_METHODS",
     "DerivativesWrapper",
+    "energy",
+    "dissipated_power",
+    "FIXED_STEP_METHODS",
+    "integrate_fixed_step",
+    "BatchedCartpolePhysics",
+    "set_cache_dir",
+    "warm_up",
+    "warm_up_in_background",
+    "parameter_grid",
+    "sample_parameters",
+    "sweep",
+    "load_sweep",
 )
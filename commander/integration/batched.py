@@ -0,0 +1,168 @@
+"""
+Contains a physics engine that advances many cartpoles at once.
+
+The states of all carts are kept in a single contiguous `(N, 4)` array and
+advanced by a single parallel compiled kernel rather than by N separate
+solver invocations.
+"""
+
+from collections.abc import Sequence
+from typing import Optional, Union
+
+import numpy as np
+import numpy.typing as npt
+
+from numba import jit, prange
+
+from commander.constants import FLOAT_TYPE
+from commander.integration.constants import IntegratorOptions
+from commander.integration.equations import FIXED_STEP_METHODS, advance_fixed_step
+
+_NUMBA_PARALLEL_OPTIONS = {
+    "nopython": True,
+    "nogil": True,
+    "cache": True,
+    "parallel": True,
+}
+
+FloatArray = npt.NDArray[FLOAT_TYPE]
+IndexArray = npt.NDArray[np.intp]
+ParameterT = Union[float, Sequence[float], FloatArray]
+
+
+@jit(**_NUMBA_PARALLEL_OPTIONS)  # type: ignore
+def step_batched(
+    method: int,
+    states: FloatArray,
+    normal_forces: FloatArray,
+    rows: IndexArray,
+    actions: npt.NDArray[np.int64],
+    tau: float,
+    steps: int,
+    grav_acc: FloatArray,
+    mass_cart: FloatArray,
+    mass_pole: FloatArray,
+    friction_cart: FloatArray,
+    friction_pole: FloatArray,
+    pole_length: FloatArray,
+    force_mag: FloatArray,
+) -> None:
+    """
+    Advances the given `rows` of `states` by `tau` seconds in place.
+
+    `actions[k]` is the action applied to the cart in row `rows[k]`.
+    An action of 1 pushes the cart forwards, anything else pushes it backwards.
+    """
+    for k in prange(rows.shape[0]):
+        i = rows[k]
+
+        F = force_mag[i] if actions[k] == 1 else -force_mag[i]
+
+        m_p = mass_pole[i]
+        l = pole_length[i]
+
+        normal_forces[i] = advance_fixed_step(
+            method,
+            states[i],
+            tau,
+            steps,
+            normal_forces[i],
+            F,
+            grav_acc[i],
+            friction_cart[i],
+            friction_pole[i],
+            l,
+            m_p,
+            m_p * l,
+            mass_cart[i] + m_p,
+        )
+
+
+class BatchedCartpolePhysics:
+    """
+    Simulates the physics of N cartpoles in lockstep.
+
+    Physical parameters may be given as scalars, which are then shared by all
+    carts, or as one value per cart.
+
+    Only the compiled fixed-step integrators are supported.
+    """
+
+    def __init__(
+        self,
+        n: int,
+        grav_acc: ParameterT = 9.8,  # m/s^2
+        mass_cart: ParameterT = 5.0,  # kg
+        mass_pole: ParameterT = 0.1,  # kg
+        friction_cart: ParameterT = 0.01,  # coefficient
+        friction_pole: ParameterT = 0.001,  # coefficient
+        pole_length: ParameterT = 1.0,  # m
+        force_mag: ParameterT = 100.0,  # N
+        tau: float = 0.02,  # s
+        integrator: IntegratorOptions = IntegratorOptions.RK4_FIXED,
+        integration_resolution: int = 2,
+    ) -> None:
+        if integrator not in FIXED_STEP_METHODS:
+            raise ValueError(f"Integrator {integrator} is not a fixed-step integrator.")
+
+        self.n = n
+
+        self.grav_acc = self._make_parameter(grav_acc)
+        self.mass_cart = self._make_parameter(mass_cart)
+        self.mass_pole = self._make_parameter(mass_pole)
+        self.friction_cart = self._make_parameter(friction_cart)
+        self.friction_pole = self._make_parameter(friction_pole)
+        self.pole_length = self._make_parameter(pole_length)
+        self.force_mag = self._make_parameter(force_mag)
+
+        self.tau = tau
+        self.integrator = integrator
+        self.integration_resolution = integration_resolution
+
+        self.states: FloatArray = np.zeros((n, 4), dtype=FLOAT_TYPE)
+        self.normal_forces: FloatArray = np.zeros(n, dtype=FLOAT_TYPE)
+
+        self._all_rows: IndexArray = np.arange(n, dtype=np.intp)
+
+    def _make_parameter(self, value: ParameterT) -> FloatArray:
+        parameter = np.ascontiguousarray(
+            np.broadcast_to(np.asarray(value, dtype=FLOAT_TYPE), (self.n,))
+        )
+
+        return parameter
+
+    def step(self, actions: npt.ArrayLike, rows: Optional[npt.ArrayLike] = None) -> FloatArray:
+        """
+        Advances the carts by `tau` seconds.
+
+        Args:
+            actions: One action per cart in `rows`
+            rows: Indices of the carts to advance. Defaults to all carts.
+
+        Returns:
+            The updated `states` array.
+        """
+        rows_ = self._all_rows if rows is None else np.asarray(rows, dtype=np.intp)
+        actions_ = np.asarray(actions, dtype=np.int64)
+
+        if actions_.shape != rows_.shape:
+            raise ValueError(f"Expected {rows_.shape[0]} actions, got {actions_.shape}")
+
+        step_batched(
+            FIXED_STEP_METHODS[self.integrator],
+            self.states,
+            self.normal_forces,
+            rows_,
+            actions_,
+            self.tau,
+            self.integration_resolution,
+            self.grav_acc,
+            self.mass_cart,
+            self.mass_pole,
+            self.friction_cart,
+            self.friction_pole,
+            self.pole_length,
+            self.force_mag,
+        )
+
+        return self.states
@@ -0,0 +1,362 @@
+"""
+Contains a benchmark of the accuracy and throughput of the integrators.
+
+Every integrator simulates the same open-loop sequence of forces and is
+compared against a reference trajectory computed using DOP853 at tight
+tolerances, stepping exactly like the agents do.
+"""
+
+import datetime as dt
+import json
+import logging
+import platform
+import subprocess
+from collections.abc import Iterable
+from pathlib import Path
+from time import perf_counter
+from typing import Optional, TypedDict, Union
+
+import numpy as np
+import numpy.typing as npt
+
+import numba
+import scipy
+
+from commander.constants import FLOAT_TYPE
+from commander.integration.constants import IntegratorOptions
+from commander.integration.equations import (
+    FIXED_STEP_METHODS,
+    DerivativesWrapper,
+    PhysicalParams,
+    advance_fixed_step,
+)
+from commander.utils import get_project_root
+
+logger = logging.getLogger(__name__)
+
+FloatArray = npt.NDArray[FLOAT_TYPE]
+
+REFERENCE_METHOD = "DOP853"
+REFERENCE_TOLERANCE = 1e-12
+
+# Nominal evaluations of the derivatives per substep of the fixed-step integrators,
+# including the evaluation of the normal force at the end of each substep.
+# Substeps that are redone at a change of sign of the normal force are not counted.
+# The energy splitting evaluates the derivatives for the normal force in its friction
+# half-steps only, the fixed-point iterations of the conservative part are not counted.
+FIXED_STEP_RHS_EVALUATIONS = {
+    IntegratorOptions.RK4_FIXED: 5,
+    IntegratorOptions.SEMI_IMPLICIT_EULER: 2,
+    IntegratorOptions.ENERGY_SPLITTING: 5,
+}
+
+
+class BenchmarkConfiguration(TypedDict):
+    grav_acc: float  # m/s^2
+    mass_cart: float  # kg
+    mass_pole: float  # kg
+    friction_cart: float  # coefficient
+    friction_pole: float  # coefficient
+    pole_length: float  # m
+    force_mag: float  # N
+    tau: float  # s
+
+
+BENCHMARK_CONFIGURATIONS: dict[str, BenchmarkConfiguration] = {
+    # Defaults of `SimulatedCartpoleAgent`
+    "default": {
+        "grav_acc": 9.8,
+        "mass_cart": 5.0,
+        "mass_pole": 0.1,
+        "friction_cart": 0.01,
+        "friction_pole": 0.001,
+        "pole_length": 1.0,
+        "force_mag": 100.0,
+        "tau": 0.02,
+    },
+    # See `commander.ml.configurations.DeepPILCOConfiguration`
+    "deeppilco": {
+        "grav_acc": 9.82,
+        "mass_cart": 0.5,
+        "mass_pole": 0.5,
+        "friction_cart": 0.1,
+        "friction_pole": 0.0,
+        "pole_length": 0.6,
+        "force_mag": 10.0,
+        "tau": 0.02,
+    },
+}
+
+DEFAULT_INITIAL_STATE = (0.0, 0.0, 0.1, 0.0)
+
+
+class BenchmarkResult(TypedDict):
+    configuration: str
+    integrator: str
+    resolution: Optional[int]
+    steps: int
+    wall_time: float  # s
+    steps_per_second: float
+    rhs_evaluations_per_step: float
+    max_error: float
+    rms_error: float
+    final_error: float
+
+
+class BenchmarkMetadata(TypedDict):
+    timestamp: str
+    commit: Optional[str]
+    python: str
+    numpy: str
+    numba: str
+    scipy: str
+    duration: float  # s
+    seed: int
+    initial_state: list[float]
+
+
+class BenchmarkReport(TypedDict):
+    metadata: BenchmarkMetadata
+    results: list[BenchmarkResult]
+
+
+def get_physical_params(configuration: BenchmarkConfiguration) -> PhysicalParams:
+    """
+    The physical parameters of a configuration in the order expected by `derivatives`.
+    """
+    m_p = configuration["mass_pole"]
+    l = configuration["pole_length"]
+
+    return (
+        configuration["grav_acc"],
+        configuration["friction_cart"],
+        configuration["friction_pole"],
+        l,
+        m_p,
+        m_p * l,
+        configuration["mass_cart"] + m_p,
+    )
+
+
+def make_forces(configuration: BenchmarkConfiguration, steps: int, seed: int) -> FloatArray:
+    """
+    Returns a random sequence of forces as applied by random actions of an agent.
+    """
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, 2, size=steps)
+
+    return np.where(actions == 1, 1.0, -1.0) * configuration["force_mag"]
+
+
+def simulate(
+    integrator: Union[IntegratorOptions, str],
+    configuration: BenchmarkConfiguration,
+    y0: FloatArray,
+    forces: FloatArray,
+    resolution: int = 1,
+    **options: float,
+) -> tuple[FloatArray, int]:
+    """
+    Simulates a step of `tau` seconds for each of the `forces`, like an agent would.
+
+    `resolution` is only used by the fixed-step integrators and `options` are only
+    passed on to `solve_ivp`.
+
+    Returns:
+        A tuple of the trajectory, including the initial state, and the number of
+        evaluations of the derivatives.
+    """
+    params = get_physical_params(configuration)
+    tau = configuration["tau"]
+
+    trajectory = np.empty((forces.shape[0] + 1, 4), dtype=FLOAT_TYPE)
+    trajectory[0] = y0
+
+    if integrator in FIXED_STEP_METHODS:
+        method = FIXED_STEP_METHODS[IntegratorOptions(integrator)]
+
+        N_c_ = 0.0
+        for i, F in enumerate(forces):
+            trajectory[i + 1] = trajectory[i]
+            N_c_ = advance_fixed_step(method, trajectory[i + 1], tau, resolution, N_c_, F, *params)
+
+        per_step = FIXED_STEP_RHS_EVALUATIONS[IntegratorOptions(integrator)] * resolution + 1
+        nfev = per_step * forces.shape[0]
+    else:
+        wrapper = DerivativesWrapper(params)
+
+        nfev = 0
+        for i, F in enumerate(forces):
+            trajectory[i + 1], step_nfev = wrapper.solve(
+                integrator, (0, tau), trajectory[i], F, **options
+            )
+            nfev += step_nfev
+
+    return (trajectory, nfev)
+
+
+def reference_trajectory(
+    configuration: BenchmarkConfiguration, y0: FloatArray, forces: FloatArray
+) -> FloatArray:
+    """
+    Simulates the reference trajectory using `REFERENCE_METHOD` at `REFERENCE_TOLERANCE`.
+    """
+    trajectory, _ = simulate(
+        REFERENCE_METHOD,
+        configuration,
+        y0,
+        forces,
+        rtol=REFERENCE_TOLERANCE,
+        atol=REFERENCE_TOLERANCE,
+    )
+
+    return trajectory
+
+
+def benchmark_integrator(
+    name: str,
+    integrator: IntegratorOptions,
+    reference: FloatArray,
+    forces: FloatArray,
+    resolution: Optional[int] = None,
+) -> BenchmarkResult:
+    """
+    Benchmarks a single integrator on the configuration given by `name` against
+    the `reference` trajectory.
+    """
+    configuration = BENCHMARK_CONFIGURATIONS[name]
+    resolution_ = 1 if resolution is None else resolution
+    y0 = reference[0]
+
+    # Make sure compilation is not part of the timing
+    simulate(integrator, configuration, y0, forces[:1], resolution_)
+
+    start = perf_counter()
+    trajectory, nfev = simulate(integrator, configuration, y0, forces, resolution_)
+    wall_time = perf_counter() - start
+
+    errors = np.linalg.norm(trajectory - reference, axis=1)
+    steps = forces.shape[0]
+
+    return {
+        "configuration": name,
+        "integrator": integrator.value,
+        "resolution": resolution,
+        "steps": steps,
+        "wall_time": wall_time,
+        "steps_per_second": steps / wall_time,
+        "rhs_evaluations_per_step": nfev / steps,
+        "max_error": float(np.max(errors)),
+        "rms_error": float(np.sqrt(np.mean(errors ** 2))),
+        "final_error": float(errors[-1]),
+    }
+
+
+def _get_commit() -> Optional[str]:
+    try:
+        process = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=get_project_root(),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return process.stdout.strip()
+
+
+def run_benchmarks(
+    configurations: Iterable[str] = tuple(BENCHMARK_CONFIGURATIONS),
+    integrators: Iterable[IntegratorOptions] = tuple(IntegratorOptions),
+    resolutions: Iterable[int] = (2,),
+    duration: float = 10.0,
+    seed: int = 0,
+    initial_state: tuple[float, float, float, float] = DEFAULT_INITIAL_STATE,
+) -> BenchmarkReport:
+    """
+    Benchmarks every integrator on every configuration.
+
+    Fixed-step integrators are benchmarked once for every resolution, whereas
+    the integrators of `solve_ivp` choose their own steps.
+
+    Args:
+        configurations: Names of configurations in `BENCHMARK_CONFIGURATIONS`
+        integrators: Integrators to benchmark
+        resolutions: Numbers of substeps per step for the fixed-step integrators
+        duration: Simulated time in seconds
+        seed: Seed of the random sequence of forces
+        initial_state: Initial state of the cartpole
+    """
+    y0 = np.array(initial_state, dtype=FLOAT_TYPE)
+    integrators = tuple(integrators)
+    resolutions = tuple(resolutions)
+
+    results: list[BenchmarkResult] = []
+    for name in configurations:
+        configuration = BENCHMARK_CONFIGURATIONS[name]
+
+        steps = round(duration / configuration["tau"])
+        forces = make_forces(configuration, steps, seed)
+
+        logger.info("Computing reference trajectory for %s", name)
+        reference = reference_trajectory(configuration, y0, forces)
+
+        for integrator in integrators:
+            integrator_resolutions: tuple[Optional[int], ...] = (
+                resolutions if integrator in FIXED_STEP_METHODS else (None,)
+            )
+
+            for resolution in integrator_resolutions:
+                logger.info("Benchmarking %s (%s) on %s", integrator.value, resolution, name)
+
+                results.append(
+                    benchmark_integrator(name, integrator, reference, forces, resolution)
+                )
+
+    metadata: BenchmarkMetadata = {
+        "timestamp": dt.datetime.now().isoformat(),
+        "commit": _get_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": numba.__version__,
+        "scipy": scipy.__version__,
+        "duration": duration,
+        "seed": seed,
+        "initial_state": y0.tolist(),
+    }
+
+    return {"metadata": metadata, "results": results}
+
+
+def write_report(report: BenchmarkReport, path: Path) -> None:
+    """
+    Writes a benchmark report to `path` as JSON.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, "w") as f:
+        json.dump(report, f, indent=4)
+
+
+def format_report(report: BenchmarkReport) -> str:
+    """
+    Formats the results of a benchmark report as a table.
+    """
+    header = (
+        f"{'configuration':<14}{'integrator':<22}{'res':>5}{'steps/s':>12}"
+        f"{'rhs/step':>10}{'wall [s]':>10}{'max err':>11}{'rms err':>11}"
+    )
+
+    lines = [header, "-" * len(header)]
+    for result in report["results"]:
+        resolution = "-" if result["resolution"] is None else str(result["resolution"])
+
+        lines.append(
+            f"{result['configuration']:<14}{result['integrator']:<22}{resolution:>5}"
+            f"{result['steps_per_second']:>12.0f}{result['rhs_evaluations_per_step']:>10.1f}"
+            f"{result['wall_time']:>10.3f}{result['max_error']:>11.2e}{result['rms_error']:>11.2e}"
+        )
+
+    return "\n".join(lines)
@@ -0,0 +1,154 @@
+"""
+Contains helpers for managing the compilation of the integration kernels.
+
+All kernels are compiled with Numba's persistent on-disk cache enabled,
+such that only the very first run on a machine pays the full JIT cost.
+"""
+
+import logging
+import os
+from pathlib import Path
+from threading import Thread
+from typing import Optional
+
+import numpy as np
+
+import numba
+
+from commander.constants import FLOAT_TYPE
+from commander.integration.batched import step_batched
+from commander.integration.equations import (
+    FIXED_STEP_METHODS,
+    N_c,
+    PhysicalParams,
+    advance_fixed_step,
+    derivatives,
+    dissipated_power,
+    energy,
+    integrate_fixed_step,
+    jacobian,
+    make_derivatives,
+    make_jacobian,
+)
+from commander.integration.sweep import integrate_sweep
+
+logger = logging.getLogger(__name__)
+
+CACHED_KERNELS = (
+    N_c,
+    derivatives,
+    jacobian,
+    energy,
+    dissipated_power,
+    advance_fixed_step,
+    integrate_fixed_step,
+    step_batched,
+    integrate_sweep,
+)
+
+# Those of the default agent
+DEFAULT_PHYSICAL_PARAMS: PhysicalParams = (9.8, 0.01, 0.001, 1.0, 0.1, 0.1, 5.1)
+
+
+def set_cache_dir(cache_dir: Path) -> None:
+    """
+    Sets the directory of the persistent compilation cache.
+
+    This also applies to subprocesses, which inherit the environment.
+    """
+    cache_dir = cache_dir.resolve()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    os.environ["NUMBA_CACHE_DIR"] = str(cache_dir)
+    numba.config.CACHE_DIR = str(cache_dir)
+
+    # The cache location of a kernel is resolved when caching is enabled,
+    # which has already happened for kernels defined at import time.
+    for kernel in CACHED_KERNELS:
+        kernel.enable_caching()
+
+    logger.debug("Using compilation cache directory: %s", cache_dir)
+
+
+def warm_up(params: Optional[PhysicalParams] = None) -> None:
+    """
+    Compiles (or loads from cache) the kernels used by the agents and environments
+    for the argument types they are called with:
+
+    - the generic integration kernels, including all fixed-step methods and
+      the batched step,
+    - the kernels specialised to `params` by `make_derivatives` and `make_jacobian`,
+      as used by `DerivativesWrapper`, defaulting to the physics of the default agent,
+    - the rollouts of `commander.ml.agent.rollout`, which compile the goal kernels.
+    """
+    # Imported here, as the agents depend on this package
+    from commander.ml.agent.goal_kernels import GOAL_KERNEL_TIME
+    from commander.ml.agent.rollout import simulate_rollout, simulate_rollout_batch
+
+    if params is None:
+        params = DEFAULT_PHYSICAL_PARAMS
+
+    y = np.zeros(4, dtype=FLOAT_TYPE)
+
+    derivatives(0.0, y, 0.0, 0.0, *params)
+    energy(y, *params)
+    dissipated_power(y, 0.0, 0.0, *params)
+
+    make_derivatives(*params)(0.0, y, 1.0, 0.0)
+    make_jacobian(*params)(0.0, y, 1.0, 0.0)
+
+    for method in FIXED_STEP_METHODS.values():
+        integrate_fixed_step(method, y, 0.02, 1, 0.0, 0.0, *params)
+
+    parameter = np.ones(1, dtype=FLOAT_TYPE)
+    step_batched(
+        0,
+        np.zeros((1, 4), dtype=FLOAT_TYPE),
+        np.zeros(1, dtype=FLOAT_TYPE),
+        np.zeros(1, dtype=np.intp),
+        np.zeros(1, dtype=np.int64),
+        0.02,
+        1,
+        *(parameter for _ in range(7)),
+    )
+
+    # Without actions, which compiles the rollouts without running a step
+    for rollout, batch_shape in ((simulate_rollout, ()), (simulate_rollout_batch, (1,))):
+        rollout(
+            0,
+            np.zeros((*batch_shape, 1, 4), dtype=FLOAT_TYPE),
+            np.zeros((*batch_shape, 0), dtype=FLOAT_TYPE),
+            np.zeros((*batch_shape, 0), dtype=np.bool_),
+            np.zeros((*batch_shape, 0), dtype=np.int64),
+            0.0,
+            0,
+            1,
+            GOAL_KERNEL_TIME,
+            np.zeros(0, dtype=FLOAT_TYPE),
+            0.0,
+            0.02,
+            1,
+            1.0,
+            *params,
+        )
+
+
+def warm_up_in_background(params: Optional[PhysicalParams] = None) -> Thread:
+    """
+    Runs `warm_up` for `params` in a daemon thread and returns the thread.
+
+    Numba releases the GIL for much of the compilation, so this can overlap
+    with other slow startup work such as importing the ML libraries.
+    """
+    # Imported by the caller, as importing the same modules from two threads at once
+    # may find them partially initialised
+    import commander.ml.agent.rollout  # noqa: F401
+
+    # Launches the threading layer of the parallel kernels, which hangs the interpreter
+    # on exit when launched from a thread other than the main thread
+    numba.get_num_threads()
+
+    thread = Thread(target=warm_up, args=(params,), name="numba-warm-up", daemon=True)
+    thread.start()
+
+    return thread
@@ -8,4 +8,13 @@ from enum import Enum, unique
 @unique
 class IntegratorOptions(str, Enum):
     RK45 = "RK45"
+
+    # Implicit methods suited for stiff configurations, using the analytic Jacobian
     LSODA = "LSODA"
+    RADAU = "Radau"
+    BDF = "BDF"
+
+    # Compiled fixed-step integrators, see `commander.integration.equations`
+    RK4_FIXED = "RK4_FIXED"
+    SEMI_IMPLICIT_EULER = "SEMI_IMPLICIT_EULER"
+    ENERGY_SPLITTING = "ENERGY_SPLITTING"
@@ -20,14 +20,23 @@ symbols.
 """
 
 import logging
-from typing import Any
+from collections.abc import Callable
+from functools import lru_cache
+from math import copysign
+from typing import Any, Optional, Union, cast
 
+import numpy as np
+import numpy.typing as npt
 from numpy import cos
 from numpy import sign as sgn
 from numpy import sin
 
 from numba import jit
 
+from scipy.integrate import solve_ivp
+
+from commander.constants import FLOAT_TYPE
+from commander.integration.constants import IntegratorOptions
 from commander.type_aliases import InternalState
 
 logger = logging.getLogger(__name__)
@@ -35,10 +44,29 @@ logger = logging.getLogger(__name__)
 _NUMBA_OPTIONS = {
     "nopython": True,
     "nogil": True,
+    "cache": True,
 }
 
 Params = tuple[float, Any, float, Any]
 
+# g, mu_c, mu_p, l, m_p, m_l, M
+PhysicalParams = tuple[float, float, float, float, float, float, float]
+
+SpecialisedDerivatives = Callable[[float, InternalState, float, float], tuple[Params, float]]
+SpecialisedJacobian = Callable[[float, InternalState, float, float], npt.NDArray[FLOAT_TYPE]]
+
+# Number of specialised derivative kernels to keep compiled
+DERIVATIVES_CACHE_SIZE = 32
+
+# Integrators of `solve_ivp` that make use of the Jacobian
+JACOBIAN_METHODS = frozenset(
+    (IntegratorOptions.LSODA, IntegratorOptions.RADAU, IntegratorOptions.BDF)
+)
+
+# Maximum number of changes of sign of the normal force handled within a single call to
+# `DerivativesWrapper.solve`
+MAX_NORMAL_FORCE_SWITCHES = 8
+
 last_N_c: float
 
 
@@ -50,8 +78,7 @@ def N_c(g: float, M: float, m_l: float, theta: float, thetadot: float, thetaddot
     return g * M - m_l * (thetaddot * sin(theta) + thetadot ** 2 * cos(theta))  # type: ignore
 
 
-# Could probably speed this up by introducing a function
-# builder and storing constants in scope instead of as args.
+# See `make_derivatives` for a version with the physical constants in scope
 @jit(**_NUMBA_OPTIONS)  # type: ignore
 def derivatives(
     t: float,
@@ -121,61 +148,761 @@ def derivatives(
     return (derivs, new_N_c)
 
 
+# See `make_jacobian` for a version with the physical constants in scope
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def jacobian(
+    t: float,
+    y: InternalState,
+    last_N_c: float,
+    F: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> npt.NDArray[FLOAT_TYPE]:
+    """
+    Returns the Jacobian of `derivatives` with respect to `y`.
+
+    The friction branch given by the sign of `last_N_c * b` is held fixed, which
+    makes the system smooth in `b` apart from at the switches of the branch.
+
+    Args:
+        t: time
+        y: vector of variables
+    """
+    b = y[1]  # dx/dt
+    q = y[2]  # θ
+    a = y[3]  # dθ/dt
+
+    alpha = mu_c * sgn(last_N_c * b)
+
+    s = sin(q)
+    c = cos(q)
+
+    # adot = num / den, see `derivatives`
+    pull = (-F - m_l * a ** 2 * (s + alpha * c)) / M + g * alpha
+    num = g * s + c * pull - mu_p * a / m_l
+    den = l * (4 / 3 - (m_p * c / M) * (c - alpha))
+
+    dnum_dq = g * c - s * pull - c * m_l * a ** 2 * (c - alpha * s) / M
+    dnum_da = -2 * m_l * a * c * (s + alpha * c) / M - mu_p / m_l
+    dden_dq = l * (m_p / M) * s * (2 * c - alpha)
+
+    adot = num / den
+    dadot_dq = (dnum_dq * den - num * dden_dq) / den ** 2
+    dadot_da = dnum_da / den
+
+    # Using N_c to eliminate bdot gives
+    # bdot = (F - alpha g M + m_l a² (s + alpha c) - m_l adot (c - alpha s)) / M
+    dbdot_dq = (
+        m_l * (a ** 2 * (c - alpha * s) - dadot_dq * (c - alpha * s) + adot * (s + alpha * c)) / M
+    )
+    dbdot_da = m_l * (2 * a * (s + alpha * c) - dadot_da * (c - alpha * s)) / M
+
+    jac = np.zeros((4, 4), dtype=FLOAT_TYPE)
+
+    jac[0, 1] = 1.0
+    jac[1, 2] = dbdot_dq
+    jac[1, 3] = dbdot_da
+    jac[2, 3] = 1.0
+    jac[3, 2] = dadot_dq
+    jac[3, 3] = dadot_da
+
+    return jac
+
+
+@lru_cache(maxsize=DERIVATIVES_CACHE_SIZE)
+def make_derivatives(
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> SpecialisedDerivatives:
+    """
+    Builds a version of `derivatives` with the physical constants baked in.
+
+    The returned kernel takes `(t, y, last_N_c, F)` and is compiled with the
+    constants frozen into it, which saves passing them through Python and
+    Numba's dispatcher on every evaluation.
+
+    Kernels are cached by their parameters, such that agents with identical
+    physics share a single compiled kernel.
+    """
+
+    @jit(**_NUMBA_OPTIONS)  # type: ignore
+    def specialised_derivatives(
+        t: float, y: InternalState, last_N_c: float, F: float
+    ) -> tuple[Params, float]:
+        return derivatives(t, y, last_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)  # type: ignore
+
+    return specialised_derivatives  # type: ignore
+
+
+@lru_cache(maxsize=DERIVATIVES_CACHE_SIZE)
+def make_jacobian(
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> SpecialisedJacobian:
+    """
+    Builds a version of `jacobian` with the physical constants baked in.
+
+    See `make_derivatives`.
+    """
+
+    @jit(**_NUMBA_OPTIONS)  # type: ignore
+    def specialised_jacobian(
+        t: float, y: InternalState, last_N_c: float, F: float
+    ) -> npt.NDArray[FLOAT_TYPE]:
+        return jacobian(t, y, last_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)  # type: ignore
+
+    return specialised_jacobian  # type: ignore
+
+
 class DerivativesWrapper:
     """
     Wraps the derivatives function.
 
-    We need to have the derivatives function be static in order to JIT compile it,
-    but we also need context on whether the sign of the normal force on the
-    cart has changed.
+    The friction between cart and track depends on the sign of the normal
+    force on the cart, which in turn depends on the derivatives. The sign
+    is treated as a discrete state of the system: `last_N_c` selects the
+    friction branch used by `equation`, which is otherwise a pure function
+    of its arguments.
 
-    This wrapper solves that by providing a context attribute, but leaving most
-    of the computation in the static function.
+    Changes of sign are handled by `solve`, which stops the integration at
+    the zero crossing of the normal force and restarts it on the other branch.
 
-    The derivatives function could also be implemented as a static method.
+    If `params` are given, a specialised kernel from `make_derivatives` is used
+    and `equation` only takes the force as an extra argument. Otherwise the
+    physical constants must be passed after the force.
     """
 
     last_N_c: float
 
-    def __init__(self) -> None:
+    def __init__(self, params: Optional[PhysicalParams] = None) -> None:
+        self.params = params
+        self._setup_derivatives()
+
         self.reset()
 
+    def _setup_derivatives(self) -> None:
+        self.derivatives_func: Callable[..., tuple[Params, float]]
+        self.jacobian_func: Callable[..., npt.NDArray[FLOAT_TYPE]]
+
+        if self.params is None:
+            self.derivatives_func = derivatives
+            self.jacobian_func = jacobian
+        else:
+            self.derivatives_func = make_derivatives(*self.params)
+            self.jacobian_func = make_jacobian(*self.params)
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Compiled kernels are looked up again when unpickling in order to
+        # share them through the cache of `make_derivatives`.
+        state = self.__dict__.copy()
+        del state["derivatives_func"]
+        del state["jacobian_func"]
+
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__ |= state
+        self._setup_derivatives()
+
     def reset(self) -> None:
         self.last_N_c = 0.0
 
-    def equation(
+    def equation(self, t: float, y: Params, F: float, *params: float) -> Params:
+        """
+        Right-hand side of the system on the friction branch given by `last_N_c`.
+        """
+        derivs, _ = self.derivatives_func(t, y, self.last_N_c, F, *params)
+
+        return derivs  # type: ignore
+
+    def jacobian(
+        self, t: float, y: InternalState, F: float, *params: float
+    ) -> npt.NDArray[FLOAT_TYPE]:
+        """
+        Jacobian of `equation` with respect to `y`.
+        """
+        return self.jacobian_func(t, y, self.last_N_c, F, *params)
+
+    def normal_force(self, t: float, y: Params, F: float, *params: float) -> float:
+        """
+        Normal force of the cart on the friction branch given by `last_N_c`.
+        """
+        _, new_N_c = self.derivatives_func(t, y, self.last_N_c, F, *params)
+
+        return new_N_c
+
+    def solve(
         self,
-        t: float,
-        y: Params,
+        method: Union[IntegratorOptions, str],
+        t_span: tuple[float, float],
+        y0: InternalState,
         F: float,
-        g: float,
-        mu_c: float,
-        mu_p: float,
-        l: float,
-        m_p: float,
-        m_l: float,
-        M: float,
-    ) -> Params:
-
-        derivs, new_N_c = derivatives(t, y, self.last_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
-
-        # Note: we should strictly check whether sign of N_c has changed and
-        # recalculate using new N_c if this is the case.
-        # For most sensible parameters N_c will never change sign, so we ignore
-        # this for now, since it adds a significant slowdown.
-
-        should_redo = sgn(self.last_N_c) != sgn(new_N_c) and self.last_N_c != 0
-        # # We have changed sign of N_c, so we should recalculate adot based on the new sign
-
-        self.last_N_c = new_N_c
-
-        if should_redo:
-            logger.info(
-                "Normal force of cart changed sign, which requires recalculation. "
-                "If you are getting this a lot or see recursion errors, you probably want "
-                "to introduce more cart mass, as currently the experiment does not "
-                "support flying carts anyway."
+        *params: float,
+        **options: Any,
+    ) -> tuple[InternalState, int]:
+        """
+        Integrates the system over `t_span` using `scipy.integrate.solve_ivp`.
+
+        A zero crossing of the normal force away from the sign of `last_N_c` is a
+        terminal event, after which the integration is restarted from the crossing
+        on the other friction branch. `last_N_c` is updated to the magnitude of the
+        normal force at the end of the integration, signed by the final branch.
+
+        `method` may also name any other method of `solve_ivp`.
+        The analytic Jacobian is used for the methods in `JACOBIAN_METHODS`.
+        Any `options` are passed on to `solve_ivp`.
+
+        Returns:
+            A tuple of the final state and the number of evaluations of the derivatives.
+        """
+        t0, t1 = t_span
+        y = y0
+        args = (F, *params)
+
+        if self.last_N_c == 0.0:
+            # No previous step to take the branch from, so assume the cart rests on the track
+            self.last_N_c = self.derivatives_func(t0, y, 1.0, *args)[1]
+
+        def normal_force_event(t: float, y: InternalState, *args: float) -> float:
+            return self.normal_force(t, y, *args)
+
+        normal_force_event.terminal = True  # type: ignore
+
+        if method in JACOBIAN_METHODS:
+            options.setdefault("jac", self.jacobian)
+
+        nfev = 0
+        for switches in range(MAX_NORMAL_FORCE_SWITCHES + 1):
+            events: Optional[Callable[..., float]] = normal_force_event
+
+            # Right after a switch the normal force may briefly have the sign of the
+            # old branch, so only crossings leaving the current branch count
+            normal_force_event.direction = -sgn(self.last_N_c)  # type: ignore
+
+            if switches == MAX_NORMAL_FORCE_SWITCHES:
+                # Integrate the remainder on a single branch rather than chattering forever
+                logger.info(
+                    "Normal force of cart changed sign %d times in a single step. "
+                    "You probably want to introduce more cart mass, as currently the "
+                    "experiment does not support flying carts anyway.",
+                    switches,
+                )
+                events = None
+
+            sol = solve_ivp(
+                fun=self.equation,
+                t_span=(t0, t1),
+                y0=y,
+                method=method,
+                args=args,
+                events=events,
+                **options,
             )
-            return self.equation(t, y, F, g, mu_c, mu_p, l, m_p, m_l, M)
+            nfev += sol.nfev
 
-        return derivs  # type: ignore
+            if sol.status != 1:
+                break
+
+            t0 = sol.t_events[0][0]
+            y = sol.y_events[0][0]
+
+            self.last_N_c = copysign(self.last_N_c, -self.last_N_c)
+
+        if not sol.success:
+            logger.warning("Integration failed: %s", sol.message)
+
+        y = np.ascontiguousarray(sol.y[:, -1])
+
+        self.last_N_c = copysign(self.normal_force(t1, y, *args), self.last_N_c)
+        nfev += 1
+
+        return (cast(InternalState, y), nfev)
+
+
+# Energy
+#
+# The conservative part of the system has the Lagrangian
+#
+#     L = ½ M ẋ² + m_l ẋ θ̇ cos θ + ⅔ m_p l² θ̇² - m_l g cos θ
+#
+# with the canonical momenta p_x = M ẋ + m_l θ̇ cos θ and p_θ = m_l ẋ cos θ + ⁴⁄₃ m_p l² θ̇.
+# The applied force does work F ẋ on the system, while the friction in the cart
+# and the joint dissipates energy, see `dissipated_power`.
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def energy(
+    y: InternalState,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> float:
+    """
+    Mechanical energy of the cartpole, with the potential energy zero at the height of the pivot.
+    """
+    b = y[1]
+    q = y[2]
+    a = y[3]
+
+    return (  # type: ignore
+        0.5 * M * b ** 2
+        + m_l * b * a * cos(q)
+        + 2 / 3 * m_p * l ** 2 * a ** 2
+        + m_l * g * cos(q)
+    )
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def _friction_forces(
+    y: InternalState,
+    branch_N_c: float,
+    F: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> tuple[float, float]:
+    """
+    Generalised friction forces acting on x and θ on the friction branch of `branch_N_c`.
+
+    These are the forces not accounted for by the Lagrangian, recovered from the
+    accelerations given by `derivatives` such that they match the model exactly.
+    """
+    a = y[3]
+
+    if mu_c == 0.0:
+        # Without friction in the cart, the friction in the joint is all there is
+        return (0.0, -mu_p * a)
+
+    derivs, _ = derivatives(0.0, y, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+    bdot = derivs[1]
+    adot = derivs[3]
+
+    c = cos(y[2])
+    s = sin(y[2])
+
+    return (
+        M * bdot + m_l * (adot * c - a ** 2 * s) - F,
+        m_l * bdot * c + 4 / 3 * m_p * l ** 2 * adot - m_l * g * s,
+    )
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def dissipated_power(
+    y: InternalState,
+    last_N_c: float,
+    F: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> float:
+    """
+    Power dissipated by the friction in the cart and the joint.
+
+    The friction branch is selected by the sign of `last_N_c` like in `derivatives`,
+    assuming the cart rests on the track if it is 0.
+    """
+    branch = 1.0 if last_N_c == 0.0 else copysign(1.0, last_N_c)
+    f_x, f_q = _friction_forces(y, branch, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    return -(f_x * y[1] + f_q * y[3])  # type: ignore
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def _momenta(
+    q: float, b: float, a: float, l: float, m_p: float, m_l: float, M: float
+) -> tuple[float, float]:
+    """
+    Canonical momenta conjugate to x and θ.
+    """
+    c = cos(q)
+
+    return (M * b + m_l * a * c, m_l * b * c + 4 / 3 * m_p * l ** 2 * a)
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def _velocities(
+    q: float, p_x: float, p_q: float, l: float, m_p: float, m_l: float, M: float
+) -> tuple[float, float]:
+    """
+    Inverse of `_momenta`, solving the 2x2 mass matrix for ẋ and θ̇.
+    """
+    c = cos(q)
+    inertia = 4 / 3 * m_p * l ** 2
+    det = M * inertia - (m_l * c) ** 2
+
+    return ((inertia * p_x - m_l * c * p_q) / det, (M * p_q - m_l * c * p_x) / det)
+
+
+# Fixed-step integrators
+#
+# These advance the state by a full agent step (`tau`) in `steps` substeps
+# inside a single compiled call, avoiding the Python-level ODE driver of
+# `scipy.integrate.solve_ivp` entirely.
+#
+# The friction branch is kept fixed within a substep. If the normal force
+# changes sign over a substep, the crossing is located by linear interpolation
+# and the substep is redone in two parts: up to the crossing on the old branch
+# and the remainder on the new branch, mirroring `DerivativesWrapper.solve`.
+FIXED_STEP_RK4 = 0
+FIXED_STEP_SEMI_IMPLICIT_EULER = 1
+FIXED_STEP_ENERGY_SPLITTING = 2
+
+FIXED_STEP_METHODS: dict[IntegratorOptions, int] = {
+    IntegratorOptions.RK4_FIXED: FIXED_STEP_RK4,
+    IntegratorOptions.SEMI_IMPLICIT_EULER: FIXED_STEP_SEMI_IMPLICIT_EULER,
+    IntegratorOptions.ENERGY_SPLITTING: FIXED_STEP_ENERGY_SPLITTING,
+}
+
+# Convergence criteria of the fixed-point iteration of the implicit midpoint rule
+IMPLICIT_MIDPOINT_TOLERANCE = 1e-13
+IMPLICIT_MIDPOINT_MAX_ITERATIONS = 20
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def _rk4_substep(
+    t: float,
+    y: InternalState,
+    h: float,
+    branch_N_c: float,
+    F: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> None:
+    """
+    Advances `y` in place by a single classical Runge-Kutta step of size `h`.
+    """
+    k1, _ = derivatives(t, y, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    y2 = (
+        y[0] + 0.5 * h * k1[0],
+        y[1] + 0.5 * h * k1[1],
+        y[2] + 0.5 * h * k1[2],
+        y[3] + 0.5 * h * k1[3],
+    )
+    k2, _ = derivatives(t + 0.5 * h, y2, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    y3 = (
+        y[0] + 0.5 * h * k2[0],
+        y[1] + 0.5 * h * k2[1],
+        y[2] + 0.5 * h * k2[2],
+        y[3] + 0.5 * h * k2[3],
+    )
+    k3, _ = derivatives(t + 0.5 * h, y3, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    y4 = (
+        y[0] + h * k3[0],
+        y[1] + h * k3[1],
+        y[2] + h * k3[2],
+        y[3] + h * k3[3],
+    )
+    k4, _ = derivatives(t + h, y4, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    for i in range(4):
+        y[i] += h / 6.0 * (k1[i] + 2.0 * k2[i] + 2.0 * k3[i] + k4[i])
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def _semi_implicit_euler_substep(
+    t: float,
+    y: InternalState,
+    h: float,
+    branch_N_c: float,
+    F: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> None:
+    """
+    Advances `y` in place by a single semi-implicit (symplectic) Euler step of size `h`.
+
+    Velocities are updated first and the new velocities are used for the positions.
+    """
+    derivs, _ = derivatives(t, y, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    y[1] += h * derivs[1]
+    y[3] += h * derivs[3]
+
+    y[0] += h * y[1]
+    y[2] += h * y[3]
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def _dissipative_substep(
+    x: float,
+    q: float,
+    p_x: float,
+    p_q: float,
+    h: float,
+    branch_N_c: float,
+    F: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> tuple[float, float]:
+    """
+    Advances the momenta by the friction forces alone, using the explicit midpoint rule.
+    """
+    b, a = _velocities(q, p_x, p_q, l, m_p, m_l, M)
+    f_x, f_q = _friction_forces((x, b, q, a), branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    b, a = _velocities(q, p_x + 0.5 * h * f_x, p_q + 0.5 * h * f_q, l, m_p, m_l, M)
+    f_x, f_q = _friction_forces((x, b, q, a), branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    return (p_x + h * f_x, p_q + h * f_q)
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def _conservative_substep(
+    x: float,
+    q: float,
+    p_x: float,
+    p_q: float,
+    h: float,
+    F: float,
+    g: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> tuple[float, float, float, float]:
+    """
+    Advances the frictionless system by the implicit midpoint rule in canonical coordinates.
+
+    The midpoint is found by fixed-point iteration, which converges quickly for
+    the substeps used by the agents.
+    """
+    q_mid = q
+    p_q_mid = p_q
+    p_x_mid = p_x + 0.5 * h * F
+
+    for _ in range(IMPLICIT_MIDPOINT_MAX_ITERATIONS):
+        b, a = _velocities(q_mid, p_x_mid, p_q_mid, l, m_p, m_l, M)
+
+        new_q_mid = q + 0.5 * h * a
+        new_p_q_mid = p_q + 0.5 * h * m_l * sin(q_mid) * (g - b * a)
+
+        converged = abs(new_q_mid - q_mid) <= IMPLICIT_MIDPOINT_TOLERANCE * (
+            1.0 + abs(q_mid)
+        ) and abs(new_p_q_mid - p_q_mid) <= IMPLICIT_MIDPOINT_TOLERANCE * (1.0 + abs(p_q_mid))
+
+        q_mid = new_q_mid
+        p_q_mid = new_p_q_mid
+
+        if converged:
+            break
+
+    b, _ = _velocities(q_mid, p_x_mid, p_q_mid, l, m_p, m_l, M)
+    x_mid = x + 0.5 * h * b
+
+    return (2.0 * x_mid - x, 2.0 * q_mid - q, 2.0 * p_x_mid - p_x, 2.0 * p_q_mid - p_q)
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def _energy_splitting_substep(
+    t: float,
+    y: InternalState,
+    h: float,
+    branch_N_c: float,
+    F: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> None:
+    """
+    Advances `y` in place by a single energy-tracking splitting step of size `h`.
+
+    The conservative part of the dynamics, including the applied force, is advanced by
+    the symplectic implicit midpoint rule, keeping the error of the energy bounded
+    rather than letting it drift over long episodes. The friction is applied in two
+    half-steps on either side (Strang splitting).
+    """
+    x = y[0]
+    q = y[2]
+    p_x, p_q = _momenta(q, y[1], y[3], l, m_p, m_l, M)
+
+    p_x, p_q = _dissipative_substep(
+        x, q, p_x, p_q, 0.5 * h, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M
+    )
+    x, q, p_x, p_q = _conservative_substep(x, q, p_x, p_q, h, F, g, l, m_p, m_l, M)
+    p_x, p_q = _dissipative_substep(
+        x, q, p_x, p_q, 0.5 * h, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M
+    )
+
+    b, a = _velocities(q, p_x, p_q, l, m_p, m_l, M)
+
+    y[0] = x
+    y[1] = b
+    y[2] = q
+    y[3] = a
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def _substep(
+    method: int,
+    t: float,
+    y: InternalState,
+    h: float,
+    branch_N_c: float,
+    F: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> float:
+    """
+    Advances `y` in place by a single substep on the friction branch of `branch_N_c`.
+
+    Returns the normal force at the end of the substep on the same branch.
+    """
+    if method == FIXED_STEP_RK4:
+        _rk4_substep(t, y, h, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+    elif method == FIXED_STEP_ENERGY_SPLITTING:
+        _energy_splitting_substep(t, y, h, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+    else:
+        _semi_implicit_euler_substep(t, y, h, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    _, new_N_c = derivatives(t + h, y, branch_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    return new_N_c  # type: ignore
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def advance_fixed_step(
+    method: int,
+    y: InternalState,
+    tau: float,
+    steps: int,
+    last_N_c: float,
+    F: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> float:
+    """
+    In-place version of `integrate_fixed_step`.
+
+    Advances `y` by `tau` seconds and returns the magnitude of the normal force
+    of the cart at the end of the step, signed by the final friction branch.
+    """
+    h = tau / steps
+
+    if last_N_c == 0.0:
+        # No previous step to take the branch from, so assume the cart rests on the track
+        _, last_N_c = derivatives(0.0, y, 1.0, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    branch = copysign(1.0, last_N_c)
+    _, N_c_ = derivatives(0.0, y, branch, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    for i in range(steps):
+        t = i * h
+        y_start = (y[0], y[1], y[2], y[3])
+
+        new_N_c = _substep(method, t, y, h, branch, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+        # Right after a switch the normal force may briefly have the sign of the
+        # old branch, so only crossings leaving the current branch count
+        if sgn(N_c_) == branch and sgn(new_N_c) != branch:
+            # Fraction of the substep at which the normal force crosses zero
+            s = min(max(N_c_ / (N_c_ - new_N_c), 0.0), 1.0)
+
+            for j in range(4):
+                y[j] = y_start[j]
+
+            _substep(method, t, y, s * h, branch, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+            branch = -branch
+            new_N_c = _substep(
+                method, t + s * h, y, (1.0 - s) * h, branch, F, g, mu_c, mu_p, l, m_p, m_l, M
+            )
+
+        N_c_ = new_N_c
+
+    return copysign(N_c_, branch)
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def integrate_fixed_step(
+    method: int,
+    y0: InternalState,
+    tau: float,
+    steps: int,
+    last_N_c: float,
+    F: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> tuple[InternalState, float]:
+    """
+    Integrates the system over `tau` seconds using `steps` fixed substeps.
+
+    Args:
+        method: One of the values of `FIXED_STEP_METHODS`
+        y0: Initial state, not modified
+        tau: Total time to integrate over
+        steps: Number of substeps to divide `tau` into
+        last_N_c: Normal force of the cart at the end of the previous step, whose sign
+            selects the friction branch, or 0 if there is no previous step
+
+    Returns:
+        A tuple of the new state and the normal force of the cart at the end of the step,
+        signed by the final friction branch.
+    """
+    y = y0.copy()
+    N_c_ = advance_fixed_step(method, y, tau, steps, last_N_c, F, g, mu_c, mu_p, l, m_p, m_l, M)
+
+    return (y, N_c_)
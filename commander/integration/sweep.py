@@ -0,0 +1,268 @@
+"""
+Contains tools for sweeping the physical parameters of the cartpole.
+
+Every configuration of physical parameters is integrated from every initial
+state using the compiled fixed-step integrators, in parallel over all cores.
+
+Trajectories are written chunk by chunk to a `.npy` file that is memory mapped,
+such that sweeps much larger than the available memory can be done and later
+read back lazily using `load_sweep`.
+"""
+
+import logging
+from collections.abc import Mapping, Sequence
+from itertools import product
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from numba import jit, prange
+
+from commander.constants import FLOAT_TYPE
+from commander.integration.constants import IntegratorOptions
+from commander.integration.equations import FIXED_STEP_METHODS, advance_fixed_step
+
+logger = logging.getLogger(__name__)
+
+_NUMBA_PARALLEL_OPTIONS = {
+    "nopython": True,
+    "nogil": True,
+    "cache": True,
+    "parallel": True,
+}
+
+FloatArray = npt.NDArray[FLOAT_TYPE]
+
+TRAJECTORIES_FILENAME = "trajectories.npy"
+PARAMETERS_FILENAME = "parameters.npz"
+
+# Parameters that can be swept and their defaults, in the column order used by
+# `integrate_sweep`. Force is a constant force applied to the cart.
+SWEEP_PARAMETERS: dict[str, float] = {
+    "grav_acc": 9.8,  # m/s^2
+    "mass_cart": 5.0,  # kg
+    "mass_pole": 0.1,  # kg
+    "friction_cart": 0.01,  # coefficient
+    "friction_pole": 0.001,  # coefficient
+    "pole_length": 1.0,  # m
+    "force": 0.0,  # N
+}
+
+# Upper bound on the size of the trajectories of a single chunk held in memory
+DEFAULT_MAX_CHUNK_BYTES = 256 * 1024 ** 2
+
+
+@jit(**_NUMBA_PARALLEL_OPTIONS)  # type: ignore
+def integrate_sweep(
+    method: int,
+    parameters: FloatArray,
+    initial_states: FloatArray,
+    trajectories: FloatArray,
+    tau: float,
+    resolution: int,
+    record_every: int,
+) -> None:
+    """
+    Integrates every row of `parameters` from every row of `initial_states`.
+
+    Args:
+        method: One of the values of `FIXED_STEP_METHODS`
+        parameters: `(N, 7)` array with columns in the order of `SWEEP_PARAMETERS`
+        initial_states: `(S, 4)` array of initial states
+        trajectories: `(N, S, R + 1, 4)` output array, where `R` is the number
+            of recorded states after the initial state
+        tau: Duration of a step
+        resolution: Number of substeps per step
+        record_every: Number of steps between recorded states
+    """
+    n_configurations = trajectories.shape[0]
+    n_states = trajectories.shape[1]
+    n_records = trajectories.shape[2] - 1
+
+    for k in prange(n_configurations * n_states):
+        i = k // n_states
+        j = k % n_states
+
+        g = parameters[i, 0]
+        m_p = parameters[i, 2]
+        mu_c = parameters[i, 3]
+        mu_p = parameters[i, 4]
+        l = parameters[i, 5]
+        F = parameters[i, 6]
+
+        m_l = m_p * l
+        M = parameters[i, 1] + m_p
+
+        y = initial_states[j].copy()
+        trajectories[i, j, 0] = y
+
+        N_c_ = 0.0
+        for r in range(1, n_records + 1):
+            for _ in range(record_every):
+                N_c_ = advance_fixed_step(
+                    method, y, tau, resolution, N_c_, F, g, mu_c, mu_p, l, m_p, m_l, M
+                )
+
+            trajectories[i, j, r] = y
+
+
+def _check_parameter_names(names: Sequence[str]) -> None:
+    unknown = set(names) - SWEEP_PARAMETERS.keys()
+
+    if unknown:
+        raise ValueError(
+            f"Unknown parameters: {', '.join(sorted(unknown))}. "
+            f"Expected any of: {', '.join(SWEEP_PARAMETERS)}"
+        )
+
+
+def parameter_grid(values: Mapping[str, Sequence[float]]) -> dict[str, FloatArray]:
+    """
+    Builds the cartesian product of the given parameter values.
+
+    Returns:
+        A dictionary of one flat array per parameter, with one entry per configuration.
+    """
+    _check_parameter_names(list(values.keys()))
+
+    grid = np.array(list(product(*values.values())), dtype=FLOAT_TYPE)
+    grid = grid.reshape(-1, len(values))
+
+    return {name: np.ascontiguousarray(grid[:, i]) for i, name in enumerate(values.keys())}
+
+
+def sample_parameters(
+    n: int, ranges: Mapping[str, tuple[float, float]], seed: Optional[int] = None
+) -> dict[str, FloatArray]:
+    """
+    Samples `n` configurations with parameters drawn uniformly from the given ranges.
+
+    Returns:
+        A dictionary of one flat array per parameter, with one entry per configuration.
+    """
+    _check_parameter_names(list(ranges.keys()))
+
+    rng = np.random.default_rng(seed)
+
+    return {
+        name: rng.uniform(low, high, size=n).astype(FLOAT_TYPE)
+        for name, (low, high) in ranges.items()
+    }
+
+
+def sweep(
+    path: Path,
+    parameters: Mapping[str, npt.ArrayLike],
+    initial_states: npt.ArrayLike,
+    steps: int,
+    tau: float = 0.02,
+    integrator: IntegratorOptions = IntegratorOptions.RK4_FIXED,
+    integration_resolution: int = 2,
+    record_every: int = 1,
+    max_chunk_bytes: int = DEFAULT_MAX_CHUNK_BYTES,
+) -> Path:
+    """
+    Integrates all combinations of parameter configurations and initial states.
+
+    The trajectories are written to `path / TRAJECTORIES_FILENAME` as a
+    `(N, S, R + 1, 4)` array, where `N` is the number of configurations, `S` the
+    number of initial states and `R = steps // record_every`. The parameters of
+    every configuration along with the settings of the sweep are written
+    to `path / PARAMETERS_FILENAME`.
+
+    Args:
+        path: Directory to write the sweep to
+        parameters: Flat arrays of equal length with one entry per configuration, as
+            produced by `parameter_grid` or `sample_parameters`. Parameters that are
+            left out take the values given in `SWEEP_PARAMETERS`.
+        initial_states: `(S, 4)` array of initial states, or a single state
+        steps: Number of steps of `tau` seconds to integrate for
+        record_every: Number of steps between recorded states
+        max_chunk_bytes: Upper bound on the memory used for trajectories at a time
+
+    Returns:
+        The directory of the sweep.
+    """
+    if integrator not in FIXED_STEP_METHODS:
+        raise ValueError(f"Integrator {integrator} is not a fixed-step integrator.")
+
+    if steps % record_every != 0:
+        raise ValueError(f"Steps ({steps}) must be a multiple of record_every ({record_every})")
+
+    _check_parameter_names(list(parameters.keys()))
+
+    lengths = {np.size(values) for values in parameters.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Parameter arrays must have equal lengths, got {lengths}")
+
+    n_configurations = lengths.pop() if lengths else 1
+
+    columns = np.empty((n_configurations, len(SWEEP_PARAMETERS)), dtype=FLOAT_TYPE)
+    for i, (name, default) in enumerate(SWEEP_PARAMETERS.items()):
+        columns[:, i] = np.ravel(parameters.get(name, default))
+
+    initial_states_ = np.atleast_2d(np.asarray(initial_states, dtype=FLOAT_TYPE))
+    n_states = initial_states_.shape[0]
+    n_records = steps // record_every
+
+    path.mkdir(parents=True, exist_ok=True)
+
+    np.savez(
+        path / PARAMETERS_FILENAME,
+        initial_states=initial_states_,
+        steps=steps,
+        tau=tau,
+        integrator=integrator.value,
+        integration_resolution=integration_resolution,
+        record_every=record_every,
+        **{name: columns[:, i] for i, name in enumerate(SWEEP_PARAMETERS)},
+    )
+
+    trajectories = np.lib.format.open_memmap(
+        path / TRAJECTORIES_FILENAME,
+        mode="w+",
+        dtype=FLOAT_TYPE,
+        shape=(n_configurations, n_states, n_records + 1, 4),
+    )
+
+    configuration_bytes = n_states * (n_records + 1) * 4 * np.dtype(FLOAT_TYPE).itemsize
+    chunk_size = max(1, min(n_configurations, max_chunk_bytes // configuration_bytes))
+
+    chunk = np.empty((chunk_size, n_states, n_records + 1, 4), dtype=FLOAT_TYPE)
+
+    for start in range(0, n_configurations, chunk_size):
+        stop = min(start + chunk_size, n_configurations)
+
+        integrate_sweep(
+            FIXED_STEP_METHODS[integrator],
+            columns[start:stop],
+            initial_states_,
+            chunk[: stop - start],
+            tau,
+            integration_resolution,
+            record_every,
+        )
+
+        trajectories[start:stop] = chunk[: stop - start]
+        trajectories.flush()
+
+        logger.info("Swept %d/%d configurations", stop, n_configurations)
+
+    del trajectories
+
+    return path
+
+
+def load_sweep(path: Path) -> tuple[np.memmap, dict[str, npt.NDArray[np.generic]]]:
+    """
+    Loads a sweep written by `sweep`.
+
+    Returns:
+        A tuple of the memory mapped trajectories and the parameters of the sweep.
+    """
+    trajectories = np.load(path / TRAJECTORIES_FILENAME, mmap_mode="r")
+
+    with np.load(path / PARAMETERS_FILENAME) as parameters:
+        return (trajectories, dict(parameters))
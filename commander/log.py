@@ -6,6 +6,7 @@ from commander.network.protocol import (
     DebugPacket,
     ErrorPacket,
     InfoPacket,
+    ObservationBatchPacket,
     ObservationPacket,
     Packet,
     SetVelocityPacket,
@@ -72,6 +73,7 @@ def setup_logging(
             [
                 SetVelocityPacket,
                 ObservationPacket,
+                ObservationBatchPacket,
             ]
         )
 
@@ -1,10 +1,9 @@
-from typing import Any, Type
-
 from commander.ml.agent.agent import (
     CartpoleAgent,
     ExperimentalCartpoleAgent,
     SimulatedCartpoleAgent,
 )
+from commander.ml.agent.composition import make_agent, make_agent_class
 from commander.ml.agent.goal import AgentGoalMixinBase, AgentSwingupGoalMixin, AgentTimeGoalMixin
 from commander.ml.agent.state_specification import (
     AgentPositionalKnowledgeStateSpecification,
@@ -13,23 +12,9 @@ from commander.ml.agent.state_specification import (
 )
 
 
-# Any to stop 'only concrete class can be given' mypy error.
-# See: https://github.com/python/mypy/issues/5374
-def make_agent(
-    agent: Any,
-    state_spec: Type[AgentStateSpecificationBase],
-    goal: Any,
-    *args: Any,
-    **kwargs: Any,
-) -> CartpoleAgent:
-    class Agent(goal, state_spec, agent):  # type: ignore [valid-type, misc]
-        ...
-
-    return Agent(*args, **kwargs)
-
-
 __all__ = (
     "make_agent",
+    "make_agent_class",
     "CartpoleAgent",
     "SimulatedCartpoleAgent",
     "ExperimentalCartpoleAgent",
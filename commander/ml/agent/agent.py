@@ -9,22 +9,35 @@ from time import sleep, time
 from typing import TYPE_CHECKING, Any, Deque, Optional, Type, TypeVar, cast
 
 import numpy as np
+import numpy.typing as npt
 
 from gym import spaces
 from gym.utils import seeding
 
-from scipy.integrate import solve_ivp
-
 from commander.constants import FLOAT_TYPE
 from commander.experiment import ExperimentState
-from commander.integration import DerivativesWrapper, IntegratorOptions
+from commander.integration import (
+    FIXED_STEP_METHODS,
+    DerivativesWrapper,
+    IntegratorOptions,
+    dissipated_power,
+    energy,
+    integrate_fixed_step,
+)
+from commander.integration.equations import PhysicalParams
 from commander.ml.agent.constants import ExternalStateIdx, ExternalStateMap, InternalStateIdx
-from commander.ml.agent.type_aliases import GoalParams
+from commander.ml.agent.rollout import simulate_rollout, simulate_rollout_batch
+from commander.ml.agent.type_aliases import GoalKernelSpec, GoalParams
 from commander.ml.constants import Action, FailureDescriptors
 from commander.ml.display import rendering
 from commander.network import NetworkManager
 from commander.network.constants import DEFAULT_BAUDRATE, DEFAULT_PORT, CartID, SetOperation
-from commander.network.protocol import CartSpecificPacket, ObservationPacket, SetVelocityPacket
+from commander.network.protocol import (
+    CartSpecificPacket,
+    ObservationBatchPacket,
+    ObservationPacket,
+    SetVelocityPacket,
+)
 from commander.type_aliases import ExternalState, InternalState, StateChecks, StepInfo
 from commander.utils import FrequencyTicker
 
@@ -272,12 +285,37 @@ class CartpoleAgent(ABC):
         Allows mixins to do stuff after steps.
         """
 
+    def goal_kernel_spec(self) -> GoalKernelSpec:
+        """
+        Returns the compiled equivalent of `reward` and `_check_state` for use in rollouts
+        as a tuple of one of the `GOAL_KERNEL_*` constants and the goal parameters.
+
+        See `commander.ml.agent.goal_kernels`.
+
+        This should be implemented by the AgentGoalMixin.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not provide a goal kernel.")
+
+    def goal_kernel_state(self) -> float:
+        """
+        Returns the current state of the goal in the form used by the goal kernel.
+        """
+        return 0.0
+
+    def set_goal_kernel_state(self, goal_state: float) -> None:
+        """
+        Restores the state of the goal from the form returned by `goal_kernel_state`.
+        """
+
 
 class SimulatedCartpoleAgent(CartpoleAgent):
     """
     Class for a simulated cartpole agent.
     """
 
+    # State, normal force, goal state and energy balance, see `get_snapshot`
+    SNAPSHOT_SIZE = 9
+
     def __init__(
         self,
         name: str = "Cartpole_1",
@@ -301,6 +339,7 @@ class SimulatedCartpoleAgent(CartpoleAgent):
         integration_resolution: int = 100,  # number of steps to subdivide tau into
         max_steps: int = 2500,
         goal_params: Optional[GoalParams] = None,
+        track_energy: bool = False,  # report the energy drift of the episode in the step info
     ) -> None:
 
         self.grav_acc = grav_acc
@@ -326,10 +365,40 @@ class SimulatedCartpoleAgent(CartpoleAgent):
         self.integrator = integrator
         self.integration_resolution = integration_resolution
 
+        self.track_energy = track_energy
+        self._initial_energy = 0.0
+        self._external_work = 0.0
+        self._dissipated_work = 0.0
+
+        # See `bind_state`
+        self._state_row: Optional[InternalState] = None
+
         super().__init__(
             name=name, pole_length=pole_length, max_steps=max_steps, goal_params=goal_params
         )
 
+    def bind_state(self, state_row: InternalState) -> None:
+        """
+        Keeps the state of the agent in `state_row` from now on, e.g. a row of the
+        states of a `BatchedCartpolePhysics`, which can then advance the agent in place.
+
+        The row is written into rather than replaced, so it stays bound across steps,
+        resets and snapshots.
+        """
+        if self._state is not None:
+            state_row[:] = self._state
+
+            self._state = state_row
+
+        self._state_row = state_row
+
+    def _set_state(self, state: InternalState) -> None:
+        if self._state_row is None:
+            self._state = state
+        else:
+            self._state_row[:] = state
+            self._state = self._state_row
+
     def _make_random_symmetrical(
         self, mean: float, spread: float, minimum: float, maximum: float
     ) -> InternalState:
@@ -340,10 +409,12 @@ class SimulatedCartpoleAgent(CartpoleAgent):
         return cast(InternalState, new_state)
 
     def setup(self) -> None:
-        self.derivatives_wrapper = DerivativesWrapper()
+        # Note: physical parameters are baked into the derivatives here,
+        # changing them after setup requires calling setup again.
+        self.derivatives_wrapper = DerivativesWrapper(self.physical_params)
 
     def _reset(self) -> ExternalState:
-        self._state = np.array(
+        state = np.array(
             [
                 self._make_random_symmetrical(
                     self.start_pos,
@@ -372,8 +443,15 @@ class SimulatedCartpoleAgent(CartpoleAgent):
             ],
         )
 
+        self._set_state(state)
+
         self.derivatives_wrapper.reset()
 
+        if self.track_energy:
+            self._initial_energy = energy(self._state, *self.physical_params)
+            self._external_work = 0.0
+            self._dissipated_work = 0.0
+
         return self.observe()
 
     def _step(self, action: Action) -> StepInfo:
@@ -396,43 +474,197 @@ class SimulatedCartpoleAgent(CartpoleAgent):
             raise ValueError(f"Action {action} not in action space. Invalid.")
 
         # Resolve direction of force
-        force = self.force_mag if action == 1 else -self.force_mag
+        force = self.resolve_force(action)
+
+        assert self._state is not None
+
+        # A bound state is updated in place
+        previous_state = self._state if self._state_row is None else self._state.copy()
+        previous_N_c = self.derivatives_wrapper.last_N_c
 
         # Update state
-        self._state = self._integrate(
-            IntegratorOptions.RK45, (0, self.tau), self.tau / self.integration_resolution, force
-        )
+        if self.integrator in FIXED_STEP_METHODS:
+            self._set_state(self._integrate_fixed_step(self.integrator, self.tau, force))
+        else:
+            self._set_state(self._integrate(self.integrator, (0, self.tau), force))
+
+        return self.make_step_info(previous_state, previous_N_c, force)
 
+    def resolve_force(self, action: Action) -> float:
+        """
+        The force applied to the cart by `action`.
+        """
+        return self.force_mag if action == 1 else -self.force_mag
+
+    def make_step_info(
+        self, previous_state: InternalState, previous_N_c: float, force: float
+    ) -> StepInfo:
+        """
+        The info of a step from `previous_state` to the current state.
+
+        Also used by the environments that step the physics of their agents in a batch.
+        """
         info: StepInfo = {}
 
+        if self.track_energy:
+            self._update_energy_balance(previous_state, previous_N_c, force)
+            info["energy_drift"] = self.energy_drift
+
         return info
 
+    def _update_energy_balance(
+        self, previous_state: InternalState, previous_N_c: float, force: float
+    ) -> None:
+        """
+        Accounts for the work done on the cartpole over the last step.
+
+        The force is constant over the step, so its work is exact, whereas the work of the
+        friction is integrated using the trapezoidal rule.
+        """
+        assert self._state is not None
+
+        params = self.physical_params
+
+        self._external_work += force * (self._state[0] - previous_state[0])
+        self._dissipated_work += (
+            0.5
+            * self.tau
+            * (
+                dissipated_power(previous_state, previous_N_c, force, *params)
+                + dissipated_power(self._state, self.derivatives_wrapper.last_N_c, force, *params)
+            )
+        )
+
+    @property
+    def energy_drift(self) -> float:
+        """
+        Numerical drift of the energy over the episode, only tracked if `track_energy` is set.
+
+        This is the change in energy which is not explained by the work done on the cartpole by
+        the applied force and the friction. For an exact integrator it is zero up to the error
+        of the quadrature of the friction.
+        """
+        assert self._state is not None
+
+        current_energy = energy(self._state, *self.physical_params)
+
+        return float(
+            current_energy - self._initial_energy - self._external_work + self._dissipated_work
+        )
+
     def _integrate(
-        self, method: IntegratorOptions, t_span: tuple[float, float], t_step: float, force: float
+        self, method: IntegratorOptions, t_span: tuple[float, float], force: float
     ) -> InternalState:
-        t = np.arange(t_span[0], t_span[1], t_step)
-        sol = solve_ivp(
-            fun=self.derivatives_wrapper.equation,
-            t_span=t_span,
-            y0=self._state,
-            method=method,
-            t_eval=t,
-            args=(
-                force,
-                self.grav_acc,
-                self.friction_cart,
-                self.friction_pole,
-                self.pole_length,
-                self.mass_pole,
-                self.mass_length,
-                self.mass,
-            ),
-        )
+        assert self._state is not None
 
-        new_state = cast(InternalState, np.fromiter((x[-1] for x in sol.y), FLOAT_TYPE))
+        new_state, _ = self.derivatives_wrapper.solve(method, t_span, self._state, force)
 
         return new_state
 
+    def _integrate_fixed_step(
+        self, method: IntegratorOptions, tau: float, force: float
+    ) -> InternalState:
+        """
+        Integrates using one of the compiled fixed-step integrators.
+
+        The whole step of `tau` seconds is done in a single compiled call with
+        `integration_resolution` substeps.
+        """
+        assert self._state is not None
+
+        new_state, self.derivatives_wrapper.last_N_c = integrate_fixed_step(
+            FIXED_STEP_METHODS[method],
+            self._state,
+            tau,
+            self.integration_resolution,
+            self.derivatives_wrapper.last_N_c,
+            force,
+            *self.physical_params,
+        )
+
+        return cast(InternalState, new_state)
+
+    def rollout(
+        self,
+        actions: npt.ArrayLike,
+        state0: Optional[InternalState] = None,
+        integrator: Optional[IntegratorOptions] = None,
+    ) -> tuple[npt.NDArray[FLOAT_TYPE], npt.NDArray[FLOAT_TYPE], npt.NDArray[np.bool_]]:
+        """
+        Simulates an open-loop sequence of actions without changing the agent.
+
+        The rollout runs entirely in compiled code, using a fixed-step integrator
+        for the physics and the goal kernel of the agent (see `goal_kernel_spec`)
+        for the rewards and termination. Step counts and goal state are taken
+        from the agent, such that the rollout continues the current episode.
+
+        Args:
+            actions: Either a single sequence of `T` actions or a `(K, T)` batch
+                of sequences, which are simulated in parallel.
+            state0: Initial internal state. Defaults to the current state.
+            integrator: Fixed-step integrator to use. Defaults to the integrator
+                of the agent if it is a fixed-step one and RK4_FIXED otherwise.
+
+        Returns:
+            A tuple of the states with shape `(..., T + 1, 4)` including the initial
+            state, and the rewards and dones with shape `(..., T)`.
+            Once done, the state is held, the reward is 0 and the rollout remains done.
+        """
+        actions_ = np.asarray(actions, dtype=np.int64)
+
+        if actions_.ndim not in (1, 2):
+            raise ValueError(f"Expected actions of shape (T,) or (K, T), got {actions_.shape}")
+
+        if not ((actions_ == 0) | (actions_ == 1)).all():
+            raise ValueError("Actions not in action space. Invalid.")
+
+        if integrator is None:
+            integrator = (
+                self.integrator
+                if self.integrator in FIXED_STEP_METHODS
+                else IntegratorOptions.RK4_FIXED
+            )
+        elif integrator not in FIXED_STEP_METHODS:
+            raise ValueError(f"Integrator {integrator} is not a fixed-step integrator.")
+
+        if state0 is None:
+            assert self._state is not None
+
+            state0 = self._state
+            last_N_c = self.derivatives_wrapper.last_N_c
+        else:
+            last_N_c = 0.0
+
+        *batch_shape, T = actions_.shape
+
+        states = np.empty((*batch_shape, T + 1, 4), dtype=FLOAT_TYPE)
+        rewards = np.empty(actions_.shape, dtype=FLOAT_TYPE)
+        dones = np.empty(actions_.shape, dtype=np.bool_)
+
+        states[..., 0, :] = state0
+
+        goal, goal_params = self.goal_kernel_spec()
+
+        (simulate_rollout if actions_.ndim == 1 else simulate_rollout_batch)(
+            FIXED_STEP_METHODS[integrator],
+            states,
+            rewards,
+            dones,
+            actions_,
+            last_N_c,
+            self.steps,
+            self.max_steps,
+            goal,
+            goal_params,
+            self.goal_kernel_state(),
+            self.tau,
+            self.integration_resolution,
+            self.force_mag,
+            *self.physical_params,
+        )
+
+        return (states, rewards, dones)
+
     @property
     def mass(self) -> float:
         return self.mass_cart + self.mass_pole
@@ -441,6 +673,47 @@ class SimulatedCartpoleAgent(CartpoleAgent):
     def mass_length(self) -> float:
         return self.mass_pole * self.pole_length
 
+    @property
+    def physical_params(self) -> PhysicalParams:
+        """
+        The physical parameters in the order expected by `derivatives`.
+        """
+        return (
+            self.grav_acc,
+            self.friction_cart,
+            self.friction_pole,
+            self.pole_length,
+            self.mass_pole,
+            self.mass_length,
+            self.mass,
+        )
+
+    def get_snapshot(self, out: npt.NDArray[FLOAT_TYPE]) -> None:
+        """
+        Writes the dynamic state of the agent to `out`, see `SNAPSHOT_SIZE`.
+
+        The step counter and the random number generator are not included.
+        """
+        assert self._state is not None
+
+        out[:4] = self._state
+        out[4] = self.derivatives_wrapper.last_N_c
+        out[5] = self.goal_kernel_state()
+        out[6] = self._initial_energy
+        out[7] = self._external_work
+        out[8] = self._dissipated_work
+
+    def set_snapshot(self, snapshot: npt.NDArray[FLOAT_TYPE]) -> None:
+        """
+        Restores the dynamic state of the agent written by `get_snapshot`.
+        """
+        self._set_state(snapshot[:4].copy())
+        self.derivatives_wrapper.last_N_c = float(snapshot[4])
+        self.set_goal_kernel_state(float(snapshot[5]))
+        self._initial_energy = float(snapshot[6])
+        self._external_work = float(snapshot[7])
+        self._dissipated_work = float(snapshot[8])
+
 
 class ExperimentalCartpoleAgent(CartpoleAgent):
     network_manager: NetworkManager
@@ -516,43 +789,103 @@ class ExperimentalCartpoleAgent(CartpoleAgent):
 
     def absorb_packet(self, packet: CartSpecificPacket) -> None:
         if isinstance(packet, ObservationPacket):
-            # Max value of uint32_t: 4_294_967_295
-            has_rolled_over = self.last_observation_time - packet.timestamp_micros > 1_000_000_000
-
-            if has_rolled_over or packet.timestamp_micros > self.last_observation_time:
-                self.env: ExperimentalCartpoleEnv
-
-                if (
-                    (observation_interval := packet.timestamp_micros - self.last_observation_time)
-                    > self.observation_maximum_interval
-                    and self.last_observation_time != 0
-                    and self.env.environment_state["experiment_state"] != ExperimentState.ENDING
-                    and self.env.environment_state["experiment_state"] != ExperimentState.RESETTING
-                ):
-                    logger.warn(
-                        "Observation interval too long: %s > %s",
-                        observation_interval,
-                        self.observation_maximum_interval,
-                    )
-
-                self.last_observation_time = packet.timestamp_micros
-                self.last_observation_interval = observation_interval / 1e6  # μs -> s
-
-                x = packet.position_steps
-                theta = radians(packet.angle) - self.angle_offset
-
-                self._state = np.array(
-                    (
-                        x,
-                        theta,
-                    )
-                )
+            self._absorb_observation(packet.timestamp_micros, packet.position_steps, packet.angle)
 
-                self.observation_buffer.append(self.observe())
+        elif isinstance(packet, ObservationBatchPacket):
+            self._absorb_observations(packet.observations)
 
         else:
             raise TypeError(f"Agent does not handle {type(packet)}")
 
+    def _check_observation_interval(self, observation_interval: int) -> None:
+        self.env: ExperimentalCartpoleEnv
+
+        if (
+            observation_interval > self.observation_maximum_interval
+            and self.env.environment_state["experiment_state"] != ExperimentState.ENDING
+            and self.env.environment_state["experiment_state"] != ExperimentState.RESETTING
+        ):
+            logger.warn(
+                "Observation interval too long: %s > %s",
+                observation_interval,
+                self.observation_maximum_interval,
+            )
+
+    def _absorb_observation(self, timestamp_micros: int, position_steps: int, angle: float) -> None:
+        # Max value of uint32_t: 4_294_967_295
+        has_rolled_over = self.last_observation_time - timestamp_micros > 1_000_000_000
+
+        if has_rolled_over or timestamp_micros > self.last_observation_time:
+            observation_interval = timestamp_micros - self.last_observation_time
+
+            if self.last_observation_time != 0:
+                self._check_observation_interval(observation_interval)
+
+            self.last_observation_time = timestamp_micros
+            self.last_observation_interval = observation_interval / 1e6  # μs -> s
+
+            x = position_steps
+            theta = radians(angle) - self.angle_offset
+
+            self._state = np.array(
+                (
+                    x,
+                    theta,
+                )
+            )
+
+            self.observation_buffer.append(self.observe())
+
+    def _absorb_observations(self, observations: npt.NDArray[np.void]) -> None:
+        """
+        Absorbs a structured array of observations like `_absorb_observation` does one by one.
+        """
+        if len(observations) == 0:
+            return
+
+        timestamps = observations["timestamp_micros"].astype(np.int64)
+
+        previous_timestamps = np.empty_like(timestamps)
+        previous_timestamps[0] = self.last_observation_time
+        previous_timestamps[1:] = timestamps[:-1]
+
+        # Max value of uint32_t: 4_294_967_295
+        has_rolled_over = previous_timestamps - timestamps > 1_000_000_000
+
+        if not np.all(has_rolled_over | (timestamps > previous_timestamps)):
+            # Some observations are out of order, and are only dropped when absorbed in order
+            for _, timestamp_micros, _, position_steps, angle in observations.tolist():
+                self._absorb_observation(timestamp_micros, position_steps, angle)
+
+            return
+
+        observation_intervals = timestamps - previous_timestamps
+
+        for observation_interval in observation_intervals[
+            (observation_intervals > self.observation_maximum_interval) & (previous_timestamps != 0)
+        ].tolist():
+            self._check_observation_interval(observation_interval)
+
+        self.last_observation_time = int(timestamps[-1])
+        self.last_observation_interval = int(observation_intervals[-1]) / 1e6  # μs -> s
+
+        # Older observations would be pushed out of the observation buffer anyway
+        kept = slice(-cast(int, self.observation_buffer.maxlen), None)
+
+        xs = observations["position_steps"][kept].tolist()
+        angles = observations["angle"][kept].astype(np.float64)
+        thetas = (np.radians(angles) - self.angle_offset).tolist()
+
+        for x, theta in zip(xs, thetas):
+            self._state = np.array(
+                (
+                    x,
+                    theta,
+                )
+            )
+
+            self.observation_buffer.append(self.observe())
+
     def is_settled(self) -> bool:
         """
         Returns True if the cart is considered settled."""
@@ -0,0 +1,114 @@
+"""
+Contains the composition of agent classes from an agent, a state specification and a goal.
+
+Composed classes are memoised, such that every combination is a single class, and
+registered in this module under a stable name. Instances are pickled by recomposing
+their class, so they can be sent to worker processes, copied and checkpointed.
+"""
+
+import types
+from typing import Any, Optional, Type
+
+from commander.ml.agent.agent import CartpoleAgent
+from commander.ml.agent.constants import InternalStateIdx
+from commander.ml.agent.goal import AgentGoalMixinBase
+from commander.ml.agent.state_specification import AgentStateSpecificationBase
+
+AgentClassKey = tuple[
+    Type[AgentGoalMixinBase],
+    Type[AgentStateSpecificationBase],
+    Type[CartpoleAgent],
+    Optional[Type[InternalStateIdx]],
+]
+
+_AGENT_CLASSES: dict[AgentClassKey, Type[CartpoleAgent]] = {}
+
+
+def _get_internal_state_idx(
+    state_spec: Type[AgentStateSpecificationBase],
+) -> Optional[Type[InternalStateIdx]]:
+    """
+    The internal state index given to the state specification by `make_state_spec`, if any.
+    """
+    internal_state_idx = getattr(state_spec, "internal_state_idx", None)
+
+    return internal_state_idx if isinstance(internal_state_idx, type) else None
+
+
+def _reduce_agent(agent: CartpoleAgent) -> tuple[Any, ...]:
+    return (_rebuild_agent, type(agent)._key, agent.__getstate__())  # type: ignore[attr-defined]
+
+
+def _rebuild_agent(
+    goal: Type[AgentGoalMixinBase],
+    state_spec: Type[AgentStateSpecificationBase],
+    agent: Type[CartpoleAgent],
+    internal_state_idx: Optional[Type[InternalStateIdx]],
+) -> CartpoleAgent:
+    """
+    Creates an uninitialised agent of a composed class, for unpickling.
+    """
+    cls = _make_agent_class(goal, state_spec, agent, internal_state_idx)
+
+    return cls.__new__(cls)
+
+
+def _make_agent_class(
+    goal: Type[AgentGoalMixinBase],
+    state_spec: Type[AgentStateSpecificationBase],
+    agent: Type[CartpoleAgent],
+    internal_state_idx: Optional[Type[InternalStateIdx]],
+) -> Type[CartpoleAgent]:
+    key: AgentClassKey = (goal, state_spec, agent, internal_state_idx)
+
+    if (cls := _AGENT_CLASSES.get(key)) is not None:
+        return cls
+
+    name = "_".join(component.__name__ for component in key if component is not None)
+    while name in globals():
+        # Components of the same name from different modules
+        name += "_"
+
+    namespace: dict[str, Any] = {
+        "__module__": __name__,
+        "__qualname__": name,
+        "__reduce__": _reduce_agent,
+        "_key": key,
+    }
+
+    # The state specification only holds the index of the last call to `make_state_spec`
+    if internal_state_idx is not None:
+        namespace["internal_state_idx"] = internal_state_idx
+
+    cls = types.new_class(name, key[:3], exec_body=lambda ns: ns.update(namespace))
+
+    globals()[name] = cls
+    _AGENT_CLASSES[key] = cls
+
+    return cls
+
+
+# Any to stop 'only concrete class can be given' mypy error.
+# See: https://github.com/python/mypy/issues/5374
+def make_agent_class(
+    agent: Any,
+    state_spec: Type[AgentStateSpecificationBase],
+    goal: Any,
+) -> Type[CartpoleAgent]:
+    """
+    Returns the agent class composed of `goal`, `state_spec` and `agent`, in that order.
+    """
+    return _make_agent_class(goal, state_spec, agent, _get_internal_state_idx(state_spec))
+
+
+def make_agent(
+    agent: Any,
+    state_spec: Type[AgentStateSpecificationBase],
+    goal: Any,
+    *args: Any,
+    **kwargs: Any,
+) -> CartpoleAgent:
+    """
+    Makes an agent of the class composed of `goal`, `state_spec` and `agent`.
+    """
+    return make_agent_class(agent, state_spec, goal)(*args, **kwargs)
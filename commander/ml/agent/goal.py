@@ -3,8 +3,14 @@ from typing import Union, cast
 
 import numpy as np
 
+from commander.constants import FLOAT_TYPE
 from commander.ml.agent.agent import CartpoleAgent
-from commander.ml.agent.type_aliases import GoalParams
+from commander.ml.agent.goal_kernels import (
+    GOAL_KERNEL_REWARD_POTENTIAL,
+    GOAL_KERNEL_SWINGUP,
+    GOAL_KERNEL_TIME,
+)
+from commander.ml.agent.type_aliases import GoalKernelSpec, GoalParams
 from commander.ml.constants import Action, FailureDescriptors
 from commander.type_aliases import ExternalState, StateChecks
 
@@ -73,6 +79,13 @@ class AgentRewardPotentialGoalMixin(AgentGoalMixinBase):
         rew = cast(float, np.sin(x / self.track_length * np.pi))
         return rew
 
+    def goal_kernel_spec(self) -> GoalKernelSpec:
+        params = np.array(
+            (self.track_length, *self.failure_position, *self.failure_angle), dtype=FLOAT_TYPE
+        )
+
+        return (GOAL_KERNEL_REWARD_POTENTIAL, params)
+
     def _check_state(self, state: ExternalState) -> StateChecks:
         x = state[self.external_state_idx.X]
         theta = state[self.external_state_idx.THETA]
@@ -118,6 +131,11 @@ class AgentTimeGoalMixin(AgentGoalMixinBase):
     def reward(self, state: ExternalState) -> float:
         return 1.0
 
+    def goal_kernel_spec(self) -> GoalKernelSpec:
+        params = np.array((*self.failure_position, *self.failure_angle), dtype=FLOAT_TYPE)
+
+        return (GOAL_KERNEL_TIME, params)
+
     def _check_state(self, state: ExternalState) -> StateChecks:
         x = state[self.external_state_idx.X]
         theta = state[self.external_state_idx.THETA]
@@ -192,6 +210,25 @@ class AgentSwingupGoalMixin(AgentGoalMixinBase):
         if np.sin(theta + np.pi / 2.0) > 0.0:
             self.time_spent_above_horizon += self.tau
 
+    def goal_kernel_spec(self) -> GoalKernelSpec:
+        params = np.array(
+            (
+                *self.failure_position,
+                self.failure_time_above_threshold,
+                self.punishment_positional_failure,
+                self.tau,
+            ),
+            dtype=FLOAT_TYPE,
+        )
+
+        return (GOAL_KERNEL_SWINGUP, params)
+
+    def goal_kernel_state(self) -> float:
+        return self.time_spent_above_horizon
+
+    def set_goal_kernel_state(self, goal_state: float) -> None:
+        self.time_spent_above_horizon = goal_state
+
     def _check_state(self, state: ExternalState) -> StateChecks:
         x = state[self.external_state_idx.X]
 
@@ -0,0 +1,107 @@
+"""
+Contains compiled equivalents of the goal mixins for use in rollouts.
+
+Each kernel evaluates the goal right after a step and takes
+`(params, x, theta, goal_state)`, where `params` holds the goal parameters
+in the order given by the kernel and `goal_state` is the scalar state the goal
+carries between steps, e.g. the time spent above the horizon.
+Kernels return `(reward, done, goal_state)`.
+
+The kernels are selected using the `GOAL_KERNEL_*` constants rather than passed
+around as functions, which allows everything calling them to be cached on disk.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+from numba import jit
+
+from commander.constants import FLOAT_TYPE
+
+_NUMBA_OPTIONS = {
+    "nopython": True,
+    "nogil": True,
+    "cache": True,
+}
+
+GOAL_KERNEL_TIME = 0
+GOAL_KERNEL_REWARD_POTENTIAL = 1
+GOAL_KERNEL_SWINGUP = 2
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def time_goal_kernel(
+    params: npt.NDArray[FLOAT_TYPE], x: float, theta: float, goal_state: float
+) -> tuple[float, bool, float]:
+    """
+    Compiled equivalent of `AgentTimeGoalMixin`.
+
+    Params:
+        failure position (2), failure angle (2)
+    """
+    done = x < params[0] or x > params[1] or theta < params[2] or theta > params[3]
+
+    return (1.0, done, goal_state)
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def reward_potential_goal_kernel(
+    params: npt.NDArray[FLOAT_TYPE], x: float, theta: float, goal_state: float
+) -> tuple[float, bool, float]:
+    """
+    Compiled equivalent of `AgentRewardPotentialGoalMixin`.
+
+    Params:
+        track length, failure position (2), failure angle (2)
+    """
+    reward = np.sin(x / params[0] * np.pi)
+
+    done = x < params[1] or x > params[2] or theta < params[3] or theta > params[4]
+
+    return (reward, done, goal_state)
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def swingup_goal_kernel(
+    params: npt.NDArray[FLOAT_TYPE], x: float, theta: float, goal_state: float
+) -> tuple[float, bool, float]:
+    """
+    Compiled equivalent of `AgentSwingupGoalMixin`.
+
+    The goal state is the time spent above the horizon.
+
+    Params:
+        failure position (2), failure time above threshold,
+        punishment for positional failure, tau
+    """
+    uprightness = np.sin(theta + np.pi / 2.0)
+
+    time_spent_above_horizon = goal_state
+    if uprightness > 0.0:
+        time_spent_above_horizon += params[4]
+
+    position_failure = x < params[0] or x > params[1]
+
+    if position_failure:
+        reward = -params[3]
+    else:
+        reward = ((1.0 + uprightness) * 2.0) ** 2
+
+    imbalance = reward < 0 and time_spent_above_horizon >= params[2]
+
+    return (reward, position_failure or imbalance, time_spent_above_horizon)
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def goal_kernel(
+    kind: int, params: npt.NDArray[FLOAT_TYPE], x: float, theta: float, goal_state: float
+) -> tuple[float, bool, float]:
+    """
+    Evaluates the goal kernel given by `kind`, one of the `GOAL_KERNEL_*` constants.
+    """
+    if kind == GOAL_KERNEL_TIME:
+        return time_goal_kernel(params, x, theta, goal_state)  # type: ignore
+    elif kind == GOAL_KERNEL_REWARD_POTENTIAL:
+        return reward_potential_goal_kernel(params, x, theta, goal_state)  # type: ignore
+    else:
+        return swingup_goal_kernel(params, x, theta, goal_state)  # type: ignore
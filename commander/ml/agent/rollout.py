@@ -0,0 +1,142 @@
+"""
+Contains compiled open-loop rollouts of simulated agents.
+
+A rollout advances a cartpole through a fixed sequence of actions using the
+compiled fixed-step integrators, evaluating the goal of the agent after every
+step using the goal kernels of `commander.ml.agent.goal_kernels`.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+from numba import jit, prange
+
+from commander.constants import FLOAT_TYPE
+from commander.integration.equations import advance_fixed_step
+from commander.ml.agent.constants import SimulatedInternalStateIdx
+from commander.ml.agent.goal_kernels import goal_kernel
+
+_NUMBA_OPTIONS = {
+    "nopython": True,
+    "nogil": True,
+    "cache": True,
+}
+
+_NUMBA_PARALLEL_OPTIONS = _NUMBA_OPTIONS | {"parallel": True}
+
+_X = int(SimulatedInternalStateIdx.X)
+_THETA = int(SimulatedInternalStateIdx.THETA)
+
+
+@jit(**_NUMBA_OPTIONS)  # type: ignore
+def simulate_rollout(
+    method: int,
+    states: npt.NDArray[FLOAT_TYPE],
+    rewards: npt.NDArray[FLOAT_TYPE],
+    dones: npt.NDArray[np.bool_],
+    actions: npt.NDArray[np.int64],
+    last_N_c: float,
+    steps: int,
+    max_steps: int,
+    goal: int,
+    goal_params: npt.NDArray[FLOAT_TYPE],
+    goal_state: float,
+    tau: float,
+    resolution: int,
+    force_mag: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> None:
+    """
+    Simulates a single sequence of actions.
+
+    Writes into preallocated `states`, `rewards` and `dones` arrays, where
+    `states[0]` must hold the initial state.
+
+    Once done the state is held, the reward is 0 and the rollout remains done,
+    matching the behaviour of the environments.
+    """
+    N_c_ = last_N_c
+    done = False
+
+    for t in range(actions.shape[0]):
+        y = states[t + 1]
+        y[:] = states[t]
+
+        if done:
+            rewards[t] = 0.0
+            dones[t] = True
+            continue
+
+        F = force_mag if actions[t] == 1 else -force_mag
+
+        N_c_ = advance_fixed_step(
+            method, y, tau, resolution, N_c_, F, g, mu_c, mu_p, l, m_p, m_l, M
+        )
+        steps += 1
+
+        reward, done, goal_state = goal_kernel(goal, goal_params, y[_X], y[_THETA], goal_state)
+        done = done or steps >= max_steps
+
+        rewards[t] = 0.0 if done else reward
+        dones[t] = done
+
+
+@jit(**_NUMBA_PARALLEL_OPTIONS)  # type: ignore
+def simulate_rollout_batch(
+    method: int,
+    states: npt.NDArray[FLOAT_TYPE],
+    rewards: npt.NDArray[FLOAT_TYPE],
+    dones: npt.NDArray[np.bool_],
+    actions: npt.NDArray[np.int64],
+    last_N_c: float,
+    steps: int,
+    max_steps: int,
+    goal: int,
+    goal_params: npt.NDArray[FLOAT_TYPE],
+    goal_state: float,
+    tau: float,
+    resolution: int,
+    force_mag: float,
+    g: float,
+    mu_c: float,
+    mu_p: float,
+    l: float,
+    m_p: float,
+    m_l: float,
+    M: float,
+) -> None:
+    """
+    Simulates a `(K, T)` batch of action sequences in parallel.
+
+    See `simulate_rollout`, with every array gaining a leading batch dimension.
+    """
+    for k in prange(actions.shape[0]):
+        simulate_rollout(
+            method,
+            states[k],
+            rewards[k],
+            dones[k],
+            actions[k],
+            last_N_c,
+            steps,
+            max_steps,
+            goal,
+            goal_params,
+            goal_state,
+            tau,
+            resolution,
+            force_mag,
+            g,
+            mu_c,
+            mu_p,
+            l,
+            m_p,
+            m_l,
+            M,
+        )
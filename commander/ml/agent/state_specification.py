@@ -115,7 +115,8 @@ class AgentTotalKnowledgeStateSpecification(AgentStateSpecificationBase):
     external_state_idx = ExternalTotalKnowledgeStateIdx
 
     def externalise_state(self, internal_state: InternalState) -> ExternalState:
-        return internal_state
+        # A copy, as the internal state may be updated in place, see `bind_state`
+        return internal_state.copy()
 
 
 class AgentPositionalKnowledgeStateSpecification(AgentStateSpecificationBase):
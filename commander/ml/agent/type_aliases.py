@@ -4,6 +4,10 @@ Type alises for agents.
 
 from typing import TypedDict, Union
 
+import numpy.typing as npt
+
+from commander.constants import FLOAT_TYPE
+
 
 class CommonGoalParams(TypedDict, total=False):
     failure_position: tuple[float, float]  # m
@@ -20,3 +24,6 @@ class CommonGoalParams(TypedDict, total=False):
 
 
 GoalParams = Union[CommonGoalParams]
+
+# Kind of goal kernel and its parameters, see `commander.ml.agent.goal_kernels`
+GoalKernelSpec = tuple[int, npt.NDArray[FLOAT_TYPE]]
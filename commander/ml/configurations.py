@@ -8,6 +8,8 @@ from typing import Type, TypedDict
 
 import numpy as np
 
+from commander.integration import IntegratorOptions
+from commander.integration.equations import PhysicalParams
 from commander.ml.agent.agent import CartpoleAgent
 from commander.ml.agent.goal import AgentGoalMixinBase
 from commander.ml.agent.state_specification import AgentStateSpecificationBase
@@ -33,7 +35,9 @@ class SimulatedConfiguration(Configuration):
 
 
 class SimulatedAgentConfiguration(AgentConfiguration, total=False):
+    integrator: IntegratorOptions
     integration_resolution: int
+    track_energy: bool
     max_steps: int
     start_pos: float
     start_pos_velo: float
@@ -84,6 +88,24 @@ DeepPILCOConfiguration["agent"].update(
 )
 
 
+def physical_params(configuration: SimulatedAgentConfiguration) -> PhysicalParams:
+    """
+    The physical parameters of agents made from the configuration, in the order of
+    `SimulatedCartpoleAgent.physical_params`. The physics have to be configured in full.
+    """
+    mass_pole = configuration["mass_pole"]
+
+    return (
+        configuration["grav_acc"],
+        configuration["friction_cart"],
+        configuration["friction_pole"],
+        configuration["pole_length"],
+        mass_pole,
+        mass_pole * configuration["pole_length"],
+        configuration["mass_cart"] + mass_pole,
+    )
+
+
 class ExperimentConfiguration(Configuration):
     agent: ExperimentAgentConfiguration  # type: ignore[misc]
 
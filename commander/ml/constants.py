@@ -21,3 +21,14 @@ class FailureDescriptors(str, Enum):
     ANGLE_RIGHT = "angle/right"
 
     IMBALANCE = "imbalance"
+
+
+@unique
+class InfoLevel(str, Enum):
+    """
+    How much telemetry the environments put into the infos of every step.
+    """
+
+    NONE = "none"  # Only what the agents report themselves, e.g. the energy drift
+    MINIMAL = "minimal"  # Also the agent name, episode and failure modes
+    FULL = "full"  # Everything, where expensive fields are only computed when read
@@ -2,8 +2,13 @@ from __future__ import annotations
 
 import logging
 from collections.abc import Mapping, Sequence
+from copy import deepcopy
+from functools import partial
 from time import time
-from typing import Any, Generic, Optional, Type, TypedDict, cast
+from typing import Any, Generic, Optional, Type, TypedDict, Union, cast
+
+import numpy as np
+import numpy.typing as npt
 
 import gym
 import supersuit as ss
@@ -11,17 +16,29 @@ from gym import spaces
 from pettingzoo.utils.env import ParallelEnv
 
 import deepmerge
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
 from stable_baselines3.common.vec_env.vec_monitor import VecMonitor
 
+from commander.constants import FLOAT_TYPE
 from commander.experiment import ExperimentState
+from commander.integration import FIXED_STEP_METHODS, BatchedCartpolePhysics
 from commander.ml.agent import CartpoleAgent
 from commander.ml.agent.agent import (
     CartpoleAgentT,
     ExperimentalCartpoleAgent,
     SimulatedCartpoleAgent,
 )
-from commander.ml.constants import Action
+from commander.ml.constants import Action, InfoLevel
 from commander.ml.display import rendering
+from commander.ml.frame_stack import FrameStack, stack_observation_space
+from commander.ml.rasteriser import CartpoleRasteriser
+from commander.ml.step_info import LazyStepInfo
+from commander.ml.vec_env import (
+    CartpoleVecEnv,
+    ExperimentalCartpoleVecEnv,
+    SharedMemoryVecEnv,
+    SimulatedCartpoleVecEnv,
+)
 from commander.network import NetworkManager
 from commander.network.constants import (
     DEFAULT_BAUDRATE,
@@ -29,6 +46,7 @@ from commander.network.constants import (
     CartID,
     ExperimentInfoSpecifier,
     FailureMode,
+    ParserMode,
     SetOperation,
 )
 from commander.network.protocol import (
@@ -44,6 +62,7 @@ from commander.network.protocol import (
     FindLimitsPacket,
     InfoPacket,
     NullPacket,
+    ObservationBatchPacket,
     ObservationPacket,
     RequestDebugInfoPacket,
     SetMaxVelocityPacket,
@@ -69,9 +88,43 @@ class EnvironmentState(TypedDict):
     available_memory: Optional[int]
 
 
+class EnvironmentSnapshot(TypedDict):
+    agents: list[AgentNameT]
+    agent_states: npt.NDArray[FLOAT_TYPE]  # See `SimulatedCartpoleAgent.get_snapshot`
+    agent_steps: npt.NDArray[np.int64]
+    agent_steps_beyond_done: npt.NDArray[np.int64]
+    rng_states: list[dict[str, Any]]
+    frame_stacks: list[tuple[npt.NDArray[Any], int]]  # See `FrameStack.get_state`
+    episode: int
+    steps: int
+    world_time: float
+    total_world_time: float
+
+
+def _get_rng_state(rng: Union[np.random.RandomState, np.random.Generator]) -> dict[str, Any]:
+    if isinstance(rng, np.random.Generator):
+        return cast(dict[str, Any], rng.bit_generator.state)
+
+    return cast(dict[str, Any], rng.get_state(legacy=False))
+
+
+def _set_rng_state(
+    rng: Union[np.random.RandomState, np.random.Generator], state: dict[str, Any]
+) -> None:
+    if isinstance(rng, np.random.Generator):
+        rng.bit_generator.state = state
+    else:
+        rng.set_state(state)
+
+
 class CartpoleEnv(ParallelEnv, Generic[CartpoleAgentT]):  # type: ignore [misc]
     """
     Base Class for all Cartpole environments.
+
+    The observations of every agent are stacked in a `FrameStack`, concatenating
+    the last `num_frame_stacking` observations with the newest last.
+    Like the stacks themselves, the returned observations are only valid until
+    the next step or reset.
     """
 
     metadata = {
@@ -79,11 +132,20 @@ class CartpoleEnv(ParallelEnv, Generic[CartpoleAgentT]):  # type: ignore [misc]
         "name": "Cartpole_v0",
     }
 
+    render_mode: Optional[str] = None
+
     def __init__(
         self,
         agents: Sequence[CartpoleAgentT],
         defer_reset: bool = True,
+        num_frame_stacking: int = 1,
     ):
+        self.num_frame_stacking = num_frame_stacking
+
+        # Observations are views into the frame stacks, which are overwritten by the next push.
+        # They are copied unless the caller copies them itself, like `CartpoleVecEnv` does.
+        self.copy_observations = True
+
         self.agents = [agent.name for agent in agents]
         self.possible_agents = self.agents[:]
         self._agents = list(agents)
@@ -96,7 +158,8 @@ class CartpoleEnv(ParallelEnv, Generic[CartpoleAgentT]):  # type: ignore [misc]
             agent.name: agent.action_space for agent in self.get_agents()
         }
         self.observation_spaces: Mapping[str, spaces.Space] = {
-            agent.name: agent.observation_space for agent in self.get_agents()
+            agent.name: stack_observation_space(agent.observation_space, num_frame_stacking)
+            for agent in self.get_agents()
         }
 
         self.seed()
@@ -126,6 +189,17 @@ class CartpoleEnv(ParallelEnv, Generic[CartpoleAgentT]):  # type: ignore [misc]
 
         self.observation_freq_ticker = FrequencyTicker()
 
+        self._pending_actions: Optional[dict[AgentNameT, Action]] = None
+
+        self.frame_stacks: dict[AgentNameT, FrameStack] = {
+            agent.name: FrameStack(
+                self.num_frame_stacking,
+                agent.observation_space.shape[0],
+                agent.observation_space.dtype,
+            )
+            for agent in self.get_agents(all_=True)
+        }
+
     def reset(self) -> Mapping[str, ExternalState]:
         self.episode += 1
         observations = {}
@@ -134,9 +208,13 @@ class CartpoleEnv(ParallelEnv, Generic[CartpoleAgentT]):  # type: ignore [misc]
         self.agents = self.possible_agents[:]
 
         for agent in self.get_agents():
-            observations[agent.name] = agent.reset()
+            frame_stack = self.frame_stacks[agent.name]
+            frame_stack.reset(agent.reset())
+
+            observations[agent.name] = self._stacked_observation(agent.name)
 
         # ## Environment-level resets
+        self._pending_actions = None
         self.steps: int = 0
         self.viewer: Optional[rendering.Viewer] = None
         self.world_time: float = 0.0
@@ -156,14 +234,61 @@ class CartpoleEnv(ParallelEnv, Generic[CartpoleAgentT]):  # type: ignore [misc]
         """
         Performs a step using a dict of actions matching the current agents.
         """
+        self.step_async(actions)
+
+        return self.step_wait()
+
+    def step_async(self, actions: dict[AgentNameT, Action]) -> None:
+        """
+        Starts a step using a dict of actions matching the current agents.
+
+        The step is completed by `step_wait`. Environments acting on hardware send
+        the actions right away, so other work can be done while waiting for the outcome.
+        """
+        if self._pending_actions is not None:
+            raise RuntimeError("The previous step has not been completed by step_wait.")
+
         self.observation_freq_ticker.tick()
 
-        result = self._step(actions=actions)
-        return result
+        self._send_actions(actions)
+        self._pending_actions = actions
+
+    def step_wait(self) -> StepReturn:
+        """
+        Completes the step started by `step_async`.
+        """
+        if self._pending_actions is None:
+            raise RuntimeError("No step has been started by step_async.")
+
+        actions, self._pending_actions = self._pending_actions, None
+
+        observations, rewards, dones, infos = self._step(actions=actions)
+
+        for agent_name, observation in observations.items():
+            frame_stack = self.frame_stacks[agent_name]
+            frame_stack.push(observation)
+
+            observations[agent_name] = self._stacked_observation(agent_name)
+
+        return observations, rewards, dones, infos
+
+    def _stacked_observation(self, agent_name: AgentNameT) -> ExternalState:
+        observation = self.frame_stacks[agent_name].observation
+
+        return observation.copy() if self.copy_observations else observation
+
+    def _send_actions(self, actions: dict[AgentNameT, Action]) -> None:
+        """
+        Called by `step_async` to start acting.
+
+        By default, the whole step is done by `_step` instead.
+        """
 
     def _step(self, actions: dict[AgentNameT, Action]) -> StepReturn:
         """
         Performs a step using a dict of actions matching the current agents.
+
+        Called by `step_wait` with the actions given to `step_async`.
         """
         raise NotImplementedError("This should be overriden")
 
@@ -178,6 +303,19 @@ class CartpoleEnv(ParallelEnv, Generic[CartpoleAgentT]):  # type: ignore [misc]
 
         return agents
 
+    def get_state(self) -> EnvironmentSnapshot:
+        """
+        Returns a snapshot of the environment and its agents, which can be restored
+        using `set_state` to branch off from the current state.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
+
+    def set_state(self, snapshot: EnvironmentSnapshot) -> None:
+        """
+        Restores a snapshot returned by `get_state`.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
+
 
 EnvT = CartpoleEnv[CartpoleAgent]
 
@@ -186,6 +324,9 @@ class SimulatedCartpoleEnv(CartpoleEnv[SimulatedCartpoleAgent]):
     """
     An environment that represents the Cartpole Environment and
     implements simulated physics.
+
+    `info_level` sets how much telemetry is put into the infos of every step,
+    see `InfoLevel`. Training without the telemetry skips its per-step cost.
     """
 
     def __init__(
@@ -194,12 +335,15 @@ class SimulatedCartpoleEnv(CartpoleEnv[SimulatedCartpoleAgent]):
         start_time: float = 0.0,  # s
         timestep: float = 0.02,  # s
         world_size: tuple[float, float] = (-2.5, 2.5),
+        num_frame_stacking: int = 1,
+        info_level: InfoLevel = InfoLevel.FULL,
     ) -> None:
         self.start_time = start_time
         self.timestep = timestep
         self.world_size = world_size
+        self.info_level = InfoLevel(info_level)
 
-        super().__init__(agents=agents)
+        super().__init__(agents=agents, num_frame_stacking=num_frame_stacking)
 
     def setup(self) -> None:
         super().setup()
@@ -209,6 +353,107 @@ class SimulatedCartpoleEnv(CartpoleEnv[SimulatedCartpoleAgent]):
 
             agent.tau = self.timestep
 
+        self.physics = self._make_physics()
+
+        # Created on the first frame, see `render`
+        self.rasteriser: Optional[CartpoleRasteriser] = None
+
+    def _make_physics(self) -> Optional[BatchedCartpolePhysics]:
+        """
+        Creates a batched physics engine for the agents if they can share one.
+
+        This requires all agents to use the same compiled fixed-step integrator
+        and integration resolution. The `(N, 4)` array of states of the physics then
+        holds the state of every agent, see `SimulatedCartpoleAgent.bind_state`.
+        Returns None otherwise, in which case every agent integrates its own state.
+        """
+        agents = self.get_agents(all_=True)
+
+        integrators = {agent.integrator for agent in agents}
+        resolutions = {agent.integration_resolution for agent in agents}
+
+        if len(integrators) != 1 or len(resolutions) != 1:
+            return None
+
+        (integrator,) = integrators
+        (integration_resolution,) = resolutions
+
+        if integrator not in FIXED_STEP_METHODS:
+            return None
+
+        physics = BatchedCartpolePhysics(
+            len(agents),
+            grav_acc=[agent.grav_acc for agent in agents],
+            mass_cart=[agent.mass_cart for agent in agents],
+            mass_pole=[agent.mass_pole for agent in agents],
+            friction_cart=[agent.friction_cart for agent in agents],
+            friction_pole=[agent.friction_pole for agent in agents],
+            pole_length=[agent.pole_length for agent in agents],
+            force_mag=[agent.force_mag for agent in agents],
+            tau=self.timestep,
+            integrator=integrator,
+            integration_resolution=integration_resolution,
+        )
+
+        self.agent_to_physics_row: dict[AgentNameT, int] = {
+            agent.name: row for row, agent in enumerate(agents)
+        }
+
+        # The physics hold the states, which the agents only see
+        for row, agent in enumerate(agents):
+            agent.bind_state(physics.states[row])
+
+        return physics
+
+    def _step_agents_batched(
+        self, actions: dict[AgentNameT, Action]
+    ) -> dict[AgentNameT, StepInfo]:
+        """
+        Steps all agents given in `actions` using a single call to the batched physics,
+        which advances their states in place.
+
+        Mirrors `CartpoleAgent.step` for each of the agents.
+        """
+        assert self.physics is not None
+
+        agents = [self.name_to_agent[agent_name] for agent_name in actions.keys()]
+        rows = np.fromiter(
+            (self.agent_to_physics_row[agent_name] for agent_name in actions.keys()),
+            dtype=np.intp,
+            count=len(agents),
+        )
+
+        for agent, action in zip(agents, actions.values()):
+            if not agent.action_space.contains(action):
+                raise ValueError(f"Action {action} not in action space. Invalid.")
+
+            agent.pre_step(action)
+
+        # A copy, as the states of the agents are rows of the physics, see `_make_physics`
+        previous_states = self.physics.states[rows]
+        previous_normal_forces = [agent.derivatives_wrapper.last_N_c for agent in agents]
+
+        self.physics.normal_forces[rows] = previous_normal_forces
+
+        self.physics.step(np.fromiter(actions.values(), dtype=np.int64, count=len(agents)), rows)
+
+        normal_forces = self.physics.normal_forces[rows].tolist()
+
+        infos: dict[AgentNameT, StepInfo] = {}
+        for agent, action, previous_state, previous_N_c, N_c in zip(
+            agents, actions.values(), previous_states, previous_normal_forces, normal_forces
+        ):
+            agent.derivatives_wrapper.last_N_c = N_c
+
+            infos[agent.name] = agent.make_step_info(
+                previous_state, previous_N_c, agent.resolve_force(action)
+            )
+
+            agent.post_step(action)
+            agent.steps += 1
+
+        return infos
+
     def _step(self, actions: dict[AgentNameT, Action]) -> StepReturn:
         """
         Performs a single step in the environment using the currently selector agent
@@ -230,14 +475,24 @@ class SimulatedCartpoleEnv(CartpoleEnv[SimulatedCartpoleAgent]):
         observations = {}
         rewards = {}
         dones = {}
-        infos = {}
+        infos: dict[AgentNameT, StepInfo]
+
+        if self.physics is not None:
+            infos = self._step_agents_batched(actions)
+        else:
+            infos = {
+                agent_name: self.name_to_agent[agent_name].step(action)
+                for agent_name, action in actions.items()
+            }
+
+        if self.info_level is InfoLevel.FULL:
+            observation_frequency = self.observation_freq_ticker.measure()
 
-        for agent_name, action in actions.items():
+        for agent_name in actions.keys():
             agent = self.name_to_agent[agent_name]
 
-            info = agent.step(action)
+            info = infos[agent_name]
             observation = agent.observe()
-            observation_dict = agent.observe_as_dict()
 
             checks = agent.check_state(observation)
             done = any(checks.values())
@@ -248,15 +503,26 @@ class SimulatedCartpoleEnv(CartpoleEnv[SimulatedCartpoleAgent]):
                 failure_modes = [k.value for k, v in checks.items() if v]
                 logger.info(f"Failure modes: {failure_modes}")
 
-                info["failure_modes"] = failure_modes
+                if self.info_level is not InfoLevel.NONE:
+                    info["failure_modes"] = failure_modes
 
-            info["x"] = observation_dict["x"]
-            info["theta"] = observation_dict["theta"]
-            info["agent_name"] = agent.name
-            info["environment_episode"] = self.episode
-            info["world_time"] = self.world_time
-            info["total_world_time"] = self.total_world_time
-            info["observation_frequency"] = self.observation_freq_ticker.measure()
+            if self.info_level is not InfoLevel.NONE:
+                info["agent_name"] = agent.name
+                info["environment_episode"] = self.episode
+
+            if self.info_level is InfoLevel.FULL:
+                lazy_info = LazyStepInfo(info)
+
+                # The observation is a new array every step, so it can be read later
+                idx = agent.external_state_idx
+                lazy_info.set_lazy("x", partial(observation.item, idx.X))
+                lazy_info.set_lazy("theta", partial(observation.item, idx.THETA))
+
+                lazy_info["world_time"] = self.world_time
+                lazy_info["total_world_time"] = self.total_world_time
+                lazy_info["observation_frequency"] = observation_frequency
+
+                info = lazy_info
 
             observations[agent_name] = observation
             rewards[agent_name] = reward
@@ -273,7 +539,83 @@ class SimulatedCartpoleEnv(CartpoleEnv[SimulatedCartpoleAgent]):
 
         return observations, rewards, dones, infos
 
-    def render(self, mode: str = "human") -> rendering.Viewer:
+    def get_state(self) -> EnvironmentSnapshot:
+        agents = self.get_agents(all_=True)
+
+        agent_states = np.empty(
+            (len(agents), SimulatedCartpoleAgent.SNAPSHOT_SIZE), dtype=FLOAT_TYPE
+        )
+        for agent, agent_state in zip(agents, agent_states):
+            agent.get_snapshot(agent_state)
+
+        return {
+            "agents": self.agents[:],
+            "agent_states": agent_states,
+            "agent_steps": np.fromiter(
+                (agent.steps for agent in agents), dtype=np.int64, count=len(agents)
+            ),
+            "agent_steps_beyond_done": np.fromiter(
+                (agent.steps_beyond_done for agent in agents), dtype=np.int64, count=len(agents)
+            ),
+            "rng_states": [_get_rng_state(agent.np_random) for agent in agents],
+            "frame_stacks": [self.frame_stacks[agent.name].get_state() for agent in agents],
+            "episode": self.episode,
+            "steps": self.steps,
+            "world_time": self.world_time,
+            "total_world_time": self.total_world_time,
+        }
+
+    def set_state(self, snapshot: EnvironmentSnapshot) -> None:
+        agents = self.get_agents(all_=True)
+
+        for agent, agent_state, agent_steps, agent_steps_beyond_done, rng_state in zip(
+            agents,
+            snapshot["agent_states"],
+            snapshot["agent_steps"],
+            snapshot["agent_steps_beyond_done"],
+            snapshot["rng_states"],
+        ):
+            agent.set_snapshot(agent_state)
+            agent.steps = int(agent_steps)
+            agent.steps_beyond_done = int(agent_steps_beyond_done)
+            _set_rng_state(agent.np_random, rng_state)
+
+        for agent, frame_stack_state in zip(agents, snapshot["frame_stacks"]):
+            self.frame_stacks[agent.name].set_state(frame_stack_state)
+
+        self.agents = snapshot["agents"][:]
+        self.episode = snapshot["episode"]
+        self.steps = snapshot["steps"]
+        self.world_time = snapshot["world_time"]
+        self.total_world_time = snapshot["total_world_time"]
+
+        # A step started before restoring would act on the restored state
+        self._pending_actions = None
+
+    def _rasterise(self) -> npt.NDArray[np.uint8]:
+        agents = self.get_agents(all_=True)
+
+        if self.rasteriser is None:
+            self.rasteriser = CartpoleRasteriser(
+                [agent.pole_length for agent in agents], self.world_size
+            )
+
+        states = [agent.observe_as_dict() for agent in agents]
+
+        return self.rasteriser.render(
+            [state["x"] for state in states], [state["theta"] for state in states]
+        )
+
+    def render(self, mode: str = "human") -> Any:
+        """
+        Renders the environment to a window, or to an image with mode 'rgb_array'.
+
+        Images are drawn by `CartpoleRasteriser`, which needs no display. They are
+        overwritten by the next frame and need to be copied to be kept.
+        """
+        if mode == "rgb_array":
+            return self._rasterise()
+
         if rendering is None:
             raise SystemError("Display not available. Cannot render.")
 
@@ -366,7 +708,7 @@ class SimulatedCartpoleEnv(CartpoleEnv[SimulatedCartpoleAgent]):
 
             self.poletrans[agent_name].set_rotation(-state["theta"])
 
-        return self.viewer.render(return_rgb_array=mode == "rgb_array")
+        return self.viewer.render()
 
     def close(self) -> None:
         if self.viewer:
@@ -388,15 +730,30 @@ class ExperimentalCartpoleEnv(CartpoleEnv[ExperimentalCartpoleAgent]):
         port: str = DEFAULT_PORT,
         baudrate: int = DEFAULT_BAUDRATE,
         observation_buffer_size: int = 100,
+        num_frame_stacking: int = 1,
+        parser_mode: ParserMode = ParserMode.BUFFERED,
+        background_reader: bool = False,
     ) -> None:
         self.port = port
         self.baudrate = baudrate
+        self.background_reader = background_reader
 
         self.observation_buffer_size = observation_buffer_size
 
-        self.network_manager = NetworkManager(port=self.port, baudrate=self.baudrate)
+        self.network_manager = NetworkManager(
+            port=self.port,
+            baudrate=self.baudrate,
+            parser_mode=parser_mode,
+            batch_observations=True,
+        )
+
+        super().__init__(agents=agents, num_frame_stacking=num_frame_stacking)
+
+    def close(self) -> None:
+        if self.network_manager.reader is not None:
+            logger.info("Serial reader stats: %s", self.network_manager.reader.stats)
 
-        super().__init__(agents=agents)
+        self.network_manager.close()
 
     def _distribute_packet(self, packet: CartSpecificPacket) -> None:
         agent = self.cart_id_to_agent[packet.cart_id]
@@ -407,6 +764,10 @@ class ExperimentalCartpoleEnv(CartpoleEnv[ExperimentalCartpoleAgent]):
         for packet in packets:
             self._distribute_packet(packet)
 
+    def _distribute_batch(self, batch: ObservationBatchPacket) -> None:
+        for cart_id in batch.cart_ids:
+            self.cart_id_to_agent[cart_id].absorb_packet(batch.for_cart(cart_id))
+
     def _process_buffer(self) -> None:
         """
         Call often to process packets in buffer of network manager.
@@ -419,6 +780,11 @@ class ExperimentalCartpoleEnv(CartpoleEnv[ExperimentalCartpoleAgent]):
         obs_pkts = self.network_manager.get_packets(ObservationPacket, digest=False)
         self._distribute_packets(obs_pkts)
 
+        # ObservationBatchPackets
+        obs_batches = self.network_manager.get_packets(ObservationBatchPacket, digest=False)
+        for obs_batch in obs_batches:
+            self._distribute_batch(obs_batch)
+
         # DebugPackets
         dbg_pkts = self.network_manager.get_packets(DebugPacket, digest=False)
         for dbg_pkt in dbg_pkts:
@@ -525,6 +891,10 @@ class ExperimentalCartpoleEnv(CartpoleEnv[ExperimentalCartpoleAgent]):
         initial_output = self.network_manager.read_initial_output(print_=True)
         logger.debug("Initial output: %s", initial_output)
 
+        if self.background_reader:
+            logger.info("Starting background serial reader")
+            self.network_manager.start_reader()
+
         # assert not self.network_manager.in_queue
 
         # Check connection
@@ -710,6 +1080,15 @@ class ExperimentalCartpoleEnv(CartpoleEnv[ExperimentalCartpoleAgent]):
     def _has_failed(self) -> bool:
         return self.environment_state["failure_mode"] is not FailureMode.NUL
 
+    def _send_actions(self, actions: dict[AgentNameT, Action]) -> None:
+        """
+        Sends the actions to the controller, without waiting for the observations.
+        """
+        self._action_infos: dict[AgentNameT, StepInfo] = {
+            agent_name: self.name_to_agent[agent_name].step(action)
+            for agent_name, action in actions.items()
+        }
+
     def _step(self, actions: dict[AgentNameT, Action]) -> StepReturn:
         # ! For now assume single cart. Change later
         # Very ugly temporary code - I'd like it to work today
@@ -717,12 +1096,9 @@ class ExperimentalCartpoleEnv(CartpoleEnv[ExperimentalCartpoleAgent]):
         observations = {}
         rewards = {}
         dones = {}
-        infos = {}
-
-        for agent_name, action in actions.items():
-            agent = self.name_to_agent[agent_name]
 
-            infos[agent_name] = agent.step(action)
+        # The actions have already been sent by `step_async`
+        infos = self._action_infos
 
         self.network_tick()
 
@@ -776,20 +1152,31 @@ class ExperimentalCartpoleEnv(CartpoleEnv[ExperimentalCartpoleAgent]):
             info["observation_frequency"] = self.observation_freq_ticker.measure()
             info["serial_in_waiting"] = self.network_manager.serial.in_waiting
 
+            if self.network_manager.reader is not None:
+                reader_stats = self.network_manager.reader.stats
+
+                info["reader_queue_depth"] = self.network_manager.reader.queue_depth
+                info["reader_max_queue_depth"] = reader_stats["max_queue_depth"]
+                info["reader_max_read_size"] = reader_stats["max_read_size"]
+                info["reader_packets_dropped"] = reader_stats["packets_dropped"]
+
             if done:
                 failure_modes = [k.value for k, v in checks.items() if v]
                 logger.info(f"Failure modes: {failure_modes}")
 
                 info["failure_modes"] = failure_modes
 
-            observations[agent_name] = observation
-            rewards[agent_name] = reward
-            dones[agent_name] = done or bool(dones.get(agent_name))
-            infos[agent_name] |= info
+            observations[agent.name] = observation
+            rewards[agent.name] = reward
+            dones[agent.name] = done or bool(dones.get(agent.name))
+            infos[agent.name].update(info)
 
         self.steps += 1
 
         if any(dones.values()):
+            # The experiment is ended for all agents at once
+            dones = {agent_name: True for agent_name in dones.keys()}
+
             end_experiment_infos = self.end_experiment()
             deepmerge.merge_or_raise.merge(infos, end_experiment_infos)
 
@@ -800,33 +1187,88 @@ class ExperimentalCartpoleEnv(CartpoleEnv[ExperimentalCartpoleAgent]):
 
 
 def make_env(base_env: Type[EnvT], *args: Any, num_frame_stacking: int = 1, **kwargs: Any) -> EnvT:
-    env = base_env(*args, **kwargs)
+    env = base_env(*args, num_frame_stacking=num_frame_stacking, **kwargs)
 
-    env = ss.frame_stack_v1(env, stack_size=num_frame_stacking)
     env = ss.black_death_v2(env)
 
     return env
 
 
+def make_simulated_vec_env(
+    base_env: Type[SimulatedCartpoleEnv],
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    num_frame_stacking: int = 1,
+) -> SimulatedCartpoleVecEnv:
+    """
+    Makes a vectorised simulated environment from a copy of the given arguments.
+
+    Every environment made this way has agents of its own, which are seeded anew.
+    """
+    args, kwargs = deepcopy((args, kwargs))
+
+    return SimulatedCartpoleVecEnv(base_env(*args, num_frame_stacking=num_frame_stacking, **kwargs))
+
+
 def make_sb3_env(
-    base_env: Type[EnvT], *args: Any, num_frame_stacking: int = 1, **kwargs: Any
-) -> gym.vector.VectorEnv:
+    base_env: Type[EnvT],
+    *args: Any,
+    num_frame_stacking: int = 1,
+    n_envs: int = 1,
+    n_procs: int = 1,
+    **kwargs: Any,
+) -> VecMonitor:
     """
-    Wrappers all the way down...
+    Makes a monitored Stable Baselines3 vectorised environment with one sub-environment per agent.
+
+    Observations are stacked by the environment itself. Simulated and experimental
+    environments are vectorised natively by `SimulatedCartpoleVecEnv` and
+    `ExperimentalCartpoleVecEnv`, whereas other environments go through the wrappers
+    of SuperSuit.
+
+    With more than one environment or process, `n_envs` simulated environments are run
+    in `n_procs` worker processes by `SharedMemoryVecEnv`.
     """
-    env = make_env(base_env, *args, num_frame_stacking=num_frame_stacking, **kwargs)
+    venv: Union[VecEnv, gym.vector.VectorEnv]
+    if issubclass(base_env, SimulatedCartpoleEnv):
+        if n_envs == 1 and n_procs == 1:
+            venv = SimulatedCartpoleVecEnv(
+                base_env(*args, num_frame_stacking=num_frame_stacking, **kwargs)
+            )
+        else:
+            env_fn = partial(make_simulated_vec_env, base_env, args, kwargs, num_frame_stacking)
+            venv = SharedMemoryVecEnv([env_fn] * n_envs, n_procs=n_procs)
+    elif n_envs != 1 or n_procs != 1:
+        raise ValueError("Only simulated environments can be run in worker processes.")
+    elif issubclass(base_env, ExperimentalCartpoleEnv):
+        venv = ExperimentalCartpoleVecEnv(
+            base_env(*args, num_frame_stacking=num_frame_stacking, **kwargs)
+        )
+    else:
+        env = make_env(base_env, *args, num_frame_stacking=num_frame_stacking, **kwargs)
 
-    env = ss.pettingzoo_env_to_vec_env_v0(env)
+        venv = ss.pettingzoo_env_to_vec_env_v0(env)
 
     # Note: VecMonitor automatically vectorises it for us, I believe.
     # It doesn't seem to behave nicely without this - probably need another wrapper
     # like concat vec with just one env and 0 cpus
-    venv = VecMonitor(env)
-
-    return venv
+    return VecMonitor(venv)
 
 
 def get_sb3_env_root_env(env: VecMonitor) -> EnvT:
-    root_env = cast(Any, env).unwrapped.par_env.unwrapped.env
+    """
+    Returns the Cartpole environment underneath a vectorised environment.
+
+    Not available for environments running in worker processes.
+    """
+    unwrapped = cast(Any, env).unwrapped
+
+    if isinstance(unwrapped, SharedMemoryVecEnv):
+        raise ValueError("The environments of a SharedMemoryVecEnv live in worker processes.")
+
+    if isinstance(unwrapped, CartpoleVecEnv):
+        return cast(EnvT, unwrapped.env)
+
+    root_env = unwrapped.par_env.unwrapped.env
 
     return cast(EnvT, root_env)
@@ -0,0 +1,86 @@
+"""
+Contains a ring buffer for stacking the last few observations of an agent.
+"""
+
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from gym import spaces
+
+
+def stack_observation_space(observation_space: spaces.Box, num_frame_stacking: int) -> spaces.Box:
+    """
+    The observation space of `num_frame_stacking` observations concatenated, oldest first.
+    """
+    return spaces.Box(
+        low=np.tile(observation_space.low, num_frame_stacking),
+        high=np.tile(observation_space.high, num_frame_stacking),
+        dtype=observation_space.dtype,
+    )
+
+
+class FrameStack:
+    """
+    Preallocated ring buffer of the last `size` frames of an agent.
+
+    Every frame is written twice, `size` slots apart, such that the last `size` frames
+    always form a contiguous window of the buffer in order from oldest to newest.
+    Stacking a frame therefore only writes two slots, and `observation` is a view
+    rather than a copy.
+
+    Like `supersuit.frame_stack_v1`, the stack is filled with zeros at every reset.
+    """
+
+    def __init__(self, size: int, frame_size: int, dtype: npt.DTypeLike) -> None:
+        self.size = size
+        self.frame_size = frame_size
+
+        self._buffer = np.zeros((2 * size, frame_size), dtype=dtype)
+        self._head = 0  # Slot of the oldest frame in the window
+
+    @property
+    def frames(self) -> npt.NDArray[Any]:
+        """
+        View of the last `size` frames, oldest first.
+
+        This is only valid until the next frame is pushed.
+        """
+        return self._buffer[self._head : self._head + self.size]
+
+    @property
+    def observation(self) -> npt.NDArray[Any]:
+        """
+        View of the last `size` frames concatenated, oldest first.
+
+        This is only valid until the next frame is pushed.
+        """
+        return self.frames.reshape(-1)
+
+    def push(self, frame: npt.ArrayLike) -> None:
+        """
+        Stacks a new frame, dropping the oldest.
+        """
+        # The oldest frame is overwritten in both of its slots,
+        # where the second one becomes the end of the window
+        self._buffer[self._head] = frame
+        self._buffer[self._head + self.size] = frame
+
+        self._head = (self._head + 1) % self.size
+
+    def reset(self, frame: npt.ArrayLike) -> None:
+        """
+        Clears the stack, leaving only `frame` preceded by zeros.
+        """
+        self._buffer.fill(0)
+        self._head = 0
+
+        self.push(frame)
+
+    def get_state(self) -> tuple[npt.NDArray[Any], int]:
+        return (self._buffer.copy(), self._head)
+
+    def set_state(self, state: tuple[npt.NDArray[Any], int]) -> None:
+        buffer, self._head = state
+        self._buffer[...] = buffer
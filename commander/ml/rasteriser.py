@@ -0,0 +1,140 @@
+"""
+Contains a software rasteriser drawing the Cartpole scene with NumPy only.
+
+It needs no display, unlike `commander.ml.display.rendering`, and draws the same scene.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+RGB = tuple[int, int, int]
+
+BACKGROUND_COLOUR: RGB = (255, 255, 255)
+CART_COLOUR: RGB = (0, 0, 0)
+POLE_COLOUR: RGB = (204, 153, 102)
+AXLE_COLOUR: RGB = (127, 127, 204)
+TRACK_COLOUR: RGB = (0, 0, 0)
+
+
+class CartpoleRasteriser:
+    """
+    Draws the track and the cart, pole and axle of every agent into a preallocated
+    `(screen_height, screen_width, 3)` frame of `uint8`, which is reused between frames.
+
+    Shapes are only evaluated within their bounding boxes, using precomputed pixel coordinates.
+    """
+
+    CART_Y = 100  # px, height of the track
+
+    def __init__(
+        self,
+        pole_lengths: Sequence[float],  # m
+        world_size: tuple[float, float],  # m
+        screen_width: int = 600,
+        screen_height: int = 400,
+    ) -> None:
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+
+        world_width = abs(world_size[0] - world_size[1])
+        self.scale = screen_width / world_width
+
+        self.cart_width = self.scale * 1.0
+        self.cart_height = self.scale * 0.6
+        self.pole_width = self.scale * 0.2
+        self.pole_lengths = [self.scale * (2 * pole_length) for pole_length in pole_lengths]
+        self.axle_offset = self.cart_height / 4.0
+
+        self.frame = np.empty((screen_height, screen_width, 3), dtype=np.uint8)
+
+        # Copying is much faster than broadcasting a colour over the frame
+        self._background = np.empty_like(self.frame)
+        self._background[...] = BACKGROUND_COLOUR
+
+        # Centres of the pixels, with the y axis pointing up like in `rendering`
+        self._pixel_x = np.arange(screen_width, dtype=np.float32) + 0.5
+        self._pixel_y = screen_height - (np.arange(screen_height, dtype=np.float32) + 0.5)
+
+    def _row(self, y: float) -> int:
+        return int(np.clip(self.screen_height - y, 0, self.screen_height))
+
+    def _column(self, x: float) -> int:
+        return int(np.clip(x, 0, self.screen_width))
+
+    def _box(
+        self, left: float, right: float, bottom: float, top: float
+    ) -> tuple[slice, slice, npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+        """
+        The rows and columns of the pixels within a bounding box, and their coordinates.
+        """
+        rows = slice(self._row(top), self._row(bottom) + 1)
+        columns = slice(self._column(left), self._column(right) + 1)
+
+        return (rows, columns, self._pixel_x[columns], self._pixel_y[rows, np.newaxis])
+
+    def _draw_rectangle(
+        self, left: float, right: float, bottom: float, top: float, colour: RGB
+    ) -> None:
+        rows, columns, x, y = self._box(left, right, bottom, top)
+
+        inside = ((x >= left) & (x <= right)) & ((y >= bottom) & (y <= top))
+        self.frame[rows, columns][inside] = colour
+
+    def _draw_pole(self, pivot_x: float, pivot_y: float, theta: float, length: float) -> None:
+        half_width = self.pole_width / 2
+
+        # Along and across the pole, which is upright at zero angle and turns clockwise
+        along_x, along_y = np.sin(theta), np.cos(theta)
+        bottom, top = -half_width, length - half_width
+
+        ends_x = pivot_x + along_x * np.array((bottom, top))
+        ends_y = pivot_y + along_y * np.array((bottom, top))
+        rows, columns, x, y = self._box(
+            ends_x.min() - half_width,
+            ends_x.max() + half_width,
+            ends_y.min() - half_width,
+            ends_y.max() + half_width,
+        )
+
+        dx, dy = x - pivot_x, y - pivot_y
+        along = dx * along_x + dy * along_y
+        across = dx * along_y - dy * along_x
+
+        inside = (along >= bottom) & (along <= top) & (np.abs(across) <= half_width)
+        self.frame[rows, columns][inside] = POLE_COLOUR
+
+    def _draw_circle(self, centre_x: float, centre_y: float, radius: float, colour: RGB) -> None:
+        rows, columns, x, y = self._box(
+            centre_x - radius, centre_x + radius, centre_y - radius, centre_y + radius
+        )
+
+        inside = (x - centre_x) ** 2 + (y - centre_y) ** 2 <= radius**2
+        self.frame[rows, columns][inside] = colour
+
+    def render(self, xs: Sequence[float], thetas: Sequence[float]) -> npt.NDArray[np.uint8]:
+        """
+        Draws the agents at the given cart positions and pole angles.
+
+        Returns the frame, which is overwritten by the next call. Copy it to keep it.
+        """
+        np.copyto(self.frame, self._background)
+
+        for x, theta, pole_length in zip(xs, thetas, self.pole_lengths):
+            cart_x = x * self.scale + self.screen_width / 2.0  # Middle of the cart
+            pivot_y = self.CART_Y + self.axle_offset
+
+            self._draw_rectangle(
+                cart_x - self.cart_width / 2,
+                cart_x + self.cart_width / 2,
+                self.CART_Y - self.cart_height / 2,
+                self.CART_Y + self.cart_height / 2,
+                CART_COLOUR,
+            )
+            self._draw_pole(cart_x, pivot_y, theta, pole_length)
+            self._draw_circle(cart_x, pivot_y, self.pole_width / 2, AXLE_COLOUR)
+
+        self.frame[self._row(self.CART_Y)] = TRACK_COLOUR
+
+        return self.frame
@@ -0,0 +1,122 @@
+"""
+Contains a video recorder streaming frames to ffmpeg.
+"""
+
+from __future__ import annotations
+
+import logging
+import subprocess
+from pathlib import Path
+from types import TracebackType
+from typing import Optional, Type, Union
+
+import numpy as np
+import numpy.typing as npt
+
+import ffmpeg
+
+logger = logging.getLogger(__name__)
+
+
+class FFmpegRecorder:
+    """
+    Records a video by writing raw RGB frames to the pipe of an ffmpeg process as they
+    are produced, so memory use does not grow with the length of the recording.
+
+    The process is started with the first recorded frame, which sets the size of the video.
+
+    Args:
+        path: Path of the video, whose extension determines the container.
+        fps: Frame rate of the recorded frames.
+        record_every: Only every `record_every`th frame written is recorded.
+        codec: Video codec passed to ffmpeg.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        fps: float,
+        record_every: int = 1,
+        codec: str = "libx264",
+    ) -> None:
+        if record_every < 1:
+            raise ValueError(f"record_every has to be at least 1, got {record_every}")
+
+        self.path = Path(path)
+        self.fps = fps
+        self.record_every = record_every
+        self.codec = codec
+
+        self.frames_written = 0
+        self.frames_recorded = 0
+
+        self._process: Optional[subprocess.Popen[bytes]] = None
+        self._frame_shape: Optional[tuple[int, ...]] = None
+
+    def _start(self, height: int, width: int) -> subprocess.Popen[bytes]:
+        stream = ffmpeg.input(
+            "pipe:", format="rawvideo", pix_fmt="rgb24", s=f"{width}x{height}", framerate=self.fps
+        ).output(
+            str(self.path),
+            vcodec=self.codec,
+            pix_fmt="yuv420p",
+            # yuv420p needs even dimensions
+            vf="pad=ceil(iw/2)*2:ceil(ih/2)*2",
+        )
+
+        # Only errors are printed, as the output of ffmpeg is not read while recording
+        stream = stream.global_args("-loglevel", "error").overwrite_output()
+
+        return stream.run_async(pipe_stdin=True)  # type: ignore[no-any-return]
+
+    def write(self, frame: npt.NDArray[np.uint8]) -> None:
+        """
+        Writes a `(height, width, 3)` RGB frame, which is recorded unless it is decimated.
+        """
+        index = self.frames_written
+        self.frames_written += 1
+
+        if index % self.record_every != 0:
+            return
+
+        if self._process is None:
+            height, width, _ = frame.shape
+
+            self._frame_shape = frame.shape
+            self._process = self._start(height, width)
+        elif frame.shape != self._frame_shape:
+            raise ValueError(f"Expected a frame of shape {self._frame_shape}, got {frame.shape}")
+
+        assert self._process.stdin is not None
+
+        self._process.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        self.frames_recorded += 1
+
+    def close(self) -> None:
+        """
+        Finishes the video, waiting for ffmpeg to encode the remaining frames.
+        """
+        if self._process is None:
+            return
+
+        assert self._process.stdin is not None
+
+        self._process.stdin.close()
+        returncode = self._process.wait()
+        self._process = None
+
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with code {returncode} recording to {self.path}")
+
+        logger.info("Recorded %s frames to %s", self.frames_recorded, self.path)
+
+    def __enter__(self) -> FFmpegRecorder:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
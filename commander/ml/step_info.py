@@ -0,0 +1,72 @@
+"""
+Contains a step info which computes some of its fields only when they are read.
+"""
+
+from collections.abc import Callable, Iterator, MutableMapping
+from typing import Any, Optional
+
+from commander.type_aliases import StepInfo
+
+
+class LazyStepInfo(MutableMapping[str, Any]):
+    """
+    Step info with lazy fields, which are given as functions that compute their value.
+
+    A lazy field is computed the first time it is read and then stored like any other field.
+    Lazy fields must therefore only depend on data captured during the step, not on the
+    current state of the environment, which may have been stepped or reset since.
+
+    Copies share the functions of the remaining lazy fields, while pickling turns the info
+    into a plain dict, computing all fields.
+    """
+
+    def __init__(
+        self,
+        data: Optional[StepInfo] = None,
+        lazy: Optional[dict[str, Callable[[], Any]]] = None,
+    ) -> None:
+        self._data: StepInfo = data if data is not None else {}
+        self._lazy: dict[str, Callable[[], Any]] = lazy if lazy is not None else {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._lazy:
+            self._data[key] = self._lazy.pop(key)()
+
+        return self._data[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._lazy.pop(key, None)
+        self._data[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if self._lazy.pop(key, None) is None:
+            del self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        # Without computing the field, as `Mapping.__contains__` would
+        return key in self._data or key in self._lazy
+
+    def __iter__(self) -> Iterator[str]:
+        # Reading a lazy field moves it, so the keys are collected up front
+        return iter([*self._data, *self._lazy])
+
+    def __len__(self) -> int:
+        return len(self._data) + len(self._lazy)
+
+    def __repr__(self) -> str:
+        lazy = ", ".join(f"{key!r}: ..." for key in self._lazy)
+
+        return f"{type(self).__name__}({self._data!r}, lazy={{{lazy}}})"
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (dict, (dict(self),))
+
+    def copy(self) -> "LazyStepInfo":
+        return type(self)(self._data.copy(), self._lazy.copy())
+
+    def set_lazy(self, key: str, compute: Callable[[], Any]) -> None:
+        """
+        Sets a field to be computed by `compute` when it is first read.
+        """
+        self._data.pop(key, None)
+        self._lazy[key] = compute
@@ -50,8 +50,8 @@ class GeneralCarterCallback(BaseCallback):
 
         failure_modes = []
         for info in self.locals["infos"]:
-            assert "agent_name" in info.keys()
-            name = info["agent_name"]
+            # Missing if the environment leaves the telemetry out of the infos, see `InfoLevel`
+            name = info.get("agent_name")
 
             # Available memory
             if info.get("available_memory") is not None:
@@ -101,6 +101,10 @@ class GeneralCarterCallback(BaseCallback):
             if info.get("theta") is not None:
                 self.logger.record(f"carter/theta_{name}", info["theta"])
 
+            # Energy drift of the episode
+            if info.get("energy_drift") is not None:
+                self.logger.record(f"carter/energy_drift_{name}", info["energy_drift"])
+
         failure_mode: str
         if not failure_modes:
             return True
@@ -165,8 +169,9 @@ class VideoRecorderCallback(BaseCallback):
                     of the callback's scope
                 """
                 screen = self._eval_env.render(mode="rgb_array")
-                # PyTorch uses CxHxW vs HxWxC gym (and tensorflow) image convention
-                screens.append(screen.transpose(2, 0, 1))
+                # PyTorch uses CxHxW vs HxWxC gym (and tensorflow) image convention.
+                # The environment reuses the image for the next frame, so it is copied
+                screens.append(screen.transpose(2, 0, 1).copy())
 
             self.model = cast(BaseAlgorithm, self.model)
 
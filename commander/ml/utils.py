@@ -1,21 +1,20 @@
 from collections.abc import Iterable
 from typing import cast
 
-from gym.vector import VectorEnv
-
 from stable_baselines3.common.vec_env.base_vec_env import VecEnvStepReturn
+from stable_baselines3.common.vec_env.vec_monitor import VecMonitor
 
+from commander.ml.environment import get_sb3_env_root_env
 from commander.type_aliases import AgentNameT, ExternalState, StepInfo, StepReturn
 
 
-def restore_step(env: VectorEnv, step_return: VecEnvStepReturn) -> StepReturn:
+def restore_step(env: VecMonitor, step_return: VecEnvStepReturn) -> StepReturn:
     """
     Restores PettingZoo-like StepReturn from a Stable Baselines3
     VecEnvStepReturn.
     """
-    par_env = env.unwrapped.par_env  # Unwrap to parallel_env (note: not CartpoleEnv)
-
-    agents: Iterable[AgentNameT] = par_env.agents
+    # Sub-environments are in the order of the agents of the root environment
+    agents: Iterable[AgentNameT] = get_sb3_env_root_env(env).possible_agents
 
     observations: dict[AgentNameT, ExternalState] = {
         agent: observation.tolist() for (agent, observation) in zip(agents, step_return[0])
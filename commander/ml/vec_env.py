@@ -0,0 +1,538 @@
+"""
+Contains Stable Baselines3 vectorised environments for the Cartpole environments.
+
+These replace the black death and PettingZoo conversion wrappers of SuperSuit
+with a single layer that keeps the observations, rewards and dones of all agents
+in preallocated arrays, which are written in place every step.
+
+`SharedMemoryVecEnv` runs several of these in worker processes, with the arrays
+placed in shared memory.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from enum import Enum, unique
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Any, Generic, Optional, TypedDict, TypeVar
+
+import numpy as np
+import numpy.typing as npt
+
+from stable_baselines3.common.vec_env.base_vec_env import (
+    CloudpickleWrapper,
+    VecEnv,
+    VecEnvIndices,
+    VecEnvObs,
+    VecEnvStepReturn,
+)
+
+from commander.type_aliases import AgentNameT, ExternalState, StepInfo
+
+if TYPE_CHECKING:
+    from commander.ml.environment import (
+        CartpoleEnv,
+        ExperimentalCartpoleEnv,
+        SimulatedCartpoleEnv,
+    )
+
+    CartpoleEnvT = TypeVar("CartpoleEnvT", bound=CartpoleEnv[Any])
+else:
+    CartpoleEnvT = TypeVar("CartpoleEnvT")
+
+
+class CartpoleVecEnv(VecEnv, Generic[CartpoleEnvT]):
+    """
+    Vectorised environment with one sub-environment for each agent of a Cartpole environment.
+
+    Observations are stacked by the environment, see `CartpoleEnv`.
+
+    Once all agents are done, the environment is reset automatically. The last
+    observation of the episode is then available as `terminal_observation` in the info.
+
+    The actions are handed to the environment by `step_async` and the step is completed
+    by `step_wait`, see `CartpoleEnv.step_async`.
+    """
+
+    def __init__(self, env: CartpoleEnvT) -> None:
+        self.env = env
+
+        # Observations are copied into the buffers anyway
+        self.env.copy_observations = False
+
+        self._agent_names: list[AgentNameT] = env.possible_agents[:]
+
+        observation_space = env.observation_spaces[self._agent_names[0]]
+        action_space = env.action_spaces[self._agent_names[0]]
+
+        if any(env.observation_spaces[name] != observation_space for name in self._agent_names):
+            raise ValueError("All agents must have the same observation space.")
+
+        num_envs = len(self._agent_names)
+
+        self._observations = np.zeros(
+            (num_envs, *observation_space.shape), dtype=observation_space.dtype
+        )
+        self._rewards = np.zeros(num_envs, dtype=np.float32)
+        self._dones = np.zeros(num_envs, dtype=np.bool_)
+
+        super().__init__(num_envs, observation_space, action_space)
+
+    def _write_observations(self, observations: Mapping[AgentNameT, ExternalState]) -> None:
+        for i, agent_name in enumerate(self._agent_names):
+            self._observations[i] = observations[agent_name]
+
+    def set_buffers(
+        self,
+        observations: npt.NDArray[Any],
+        rewards: npt.NDArray[np.float32],
+        dones: npt.NDArray[np.bool_],
+    ) -> None:
+        """
+        Makes the environment write its observations, rewards and dones into the given arrays,
+        such as arrays in shared memory. Their current contents are copied over.
+        """
+        observations[...] = self._observations
+        rewards[...] = self._rewards
+        dones[...] = self._dones
+
+        self._observations = observations
+        self._rewards = rewards
+        self._dones = dones
+
+    def reset(self) -> VecEnvObs:
+        self.reset_in_place(self._seeds)
+        self._reset_seeds()
+
+        return self._observations.copy()
+
+    def reset_in_place(self, seeds: Sequence[Optional[int]]) -> None:
+        """
+        Resets the environment, only writing the observations to the buffers.
+
+        Agents are seeded with the corresponding entries of `seeds` that are not None.
+        """
+        for agent, seed in zip(self.env.get_agents(all_=True), seeds):
+            if seed is not None:
+                agent.seed(seed)
+
+        self._write_observations(self.env.reset())
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self.env.step_async(
+            {agent_name: int(action) for agent_name, action in zip(self._agent_names, actions)}
+        )
+
+    def step_wait(self) -> VecEnvStepReturn:
+        infos = self.step_in_place()
+
+        return (self._observations.copy(), self._rewards.copy(), self._dones.copy(), infos)
+
+    def step_in_place(self) -> list[StepInfo]:
+        """
+        Completes the step started by `step_async`.
+
+        The observations, rewards and dones are only written to the buffers and the
+        infos are returned.
+        """
+        observations, rewards, dones, infos = self.env.step_wait()
+
+        self._write_observations(observations)
+
+        step_infos: list[StepInfo] = []
+        for i, agent_name in enumerate(self._agent_names):
+            self._rewards[i] = rewards[agent_name]
+            self._dones[i] = dones[agent_name]
+
+            step_infos.append(infos[agent_name])
+
+        if self._dones.all():
+            for i, info in enumerate(step_infos):
+                info["terminal_observation"] = self._observations[i].copy()
+
+            self._write_observations(self.env.reset())
+
+        return step_infos
+
+    def close(self) -> None:
+        self.env.close()
+
+    def render(self, mode: Optional[str] = None) -> Any:
+        return self.env.render(mode=mode or "human")
+
+    def get_images(self) -> Sequence[Optional[np.ndarray]]:
+        # All agents share the same scene
+        return [self.env.render(mode="rgb_array")] * self.num_envs
+
+    def _get_targets(self, indices: VecEnvIndices) -> Iterable[Any]:
+        agents = self.env.get_agents(all_=True)
+
+        return (agents[i] for i in self._get_indices(indices))
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> list[Any]:
+        """
+        Returns an attribute of the agents, falling back to the attribute of the environment.
+        """
+        return [
+            getattr(agent, attr_name) if hasattr(agent, attr_name) else getattr(self.env, attr_name)
+            for agent in self._get_targets(indices)
+        ]
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        for agent in self._get_targets(indices):
+            setattr(agent, attr_name, value)
+
+    def env_method(
+        self,
+        method_name: str,
+        *method_args: Any,
+        indices: VecEnvIndices = None,
+        **method_kwargs: Any,
+    ) -> list[Any]:
+        return [
+            getattr(agent, method_name)(*method_args, **method_kwargs)
+            for agent in self._get_targets(indices)
+        ]
+
+    def env_is_wrapped(self, wrapper_class: Any, indices: VecEnvIndices = None) -> list[bool]:
+        return [False for _ in self._get_indices(indices)]
+
+
+class SimulatedCartpoleVecEnv(CartpoleVecEnv["SimulatedCartpoleEnv"]):
+    """
+    Vectorised environment of a simulated Cartpole environment.
+
+    All agents of a simulated environment are done at the same time, so no
+    agent is ever stepped while the others wait for the episode to end.
+    """
+
+    env: SimulatedCartpoleEnv
+
+
+class ExperimentalCartpoleVecEnv(CartpoleVecEnv["ExperimentalCartpoleEnv"]):
+    """
+    Vectorised environment of an experimental Cartpole environment.
+
+    `step_async` sends the actions to the controller and returns immediately, such that
+    inference, buffer writes and logging can overlap with the serial round trip,
+    which `step_wait` waits out.
+    """
+
+    env: ExperimentalCartpoleEnv
+
+
+@unique
+class WorkerCommand(str, Enum):
+    STEP = "step"
+    RESET = "reset"
+    GET_ATTR = "get_attr"
+    SET_ATTR = "set_attr"
+    ENV_METHOD = "env_method"
+    GET_IMAGES = "get_images"
+    CLOSE = "close"
+
+
+class SharedArraySpec(TypedDict):
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+def _create_shared_array(
+    shape: tuple[int, ...], dtype: npt.DTypeLike
+) -> tuple[SharedMemory, npt.NDArray[Any], SharedArraySpec]:
+    dtype = np.dtype(dtype)
+    shared_memory = SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+
+    array: npt.NDArray[Any] = np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf)
+    array.fill(0)
+
+    return (shared_memory, array, {"name": shared_memory.name, "shape": shape, "dtype": dtype.str})
+
+
+def _attach_shared_array(spec: SharedArraySpec) -> tuple[SharedMemory, npt.NDArray[Any]]:
+    shared_memory = SharedMemory(name=spec["name"])
+    array: npt.NDArray[Any] = np.ndarray(
+        spec["shape"], dtype=np.dtype(spec["dtype"]), buffer=shared_memory.buf
+    )
+
+    return (shared_memory, array)
+
+
+VecEnvFactory = Callable[[], CartpoleVecEnv[Any]]
+
+
+def _locate(vec_envs: Sequence[CartpoleVecEnv[Any]], index: int) -> tuple[CartpoleVecEnv[Any], int]:
+    """
+    Finds the vectorised environment and index within it of the `index`th sub-environment.
+    """
+    for vec_env in vec_envs:
+        if index < vec_env.num_envs:
+            return (vec_env, index)
+
+        index -= vec_env.num_envs
+
+    raise IndexError(index)
+
+
+def _worker(
+    remote: Connection, parent_remote: Connection, env_fns_wrapper: CloudpickleWrapper
+) -> None:
+    parent_remote.close()
+
+    vec_envs: list[CartpoleVecEnv[Any]] = [env_fn() for env_fn in env_fns_wrapper.var]
+    remote.send([(env.num_envs, env.observation_space, env.action_space) for env in vec_envs])
+
+    specs, offset = remote.recv()
+    shared = [_attach_shared_array(spec) for spec in specs]
+    observations, rewards, dones, actions = (array for _, array in shared)
+
+    # Slices of the shared arrays, and of the sub-environments of this worker
+    slices = []
+    local_slices = []
+    for vec_env in vec_envs:
+        slice_ = slice(offset, offset + vec_env.num_envs)
+        vec_env.set_buffers(observations[slice_], rewards[slice_], dones[slice_])
+
+        slices.append(slice_)
+        local_slices.append(slice(slice_.start - slices[0].start, slice_.stop - slices[0].start))
+        offset += vec_env.num_envs
+
+    while True:
+        try:
+            command, data = remote.recv()
+
+            if command is WorkerCommand.STEP:
+                # All environments are started before waiting for any of them
+                for vec_env, slice_ in zip(vec_envs, slices):
+                    vec_env.step_async(actions[slice_])
+
+                infos: list[StepInfo] = []
+                for vec_env in vec_envs:
+                    infos.extend(vec_env.step_in_place())
+
+                remote.send(infos)
+            elif command is WorkerCommand.RESET:
+                for vec_env, local_slice in zip(vec_envs, local_slices):
+                    vec_env.reset_in_place(data[local_slice])
+
+                remote.send(None)
+            elif command is WorkerCommand.GET_ATTR:
+                local_indices, attr_name = data
+                located = (_locate(vec_envs, i) for i in local_indices)
+
+                remote.send([vec_env.get_attr(attr_name, i)[0] for vec_env, i in located])
+            elif command is WorkerCommand.SET_ATTR:
+                local_indices, (attr_name, value) = data
+                for vec_env, i in (_locate(vec_envs, i) for i in local_indices):
+                    vec_env.set_attr(attr_name, value, i)
+
+                remote.send([None for _ in local_indices])
+            elif command is WorkerCommand.ENV_METHOD:
+                local_indices, (method_name, args, kwargs) = data
+                located = (_locate(vec_envs, i) for i in local_indices)
+
+                remote.send(
+                    [
+                        vec_env.env_method(method_name, *args, indices=i, **kwargs)[0]
+                        for vec_env, i in located
+                    ]
+                )
+            elif command is WorkerCommand.GET_IMAGES:
+                remote.send([image for vec_env in vec_envs for image in vec_env.get_images()])
+            elif command is WorkerCommand.CLOSE:
+                for vec_env in vec_envs:
+                    vec_env.close()
+
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(f"Unknown command: {command}")
+        except (EOFError, KeyboardInterrupt):
+            break
+
+    # The arrays have to be released before the shared memory can be closed
+    del observations, rewards, dones, actions, vec_envs
+    for shared_memory, _ in shared:
+        shared_memory.close()
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Runs vectorised Cartpole environments in worker processes.
+
+    Observations, rewards, dones and actions are exchanged through arrays in shared memory,
+    which the environments of the workers write into directly. Only the commands and
+    the infos go through the pipes to the workers.
+
+    Args:
+        env_fns: Functions creating the vectorised environments, see `CartpoleVecEnv`
+        n_procs: Number of worker processes, defaults to the number of CPUs.
+            The environments are split evenly between the workers.
+        start_method: Start method of the worker processes, defaults to 'forkserver'
+            where available and 'spawn' otherwise.
+    """
+
+    def __init__(
+        self,
+        env_fns: Sequence[VecEnvFactory],
+        n_procs: Optional[int] = None,
+        start_method: Optional[str] = None,
+    ) -> None:
+        self.waiting = False
+        self.closed = False
+
+        n_procs = min(n_procs or os.cpu_count() or 1, len(env_fns))
+
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+
+        context = mp.get_context(start_method)
+
+        self.remotes: list[Connection] = []
+        self.processes: list[BaseProcess] = []
+        for worker_env_fns in np.array_split(np.arange(len(env_fns)), n_procs):
+            remote, work_remote = context.Pipe()
+            args = (work_remote, remote, CloudpickleWrapper([env_fns[i] for i in worker_env_fns]))
+
+            # Daemonic, such that a crash of the main process does not leave workers hanging
+            process = context.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            work_remote.close()
+
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+        worker_envs = [remote.recv() for remote in self.remotes]
+        (_, observation_space, action_space), *_ = (env for envs in worker_envs for env in envs)
+
+        if any(
+            env_observation_space != observation_space or env_action_space != action_space
+            for envs in worker_envs
+            for (_, env_observation_space, env_action_space) in envs
+        ):
+            raise ValueError("All environments must have the same observation and action spaces.")
+
+        worker_sizes = [sum(num_envs for (num_envs, _, _) in envs) for envs in worker_envs]
+        num_envs = sum(worker_sizes)
+
+        self._shared = [
+            _create_shared_array((num_envs, *observation_space.shape), observation_space.dtype),
+            _create_shared_array((num_envs,), np.float32),
+            _create_shared_array((num_envs,), np.bool_),
+            _create_shared_array((num_envs,), np.int64),
+        ]
+        self._observations, self._rewards, self._dones, self._actions = (
+            array for _, array, _ in self._shared
+        )
+
+        specs = [spec for _, _, spec in self._shared]
+        self._worker_ranges: list[range] = []
+
+        offset = 0
+        for remote, size in zip(self.remotes, worker_sizes):
+            remote.send((specs, offset))
+
+            self._worker_ranges.append(range(offset, offset + size))
+            offset += size
+
+        self._worker_of = np.repeat(np.arange(len(self.remotes)), worker_sizes)
+
+        super().__init__(num_envs, observation_space, action_space)
+
+    def reset(self) -> VecEnvObs:
+        for remote, worker_range in zip(self.remotes, self._worker_ranges):
+            remote.send((WorkerCommand.RESET, [self._seeds[i] for i in worker_range]))
+
+        for remote in self.remotes:
+            remote.recv()
+
+        self._reset_seeds()
+
+        return self._observations.copy()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions[:] = actions
+
+        for remote in self.remotes:
+            remote.send((WorkerCommand.STEP, None))
+
+        self.waiting = True
+
+    def step_wait(self) -> VecEnvStepReturn:
+        infos = [info for remote in self.remotes for info in remote.recv()]
+        self.waiting = False
+
+        return (self._observations.copy(), self._rewards.copy(), self._dones.copy(), infos)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+
+        for remote in self.remotes:
+            remote.send((WorkerCommand.CLOSE, None))
+
+        for process in self.processes:
+            process.join()
+
+        # The arrays have to be released before the shared memory can be closed
+        del self._observations, self._rewards, self._dones, self._actions
+        for shared_memory, _, _ in self._shared:
+            shared_memory.close()
+            shared_memory.unlink()
+
+        self.closed = True
+
+    def _request(self, command: WorkerCommand, data: Any, indices: VecEnvIndices) -> list[Any]:
+        """
+        Sends a command concerning the given sub-environments to the workers holding them.
+
+        Returns the results in the order of `indices`.
+        """
+        indices_ = list(self._get_indices(indices))
+
+        local_indices: dict[int, list[int]] = {}
+        for i in indices_:
+            worker = int(self._worker_of[i])
+            local_indices.setdefault(worker, []).append(i - self._worker_ranges[worker].start)
+
+        for worker, worker_indices in local_indices.items():
+            self.remotes[worker].send((command, (worker_indices, data)))
+
+        results = {worker: iter(self.remotes[worker].recv()) for worker in local_indices}
+
+        return [next(results[int(self._worker_of[i])]) for i in indices_]
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> list[Any]:
+        return self._request(WorkerCommand.GET_ATTR, attr_name, indices)
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        self._request(WorkerCommand.SET_ATTR, (attr_name, value), indices)
+
+    def env_method(
+        self,
+        method_name: str,
+        *method_args: Any,
+        indices: VecEnvIndices = None,
+        **method_kwargs: Any,
+    ) -> list[Any]:
+        return self._request(
+            WorkerCommand.ENV_METHOD, (method_name, method_args, method_kwargs), indices
+        )
+
+    def env_is_wrapped(self, wrapper_class: Any, indices: VecEnvIndices = None) -> list[bool]:
+        return [False for _ in self._get_indices(indices)]
+
+    def get_images(self) -> Sequence[Optional[np.ndarray]]:
+        for remote in self.remotes:
+            remote.send((WorkerCommand.GET_IMAGES, None))
+
+        return [image for remote in self.remotes for image in remote.recv()]
@@ -0,0 +1,422 @@
+"""
+Contains a NetworkManager running on an asyncio event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from collections import deque
+from collections.abc import AsyncIterator
+from itertools import count
+from logging import getLogger
+from types import TracebackType
+from typing import Any, Deque, Optional, Type, cast
+
+from serial import Serial, SerialException
+
+from commander.network.constants import DEFAULT_BAUDRATE, DEFAULT_PORT
+from commander.network.exceptions import PacketReadError
+from commander.network.network import NetworkManager
+from commander.network.packet_buffer import PacketBuffer
+from commander.network.parser import PacketParser
+from commander.network.protocol import (
+    NullPacket,
+    OutboundPacket,
+    Packet,
+    PingPacket,
+    PongPacket,
+    RequestPacketRealignmentPacket,
+)
+from commander.network.types import PacketSelector, PacketT
+from commander.network.utils import bytes_to_hex_ascii_str
+
+logger = getLogger(__name__)
+
+Waiter = tuple[int, Optional[PacketSelector[Any]], "asyncio.Future[Packet]"]
+Subscription = tuple[
+    Optional[Type[Packet]], Optional[PacketSelector[Any]], "asyncio.Queue[Optional[Packet]]"
+]
+
+
+class SerialTransport(asyncio.Transport):
+    """
+    Transports the bytes of a serial port through an event loop.
+
+    The port is watched by the event loop, which reads it only when it is readable.
+    This needs a port with a file descriptor, so it only works on POSIX systems.
+    """
+
+    def __init__(
+        self, loop: asyncio.AbstractEventLoop, protocol: asyncio.Protocol, serial: Serial
+    ) -> None:
+        super().__init__(extra={"serial": serial})
+
+        self._loop = loop
+        self._protocol = protocol
+        self._serial = serial
+        self._closing = False
+
+        # Reads never block, as the port is only read once readable
+        self._serial.timeout = 0
+
+        self._loop.add_reader(self._serial.fileno(), self._read_ready)
+        self._loop.call_soon(self._protocol.connection_made, self)
+
+    def _read_ready(self) -> None:
+        try:
+            data = self._serial.read(self._serial.in_waiting or 1)
+        except (SerialException, OSError) as exc:  # e.g. EIO once the port hangs up
+            self._close(exc)
+            return
+
+        if data:
+            self._protocol.data_received(data)
+
+    def write(self, data: Any) -> None:
+        if self._closing:
+            raise ConnectionError("Serial transport is closed.")
+
+        self._serial.write(data)
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+    def close(self) -> None:
+        self._close(None)
+
+    def _close(self, exc: Optional[Exception]) -> None:
+        if self._closing:
+            return
+
+        self._closing = True
+
+        self._loop.remove_reader(self._serial.fileno())
+        self._serial.close()
+
+        self._loop.call_soon(self._protocol.connection_lost, exc)
+
+
+class AsyncNetworkManager(asyncio.Protocol):
+    """
+    Networks with the controller on an asyncio event loop.
+
+    Bytes are parsed into packets as the serial transport receives them. Each packet goes
+    to the oldest matching waiter in `get_packet`. If there is none, it goes to every matching
+    subscription from `subscribe`. Otherwise it is buffered until it is asked for.
+    Waiting for packets therefore takes no CPU time, and several waits can run concurrently.
+    """
+
+    INITIAL_OUTPUT_STOP_MARKER: bytes = NetworkManager.INITIAL_OUTPUT_STOP_MARKER
+    PACKET_REALIGNMENT_SEQUENCE: bytes = NetworkManager.PACKET_REALIGNMENT_SEQUENCE
+
+    def __init__(
+        self,
+        port: str = DEFAULT_PORT,
+        baudrate: int = DEFAULT_BAUDRATE,
+        batch_observations: bool = False,
+    ) -> None:
+        self.port = port
+        self.baudrate = baudrate
+
+        self.parser = PacketParser(batch_observations=batch_observations)
+        self.packet_buffer = PacketBuffer()
+
+        self.transport: Optional[SerialTransport] = None
+
+        # Keyed by the packet type waited for, and ordered by a sequence number across types
+        self._waiters: dict[Optional[Type[Packet]], Deque[Waiter]] = {}
+        self._waiter_sequence = count()
+
+        self._subscriptions: list[Subscription] = []
+
+        # Incoming bytes are skipped until the marker, e.g. while realigning
+        self._skip_marker: Optional[bytes] = None
+        self._skipped = bytearray()
+        self._skip_future: Optional[asyncio.Future[bytes]] = None
+
+    def open(self) -> None:
+        """
+        Opens the serial port. Must be called from within the event loop.
+        """
+        if self.transport is not None and not self.transport.is_closing():
+            raise RuntimeError("Already open.")
+
+        serial = Serial(port=self.port, baudrate=self.baudrate)
+        self.transport = SerialTransport(asyncio.get_running_loop(), self, serial)
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+
+    async def __aenter__(self) -> AsyncNetworkManager:
+        self.open()
+
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        logger.debug("Serial connection made: %s", self.port)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        logger.debug("Serial connection lost: %s", exc)
+
+        for waiters in self._waiters.values():
+            for _, _, future in waiters:
+                if not future.done():
+                    future.set_exception(ConnectionError("Serial connection lost"))
+
+        if self._skip_future is not None and not self._skip_future.done():
+            self._skip_future.set_exception(ConnectionError("Serial connection lost"))
+
+        # Ends the subscriptions
+        for _, _, queue in self._subscriptions:
+            queue.put_nowait(None)
+
+    def data_received(self, data: bytes) -> None:
+        if self._skip_marker is not None:
+            data = self._skip(data)
+
+            if not data:
+                return
+
+        self.parser.feed(data)
+
+        try:
+            for packet in self.parser.packets():
+                self._dispatch(packet)
+
+        except (PacketReadError, ValueError) as read_exc:
+            logger.warn("Failed to read packet. Got exception: %s", read_exc)
+
+            # The rest of the buffer cannot be trusted to be aligned
+            self.parser.clear()
+
+            logger.info("Attempting packet realignment")
+            self._realign().add_done_callback(self._log_flushed_bytes)
+
+            self._dispatch(NullPacket())
+
+    def _skip_until(self, marker: bytes) -> asyncio.Future[bytes]:
+        """
+        Skips incoming bytes up to and including `marker`.
+
+        Returns a future of the skipped bytes.
+        """
+        if self._skip_marker is not None:
+            raise RuntimeError("Already skipping until a marker.")
+
+        self._skip_marker = marker
+        self._skip_future = asyncio.get_running_loop().create_future()
+
+        return self._skip_future
+
+    def _skip(self, data: bytes) -> bytes:
+        """
+        Skips `data` until the marker, returning the bytes following it.
+        """
+        assert self._skip_marker is not None and self._skip_future is not None
+
+        self._skipped += data
+
+        index = self._skipped.find(self._skip_marker)
+        if index < 0:
+            return b""
+
+        end = index + len(self._skip_marker)
+        skipped, rest = bytes(self._skipped[:end]), bytes(self._skipped[end:])
+
+        self._skipped.clear()
+        self._skip_marker = None
+
+        if not self._skip_future.done():
+            self._skip_future.set_result(skipped)
+
+        return rest
+
+    def _realign(self) -> asyncio.Future[bytes]:
+        future = self._skip_until(self.PACKET_REALIGNMENT_SEQUENCE)
+        self.send_packet(RequestPacketRealignmentPacket())
+
+        return future
+
+    @staticmethod
+    def _log_flushed_bytes(future: asyncio.Future[bytes]) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        hex_str, ascii_str = bytes_to_hex_ascii_str(future.result())
+
+        logger.warn("Rest of data (HEX)  : " + hex_str)
+        logger.warn("Rest of data (ASCII): " + ascii_str)
+
+    async def read_initial_output(self, print_: bool = True) -> str:
+        """
+        Skips the initial output of the controller. Call it right after opening.
+        """
+        read_bytes = await self._skip_until(self.INITIAL_OUTPUT_STOP_MARKER)
+        initial_output = read_bytes.decode("ascii", errors="ignore")
+
+        if print_:
+            print(initial_output, end="")
+
+        return initial_output
+
+    async def realign_packets(self, print_: bool = True) -> None:
+        future = self._realign()
+        await future
+
+        if print_:
+            self._log_flushed_bytes(future)
+
+    def _pop_waiter(self, packet: Packet) -> Optional[asyncio.Future[Packet]]:
+        """
+        Removes and returns the future of the oldest waiter matching the packet.
+        """
+        found: Optional[tuple[Deque[Waiter], Waiter]] = None
+
+        for packet_type in (*type(packet).__mro__, None):
+            waiters = self._waiters.get(packet_type)
+            if not waiters:
+                continue
+
+            for waiter in waiters:
+                sequence, selector, future = waiter
+
+                # The rest of the waiters are newer still
+                if found is not None and sequence > found[1][0]:
+                    break
+
+                if future.done() or (selector is not None and not selector(packet)):
+                    continue
+
+                found = (waiters, waiter)
+                break
+
+        if found is None:
+            return None
+
+        waiters, waiter = found
+        waiters.remove(waiter)
+
+        return waiter[2]
+
+    def _dispatch(self, packet: Packet) -> None:
+        NetworkManager._log_read_packet(packet)
+
+        future = self._pop_waiter(packet)
+        if future is not None:
+            future.set_result(packet)
+            return
+
+        subscribed = False
+        for packet_type, selector, queue in self._subscriptions:
+            if packet_type is not None and not isinstance(packet, packet_type):
+                continue
+
+            if selector is not None and not selector(packet):
+                continue
+
+            queue.put_nowait(packet)
+            subscribed = True
+
+        if not subscribed:
+            self.packet_buffer.append(packet)
+
+    def send_packet(self, packet: OutboundPacket) -> None:
+        logger.debug("Sent packet: %s", packet, extra={"packet": packet})
+
+        if self.transport is None:
+            raise ConnectionError("Not open.")
+
+        self.transport.write(packet.to_bytes())
+
+    async def get_packet(
+        self,
+        packet_type: Optional[Type[PacketT]] = None,
+        selector: Optional[PacketSelector[PacketT]] = None,
+        *,
+        timeout: Optional[float] = None,
+    ) -> PacketT:
+        """
+        Pops the oldest buffered packet matching the type and selector,
+        or waits for one to arrive.
+
+        Raises asyncio.TimeoutError after `timeout` seconds, if given.
+        """
+        packet = self.packet_buffer.pop(packet_type, selector)
+        if packet is not None:
+            return cast(PacketT, packet)
+
+        if self.transport is None or self.transport.is_closing():
+            raise ConnectionError("Not open.")
+
+        future: asyncio.Future[Packet] = asyncio.get_running_loop().create_future()
+        waiter: Waiter = (next(self._waiter_sequence), selector, future)
+
+        waiters = self._waiters.setdefault(packet_type, deque())
+        waiters.append(waiter)
+
+        try:
+            return cast(PacketT, await asyncio.wait_for(future, timeout))
+        finally:
+            # Still there if cancelled or timed out
+            if waiter in waiters:
+                waiters.remove(waiter)
+
+    def get_packets(
+        self,
+        packet_type: Optional[Type[PacketT]] = None,
+        selector: Optional[PacketSelector[PacketT]] = None,
+    ) -> list[PacketT]:
+        """
+        Pops all buffered packets matching the type and selector, without waiting.
+        """
+        return cast(list[PacketT], self.packet_buffer.take_all(packet_type, selector))
+
+    async def subscribe(
+        self,
+        packet_type: Optional[Type[PacketT]] = None,
+        selector: Optional[PacketSelector[PacketT]] = None,
+    ) -> AsyncIterator[PacketT]:
+        """
+        Yields the packets matching the type and selector, until the connection is lost.
+
+        Iteration starts with the matching buffered packets, and other packets are
+        only dispatched to the subscription from then on.
+        """
+        queue: asyncio.Queue[Optional[Packet]] = asyncio.Queue()
+        for packet in self.packet_buffer.take_all(packet_type, selector):
+            queue.put_nowait(packet)
+
+        subscription: Subscription = (packet_type, selector, queue)
+        self._subscriptions.append(subscription)
+
+        try:
+            while True:
+                next_packet = await queue.get()
+                if next_packet is None:
+                    return
+
+                yield cast(PacketT, next_packet)
+        finally:
+            self._subscriptions.remove(subscription)
+
+    async def assert_ping_pong(self, timeout: Optional[float] = None) -> None:
+        """
+        Does a Ping ⟷ Pong connection check.
+
+        Raises assertion error if something is wrong.
+        """
+        checksum = random.randint(0, 2**32 - 1)
+        self.send_packet(PingPacket(timestamp=checksum))
+
+        pong_pkt = await self.get_packet(PongPacket, timeout=timeout)
+        assert pong_pkt.timestamp == checksum
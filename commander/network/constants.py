@@ -79,3 +79,13 @@ MODE_TO_DESCRIPTOR: dict[FailureMode, str] = {
     FailureMode.ANGLE_RIGHT: "angle/right",
     FailureMode.IMBALANCE: "imbalance",
 }
+
+
+@unique
+class ParserMode(str, Enum):
+    """
+    How `NetworkManager` reads inbound packets from the serial port.
+    """
+
+    STREAM = "stream"  # Each packet is read from the port on its own
+    BUFFERED = "buffered"  # All waiting bytes are read at once and decoded from a buffer
@@ -1,14 +1,18 @@
 import random
 from collections.abc import Callable
 from logging import getLogger
+from threading import Lock
 from time import sleep
-from typing import Literal, Optional, Sequence, Type, Union, cast, overload
+from typing import Literal, Optional, Type, Union, cast, overload
 
 from serial import Serial
 
-from commander.log import EXCLUDE_PACKETS
-from commander.network.constants import DEFAULT_BAUDRATE, DEFAULT_PORT
+# Imported as a module, as commander.log imports commander.network in turn
+import commander.log
+from commander.network.constants import DEFAULT_BAUDRATE, DEFAULT_PORT, ParserMode
 from commander.network.exceptions import PacketReadError
+from commander.network.packet_buffer import PacketBuffer
+from commander.network.parser import PacketParser
 from commander.network.protocol import (
     INBOUND_PACKET_ID_MAP,
     InboundPacket,
@@ -20,6 +24,7 @@ from commander.network.protocol import (
     PongPacket,
     RequestPacketRealignmentPacket,
 )
+from commander.network.reader import SerialReader
 from commander.network.types import PacketSelector, PacketT
 from commander.network.utils import bytes_to_hex_ascii_str, bytes_to_hexes
 from commander.utils import noop
@@ -35,18 +40,64 @@ class NetworkManager:
         "=*= Please realign packets here =*=\n"
     ).to_bytes()
 
-    def __init__(self, port: str = DEFAULT_PORT, baudrate: int = DEFAULT_BAUDRATE):
+    def __init__(
+        self,
+        port: str = DEFAULT_PORT,
+        baudrate: int = DEFAULT_BAUDRATE,
+        parser_mode: ParserMode = ParserMode.BUFFERED,
+        batch_observations: bool = False,
+    ):
         self.serial = Serial()
         self.serial.port = port
         self.serial.baudrate = baudrate
 
-        self.packet_buffer: list[Packet] = []
+        self.parser_mode = parser_mode
+        # Observations are only batched when buffered
+        self.parser = PacketParser(batch_observations=batch_observations)
+
+        self.packet_buffer = PacketBuffer()
+
+        self.reader: Optional[SerialReader] = None
+        self._write_lock = Lock()
 
     def open(self) -> None:
         self.serial.open()
 
     def close(self) -> None:
-        self.serial.close()
+        try:
+            self.stop_reader()
+        finally:
+            self.serial.close()
+
+    def start_reader(self, queue_size: int = 4096) -> None:
+        """
+        Starts reading packets on a background thread, from which they are then digested.
+
+        Only start it once the initial output has been read, as it takes over all reading.
+        Packets are always realigned automatically while it runs.
+        """
+        if self.reader is not None:
+            raise RuntimeError("Reader is already running.")
+
+        self.reader = SerialReader(self, queue_size=queue_size)
+        self.reader.start()
+
+    def stop_reader(self) -> None:
+        """
+        Stops the background reader, keeping the packets it has read.
+
+        Raises RuntimeError if its thread does not stop, in which case it is kept.
+        """
+        if self.reader is None:
+            return
+
+        self.reader.stop()
+
+        reader = self.reader
+        self.reader = None
+
+        # Also if the reader failed, which is raised by digesting while it runs
+        self.packet_buffer.extend(reader.pop_all())
 
     def tick(self) -> None:
         pass
@@ -108,12 +159,20 @@ class NetworkManager:
         return cls.__cpp_decl("PACKET_REALIGNMENT_SEQUENCE", cls.PACKET_REALIGNMENT_SEQUENCE)
 
     def reset_buffers(self, wait: float = 0.025) -> None:
+        # The parser must not be fed while it is cleared, so this raises if the reader won't stop
+        reader_queue_size = self.reader.queue_size if self.reader is not None else None
+        self.stop_reader()
+
         # sleep 25ms and then flush buffers
         sleep(wait)
         self.serial.reset_input_buffer()
         self.serial.reset_output_buffer()
+        self.parser.clear()
         sleep(wait)
 
+        if reader_queue_size is not None:
+            self.start_reader(queue_size=reader_queue_size)
+
     def assert_ping_pong(self) -> None:
         """
         Does a Ping ⟷ Pong connection check.
@@ -149,8 +208,7 @@ class NetworkManager:
 
         try:
             packet = packet_cls.read(self.serial)
-            if not type(packet) in EXCLUDE_PACKETS:
-                logger.debug("Read packet: %s", packet, extra={"packet": packet})
+            self._log_read_packet(packet)
 
         except (PacketReadError, ValueError) as read_exc:
             logger.warn("Failed to read packet. Got exception: %s", read_exc)
@@ -167,11 +225,58 @@ class NetworkManager:
 
         return packet
 
+    @staticmethod
+    def _log_read_packet(packet: Packet) -> None:
+        if not type(packet) in commander.log.EXCLUDE_PACKETS:
+            logger.debug("Read packet: %s", packet, extra={"packet": packet})
+
+    def parse_packets(self, auto_realign: bool = True) -> list[Packet]:
+        """
+        Decodes the complete packets buffered by the parser.
+        """
+        packets: list[Packet] = []
+
+        try:
+            for packet in self.parser.packets():
+                self._log_read_packet(packet)
+                packets.append(packet)
+
+        except (PacketReadError, ValueError) as read_exc:
+            logger.warn("Failed to read packet. Got exception: %s", read_exc)
+
+            # The rest of the buffer cannot be trusted to be aligned
+            self.parser.clear()
+
+            if auto_realign:
+                logger.info("Attempting packet realignment")
+
+                self.realign_packets()
+
+                packets.append(NullPacket())
+
+            else:
+                raise read_exc
+
+        return packets
+
     def read_packets(self, block: bool = False, auto_realign: bool = True) -> list[Packet]:
         packets: list[Packet] = []
 
-        while self.serial.in_waiting or (block and not packets):
-            packets.append(self.read_packet(auto_realign=auto_realign))
+        if self.parser_mode is ParserMode.STREAM:
+            while self.serial.in_waiting or (block and not packets):
+                packets.append(self.read_packet(auto_realign=auto_realign))
+
+            return packets
+
+        while True:
+            in_waiting = self.serial.in_waiting
+
+            if not in_waiting and not (block and not packets):
+                break
+
+            # Reads at least a byte, to block for more if nothing is waiting
+            self.parser.feed(self.serial.read(max(in_waiting, 1)))
+            packets.extend(self.parse_packets(auto_realign=auto_realign))
 
         return packets
 
@@ -192,8 +297,14 @@ class NetworkManager:
         """
         Digests all the packets currently waiting to be read and stores them
         in the internal packet buffer.
+
+        If the background reader is running, the packets it has read are digested instead.
         """
-        packets = self.read_packets(block=block, auto_realign=auto_realign)
+        packets: list[Packet]
+        if self.reader is not None:
+            packets = self.reader.drain(block=block)
+        else:
+            packets = self.read_packets(block=block, auto_realign=auto_realign)
 
         self.packet_buffer.extend(packets)
 
@@ -225,7 +336,6 @@ class NetworkManager:
         block: Literal[True] = True,
         callback: Callable[..., None] = noop,
         auto_realign: bool = True,
-        _excludes: Optional[Sequence[PacketT]] = None,
     ) -> PacketT:
         ...
 
@@ -240,7 +350,6 @@ class NetworkManager:
         block: Literal[False] = False,
         callback: Callable[..., None] = noop,
         auto_realign: bool = True,
-        _excludes: Optional[Sequence[PacketT]] = None,
     ) -> Optional[PacketT]:
         ...
 
@@ -255,7 +364,6 @@ class NetworkManager:
         block: bool = False,
         callback: Callable[..., None] = noop,
         auto_realign: bool = True,
-        _excludes: Optional[Sequence[PacketT]] = None,
     ) -> Optional[PacketT]:
         ...
 
@@ -269,7 +377,6 @@ class NetworkManager:
         block: bool = False,
         callback: DigestCallback = noop,
         auto_realign: bool = True,
-        _excludes: Optional[Sequence[PacketT]] = None,
     ) -> Optional[PacketT]:
         """
         Pops a packet from the internel buffer.
@@ -282,47 +389,25 @@ class NetworkManager:
         if block and not digest:
             raise ValueError("Invalid combination of arguments. If blocking, must digest")
 
-        if _excludes is None:
-            _excludes = []
-
         if digest:
             self.digest(auto_realign=auto_realign)
             callback()
 
         # Try to look for packet in buffer
-        packet: Optional[PacketT] = None
         while True:
-            for trial in self.packet_buffer:
-
-                # Skip if not right type
-                if packet_type is not None and not isinstance(trial, packet_type):
-                    continue
-
-                trial = cast(PacketT, trial)
-
-                # Skip if not right attributes
-                if selector is not None and not selector(trial):
-                    continue
-
-                if packet in _excludes:
-                    continue
-
-                # We have a match
-                packet = trial
-
-                if pop:
-                    self.packet_buffer.remove(packet)
-
-                break
+            if pop:
+                packet = self.packet_buffer.pop(packet_type, selector)
+            else:
+                packet = self.packet_buffer.peek(packet_type, selector)
 
             # Wait for packet if blocking
             if packet is None and block:
-                self.digest()
+                self.digest(block=True, auto_realign=auto_realign)
                 callback()
             else:
                 break
 
-        return packet
+        return cast(Optional[PacketT], packet)
 
     @overload
     def get_packets(
@@ -363,31 +448,34 @@ class NetworkManager:
         callback: DigestCallback = noop,
         auto_realign: bool = True,
     ) -> Union[list[PacketT], list[Packet]]:
+        """
+        Gets all matching packets from the internal buffer in order of arrival,
+        popping them if `pop`.
+
+        If blocking, waits until there is at least one.
+        """
 
-        packets: list[PacketT] = []
+        if block and not digest:
+            raise ValueError("Invalid combination of arguments. If blocking, must digest")
 
-        while True:
-            still_block = block and not bool(packets)
+        if digest:
+            self.digest(auto_realign=auto_realign)
+            callback()
 
-            packet = self.get_packet(
-                packet_type=packet_type,
-                selector=selector,
-                pop=pop,
-                digest=digest,
-                block=still_block,
-                callback=callback,
-                auto_realign=auto_realign,
-                _excludes=packets,
-            )
+        while True:
+            packets = self.packet_buffer.take_all(packet_type, selector, pop=pop)
 
-            if packet is None:
-                return packets
+            if packets or not block:
+                return cast(list[PacketT], packets)
 
-            packets.append(packet)
+            self.digest(block=True, auto_realign=auto_realign)
+            callback()
 
     def send_packet(self, packet: OutboundPacket) -> None:
         logger.debug("Sent packet: %s", packet, extra={"packet": packet})
 
         bytes_to_transfer = packet.to_bytes()
 
-        self.serial.write(bytes_to_transfer)
+        # The background reader writes too when realigning packets
+        with self._write_lock:
+            self.serial.write(bytes_to_transfer)
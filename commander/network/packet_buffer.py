@@ -0,0 +1,169 @@
+"""
+Contains a buffer of received packets indexed by their type.
+"""
+
+import heapq
+from collections import deque
+from collections.abc import Iterable, Iterator
+from itertools import count
+from typing import Any, Deque, Optional, Type
+
+from commander.network.protocol import Packet
+from commander.network.types import PacketSelector
+
+Entry = tuple[int, Packet]  # Sequence number and packet
+
+
+class PacketBuffer:
+    """
+    Buffers packets in a queue per packet type, each in order of arrival.
+
+    Every packet is numbered on arrival, so the oldest packet of a type can be popped from
+    the queue heads in constant time per buffered packet type. Selectors only scan the queues
+    of the packet types they apply to.
+    """
+
+    def __init__(self) -> None:
+        self._queues: dict[Type[Packet], Deque[Entry]] = {}
+        self._sequence = count()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Packet]:
+        # Sequence numbers are unique, so packets are never compared
+        return (packet for _, packet in heapq.merge(*self._queues.values()))
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self)})"
+
+    def append(self, packet: Packet) -> None:
+        queue = self._queues.get(type(packet))
+        if queue is None:
+            queue = self._queues[type(packet)] = deque()
+
+        queue.append((next(self._sequence), packet))
+        self._size += 1
+
+    def extend(self, packets: Iterable[Packet]) -> None:
+        for packet in packets:
+            self.append(packet)
+
+    def clear(self) -> None:
+        self._queues.clear()
+        self._size = 0
+
+    def _matching_queues(self, packet_type: Optional[Type[Packet]]) -> list[Deque[Entry]]:
+        if packet_type is None:
+            return list(self._queues.values())
+
+        return [
+            queue
+            for queued_type, queue in self._queues.items()
+            if issubclass(queued_type, packet_type)
+        ]
+
+    def _find(
+        self, packet_type: Optional[Type[Packet]], selector: Optional[PacketSelector[Any]]
+    ) -> Optional[tuple[Deque[Entry], int]]:
+        """
+        Finds the queue and index of the oldest packet matching the type and selector.
+        """
+        found: Optional[tuple[Deque[Entry], int]] = None
+        found_sequence = -1
+
+        for queue in self._matching_queues(packet_type):
+            for index, (sequence, packet) in enumerate(queue):
+                # The rest of the queue arrived later still
+                if found is not None and sequence > found_sequence:
+                    break
+
+                if selector is not None and not selector(packet):
+                    continue
+
+                found = (queue, index)
+                found_sequence = sequence
+                break
+
+        return found
+
+    def peek(
+        self,
+        packet_type: Optional[Type[Packet]] = None,
+        selector: Optional[PacketSelector[Any]] = None,
+    ) -> Optional[Packet]:
+        """
+        Returns the oldest packet matching the type and selector, leaving it in the buffer.
+        """
+        found = self._find(packet_type, selector)
+        if found is None:
+            return None
+
+        queue, index = found
+
+        return queue[index][1]
+
+    def pop(
+        self,
+        packet_type: Optional[Type[Packet]] = None,
+        selector: Optional[PacketSelector[Any]] = None,
+    ) -> Optional[Packet]:
+        """
+        Removes and returns the oldest packet matching the type and selector.
+        """
+        found = self._find(packet_type, selector)
+        if found is None:
+            return None
+
+        queue, index = found
+
+        if index == 0:
+            _, packet = queue.popleft()
+        else:
+            _, packet = queue[index]
+            del queue[index]
+
+        self._size -= 1
+
+        return packet
+
+    def take_all(
+        self,
+        packet_type: Optional[Type[Packet]] = None,
+        selector: Optional[PacketSelector[Any]] = None,
+        *,
+        pop: bool = True,
+    ) -> list[Packet]:
+        """
+        Returns all packets matching the type and selector in order of arrival,
+        removing them from the buffer if `pop`.
+        """
+        matches: list[list[Entry]] = []
+
+        for queue in self._matching_queues(packet_type):
+            if selector is None:
+                matches.append(list(queue))
+
+                if pop:
+                    queue.clear()
+
+                continue
+
+            matched: list[Entry] = []
+            kept: list[Entry] = []
+            for entry in queue:
+                (matched if selector(entry[1]) else kept).append(entry)
+
+            matches.append(matched)
+
+            if pop and matched:
+                queue.clear()
+                queue.extend(kept)
+
+        packets = [packet for _, packet in heapq.merge(*matches)]
+
+        if pop:
+            self._size -= len(packets)
+
+        return packets
@@ -0,0 +1,104 @@
+"""
+Contains a parser decoding inbound packets from buffered bytes.
+"""
+
+from collections.abc import Iterator
+
+from commander.network.exceptions import PacketReadError
+from commander.network.protocol import (
+    INBOUND_PACKET_ID_MAP,
+    OBSERVATION_DTYPE,
+    InboundPacket,
+    ObservationBatchPacket,
+    ObservationPacket,
+)
+
+
+class PacketParser:
+    """
+    Decodes inbound packets from bytes fed to a reusable buffer.
+
+    Partial packets at the end of the buffer are kept until the rest of their bytes are fed.
+
+    With `batch_observations`, consecutive ObservationPackets are decoded together
+    into an ObservationBatchPacket instead.
+    """
+
+    # Number of frames checked at a time for a run of ObservationPackets
+    OBSERVATION_SCAN_SIZE: int = 1024
+
+    def __init__(self, batch_observations: bool = False) -> None:
+        self.batch_observations = batch_observations
+
+        self.buffer = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def feed(self, data: bytes) -> None:
+        self.buffer += data
+
+    def clear(self) -> None:
+        self.buffer.clear()
+
+    def _count_observations(self, offset: int) -> int:
+        """
+        Counts the complete ObservationPackets following each other from `offset`.
+        """
+        frame_size = OBSERVATION_DTYPE.itemsize
+        id_ = ObservationPacket.id_
+
+        count = 0
+        while True:
+            start = offset + count * frame_size
+            available = (len(self.buffer) - start) // frame_size
+            scanned = min(available, self.OBSERVATION_SCAN_SIZE)
+
+            # The ID of every frame, as long as all frames so far were observations
+            ids = self.buffer[start : start + scanned * frame_size : frame_size]
+            run = scanned - len(ids.lstrip(id_))
+            count += run
+
+            if run < self.OBSERVATION_SCAN_SIZE:
+                return count
+
+    def packets(self) -> Iterator[InboundPacket]:
+        """
+        Yields the complete packets in the buffer, which are removed from it once decoded.
+
+        Raises `PacketReadError` or `ValueError` on an invalid or malformed packet,
+        which is left at the start of the buffer.
+        """
+        buffer = self.buffer
+        offset = 0
+
+        try:
+            while offset < len(buffer):
+                id_ = bytes(buffer[offset : offset + 1])
+
+                try:
+                    packet_cls = INBOUND_PACKET_ID_MAP[id_]
+                except KeyError as id_exc:
+                    raise PacketReadError("Invalid packet ID", id_) from id_exc
+
+                if self.batch_observations and packet_cls is ObservationPacket:
+                    count = self._count_observations(offset)
+                    if count == 0:
+                        break
+
+                    # May stop short of an invalid frame, which then raises on its own
+                    batch = ObservationBatchPacket.from_buffer(buffer, offset, count)
+                    offset += len(batch) * OBSERVATION_DTYPE.itemsize
+
+                    yield batch
+                    continue
+
+                result = packet_cls.decode(buffer, offset + 1)
+                if result is None:
+                    break
+
+                packet, offset = result
+
+                yield packet
+        finally:
+            del buffer[:offset]
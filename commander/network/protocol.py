@@ -5,9 +5,13 @@ Contains the networking logic for communication with the Controller.
 from __future__ import annotations
 
 import datetime as dt
+import struct
 from abc import ABC, abstractmethod
 from inspect import isabstract
-from typing import Any, Dict, Optional, Type, Union
+from typing import Any, ClassVar, Dict, Optional, Type, Union
+
+import numpy as np
+import numpy.typing as npt
 
 from serial import Serial
 from typing_extensions import TypeGuard
@@ -23,15 +27,19 @@ from commander.network.exceptions import PacketReadError
 from commander.network.utils import (
     CRLF,
     Format,
+    ReadableBuffer,
     UnpackableT,
     _stringify_self,
     byte,
     bytes_to_hexstr,
+    format_struct,
     pack,
     skip_crlf,
     unpack,
 )
 
+DecodeResult = Optional[tuple["InboundPacket", int]]
+
 
 class Packet(ABC):
     id_: bytes
@@ -62,10 +70,16 @@ class InboundPacket(Packet):
 
     Writing the serialisation method could be easily done,
     but wouldn't ever be useful.
+
+    Packets whose fields following the ID have a fixed size declare them as `layout`,
+    which is used to read and decode them at once. The fields are then passed to
+    `_from_fields`. Packets of variable size override `_read` and `_decode` instead.
     """
 
     read_time: Optional[dt.datetime] = None
 
+    layout: ClassVar[Optional[struct.Struct]] = None
+
     @classmethod
     def read(cls, serial: Serial) -> InboundPacket:
         read_time = dt.datetime.now()
@@ -76,9 +90,42 @@ class InboundPacket(Packet):
         return packet
 
     @classmethod
-    @abstractmethod
+    def decode(cls, buffer: ReadableBuffer, offset: int) -> DecodeResult:
+        """
+        Decodes a packet whose fields start at `offset` in `buffer`, following its ID.
+
+        Returns the packet and the offset following it, or None if the packet is incomplete.
+        """
+        read_time = dt.datetime.now()
+
+        result = cls._decode(buffer, offset)
+
+        if result is not None:
+            result[0].read_time = read_time
+
+        return result
+
+    @classmethod
     def _read(cls, serial: Serial) -> InboundPacket:
-        ...
+        if cls.layout is None:
+            raise NotImplementedError(f"{cls.__name__} has no fixed layout to read.")
+
+        return cls._from_fields(*cls.layout.unpack(serial.read(cls.layout.size)))
+
+    @classmethod
+    def _decode(cls, buffer: ReadableBuffer, offset: int) -> DecodeResult:
+        if cls.layout is None:
+            raise NotImplementedError(f"{cls.__name__} has no fixed layout to decode.")
+
+        end = offset + cls.layout.size
+        if end > len(buffer):
+            return None
+
+        return (cls._from_fields(*cls.layout.unpack_from(buffer, offset)), end)
+
+    @classmethod
+    def _from_fields(cls, *fields: Any) -> InboundPacket:
+        return cls(*fields)
 
     def __repr__(self) -> str:
         return _stringify_self(self)
@@ -121,13 +168,11 @@ class OnlyIDPacket(BidirectionalPacket):
     def __repr__(self) -> str:
         return _stringify_self(self)
 
+    layout = struct.Struct("")
+
     def __init__(self) -> None:
         ...
 
-    @classmethod
-    def _read(cls, serial: Serial) -> OnlyIDPacket:
-        return cls()
-
     def to_bytes(self) -> bytes:
         return self.id_
 
@@ -143,14 +188,24 @@ class UnknownPacket(BidirectionalPacket):
         self.observed_id = observed_id
 
     @classmethod
-    def _read(self, serial: Serial) -> UnknownPacket:
+    def _read(cls, serial: Serial) -> UnknownPacket:
         raise NotImplementedError("UnknownPacket does not have a read method.")
 
+    @classmethod
+    def _decode(cls, buffer: ReadableBuffer, offset: int) -> DecodeResult:
+        raise NotImplementedError("UnknownPacket does not have a decode method.")
+
     def to_bytes(self) -> bytes:
         raise NotImplementedError("UnknownPacket does not have a to_bytes method.")
 
 
 class MessagePacketBase(BidirectionalPacket):
+    """
+    A packet carrying a string, which is sized by a uint32 and followed by CRLF.
+    """
+
+    SIZE_LAYOUT = format_struct(Format.UINT_32)
+
     def __repr__(self) -> str:
         return _stringify_self(self)
 
@@ -164,6 +219,24 @@ class MessagePacketBase(BidirectionalPacket):
 
         return cls(msg=msg)
 
+    @classmethod
+    def _decode(cls, buffer: ReadableBuffer, offset: int) -> DecodeResult:
+        start = offset + cls.SIZE_LAYOUT.size
+        if start > len(buffer):
+            return None
+
+        (size,) = cls.SIZE_LAYOUT.unpack_from(buffer, offset)
+
+        end = start + size + len(CRLF)
+        if end > len(buffer):
+            return None
+
+        crlf = bytes(buffer[end - len(CRLF) : end])
+        if crlf != CRLF:
+            raise ValueError(f"CRLF misaligned. Was actually: {bytes_to_hexstr(crlf)}")
+
+        return (cls(msg=bytes(buffer[start : end - len(CRLF)]).decode("ascii")), end)
+
     def to_bytes(self) -> bytes:
         bytes_ = b""
 
@@ -190,15 +263,11 @@ class PingPongBasePacket(BidirectionalPacket):
     def __repr__(self) -> str:
         return _stringify_self(self)
 
+    layout = format_struct(Format.UINT_32)
+
     def __init__(self, timestamp: int) -> None:
         self.timestamp = timestamp
 
-    @classmethod
-    def _read(cls, serial: Serial) -> PingPongBasePacket:
-        timestamp = unpack(Format.UINT_32, serial)
-
-        return cls(timestamp=timestamp)
-
     def to_bytes(self) -> bytes:
         bytes_ = b""
 
@@ -248,17 +317,12 @@ class SetPositionPacket(SetQuantityPacket):
 class GetPositionPacket(InboundPacket):
     id_ = byte(0x58)  # X
 
+    layout = format_struct(Format.INT_32, Format.FLOAT_32)
+
     def __init__(self, value_steps: int, value_mm: float) -> None:
         self.value_steps = value_steps
         self.value_mm = value_mm
 
-    @classmethod
-    def _read(cls, serial: Serial) -> GetPositionPacket:
-        value_steps = unpack(Format.INT_32, serial)
-        value_mm = unpack(Format.FLOAT_32, serial)
-
-        return cls(value_steps=value_steps, value_mm=value_mm)
-
 
 class SetVelocityPacket(SetQuantityPacket):
     id_ = byte(0x76)  # v
@@ -320,6 +384,8 @@ class DoJigglePacket(OnlyIDPacket):
 class ObservationPacket(InboundPacket):
     id_ = byte(0x40)  # @
 
+    layout = format_struct(Format.UINT_32, Format.UINT_8, Format.INT_32, Format.FLOAT_32)
+
     def __init__(
         self, timestamp_micros: int, cart_id: CartID, position_steps: int, angle: float
     ) -> None:
@@ -329,32 +395,125 @@ class ObservationPacket(InboundPacket):
         self.angle = angle
 
     @classmethod
-    def _read(cls, serial: Serial) -> ObservationPacket:
-        timestamp_micros = unpack(Format.UINT_32, serial)
-        cart_id = CartID(unpack(Format.UINT_8, serial))
-        position_steps = unpack(Format.INT_32, serial)
-        angle = unpack(Format.FLOAT_32, serial)
-
+    def _from_fields(  # type: ignore[override]
+        cls, timestamp_micros: int, cart_id: int, position_steps: int, angle: float
+    ) -> ObservationPacket:
         return cls(
             timestamp_micros=timestamp_micros,
-            cart_id=cart_id,
+            cart_id=CartID(cart_id),
             position_steps=position_steps,
             angle=angle,
         )
 
 
+# The frame of an ObservationPacket, including its ID
+OBSERVATION_DTYPE = np.dtype(
+    [
+        ("id", "S1"),
+        ("timestamp_micros", "<u4"),
+        ("cart_id", "u1"),
+        ("position_steps", "<i4"),
+        ("angle", "<f4"),
+    ]
+)
+assert OBSERVATION_DTYPE.itemsize == len(ObservationPacket.id_) + ObservationPacket.layout.size
+
+
+class ObservationBatchPacket(InboundPacket):
+    """
+    Consecutive ObservationPackets decoded at once into a structured array of `OBSERVATION_DTYPE`.
+
+    It is never sent, so it has no ID of its own.
+    """
+
+    CART_IDS = np.array([cart_id.value for cart_id in CartID], dtype=OBSERVATION_DTYPE["cart_id"])
+
+    def __init__(self, observations: npt.NDArray[np.void]) -> None:
+        self.observations = observations
+
+    def __len__(self) -> int:
+        return len(self.observations)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}: {len(self)} observations>"
+
+    @classmethod
+    def from_buffer(cls, buffer: ReadableBuffer, offset: int, count: int) -> ObservationBatchPacket:
+        """
+        Decodes `count` observation frames starting with the ID at `offset` in `buffer`.
+
+        Stops before the first frame with an invalid cart ID, like ObservationPacket would
+        fail on it, so the batch may be shorter. Raises PacketReadError if the first is invalid.
+        """
+        # Copied, so the buffer can be resized afterwards
+        observations = np.frombuffer(
+            buffer, dtype=OBSERVATION_DTYPE, count=count, offset=offset
+        ).copy()
+
+        invalid = ~np.isin(observations["cart_id"], cls.CART_IDS)
+        if invalid.any():
+            first_invalid = int(invalid.argmax())
+
+            if first_invalid == 0:
+                raise PacketReadError(
+                    "Malformed ObservationPacket",
+                    ObservationPacket.id_,
+                    reason=f"Got bad cart id: {observations['cart_id'][0]}",
+                )
+
+            observations = observations[:first_invalid]
+
+        packet = cls(observations)
+        packet.read_time = dt.datetime.now()
+
+        return packet
+
+    @classmethod
+    def _read(cls, serial: Serial) -> ObservationBatchPacket:
+        raise NotImplementedError("ObservationBatchPacket does not have a read method.")
+
+    @classmethod
+    def _decode(cls, buffer: ReadableBuffer, offset: int) -> DecodeResult:
+        raise NotImplementedError("ObservationBatchPacket does not have a decode method.")
+
+    @property
+    def cart_ids(self) -> list[CartID]:
+        return [CartID(cart_id) for cart_id in np.unique(self.observations["cart_id"])]
+
+    def for_cart(self, cart_id: CartID) -> ObservationBatchPacket:
+        """
+        The observations of a single cart.
+        """
+        packet = type(self)(self.observations[self.observations["cart_id"] == cart_id])
+        packet.read_time = self.read_time
+
+        return packet
+
+    def to_packets(self) -> list[ObservationPacket]:
+        packets = [
+            ObservationPacket(
+                timestamp_micros=timestamp_micros,
+                cart_id=CartID(cart_id),
+                position_steps=position_steps,
+                angle=angle,
+            )
+            for _, timestamp_micros, cart_id, position_steps, angle in self.observations.tolist()
+        ]
+
+        for packet in packets:
+            packet.read_time = self.read_time
+
+        return packets
+
+
 class ExperimentStartPacket(BidirectionalPacket):
     id_ = byte(0x02)  # STX (start-of-text)
 
+    layout = format_struct(Format.UINT_32)
+
     def __init__(self, timestamp_micros: int):
         self.timestamp_micros = timestamp_micros
 
-    @classmethod
-    def _read(cls, serial: Serial) -> ExperimentStartPacket:
-        timestamp_micros = unpack(Format.UINT_32, serial)
-
-        return cls(timestamp_micros=timestamp_micros)
-
     def to_bytes(self) -> bytes:
         bytes = b""
 
@@ -371,15 +530,16 @@ class ExperimentStopPacket(OnlyIDPacket):
 class ExperimentDonePacket(BidirectionalPacket):
     id_ = byte(0x04)  # EOT (end-of-transmission)
 
+    layout = format_struct(Format.UINT_8, Format.INT_8)
+
     def __init__(self, cart_id: int, failure_mode: FailureMode) -> None:
         self.cart_id = cart_id
         self.failure_mode = failure_mode
 
     @classmethod
-    def _read(cls, serial: Serial) -> ExperimentDonePacket:
-        cart_id = unpack(Format.UINT_8, serial)
-
-        failure_mode_raw = unpack(Format.INT_8, serial)
+    def _from_fields(  # type: ignore[override]
+        cls, cart_id: int, failure_mode_raw: int
+    ) -> ExperimentDonePacket:
         failure_mode: FailureMode
         try:
             failure_mode = FailureMode(failure_mode_raw)
@@ -388,7 +548,6 @@ class ExperimentDonePacket(BidirectionalPacket):
                 "Malformed ExperimentDonePacket",
                 cls.id_,
                 reason=f"Got bad failure mode: {failure_mode_raw}",
-                dump_buf=serial,
             ) from exc
 
         return cls(cart_id=cart_id, failure_mode=failure_mode)
@@ -407,8 +566,17 @@ ExperimentInfoValueT = Union[UnpackableT, FailureMode]
 
 
 class ExperimentInfoPacket(InboundPacket):
+    """
+    A packet whose value has a format depending on its specifier.
+    """
+
     id_ = byte(0x3A)  # :
 
+    HEADER_LAYOUT = format_struct(Format.UINT_8, Format.UINT_8)
+    VALUE_LAYOUTS: dict[ExperimentInfoSpecifier, struct.Struct] = {
+        specifier: format_struct(fmt) for specifier, fmt in SPECIFIER_TO_FORMAT.items()
+    }
+
     def __init__(
         self, specifier: ExperimentInfoSpecifier, cart_id: CartID, value: ExperimentInfoValueT
     ) -> None:
@@ -444,6 +612,46 @@ class ExperimentInfoPacket(InboundPacket):
 
         value: ExperimentInfoValueT = unpack(SPECIFIER_TO_FORMAT[specifier], serial)
 
+        return cls._from_header(specifier, cart_id, value)
+
+    @classmethod
+    def _decode(cls, buffer: ReadableBuffer, offset: int) -> DecodeResult:
+        start = offset + cls.HEADER_LAYOUT.size
+        if start > len(buffer):
+            return None
+
+        specifier_raw, cart_id_raw = cls.HEADER_LAYOUT.unpack_from(buffer, offset)
+
+        try:
+            specifier = ExperimentInfoSpecifier(specifier_raw)
+        except ValueError as exc:
+            raise PacketReadError(
+                "Malformed ExperimentInfoPacket", cls.id_, f"Got bad specifier: {specifier_raw}"
+            ) from exc
+
+        try:
+            cart_id = CartID(cart_id_raw)
+        except ValueError as exc:
+            raise PacketReadError(
+                "Malformed ExperimentInfoPacket", cls.id_, f"Got bad cart id: {cart_id_raw}"
+            ) from exc
+
+        value_layout = cls.VALUE_LAYOUTS[specifier]
+
+        end = start + value_layout.size
+        if end > len(buffer):
+            return None
+
+        value: ExperimentInfoValueT = None
+        if value_layout.size:
+            (value,) = value_layout.unpack_from(buffer, start)
+
+        return (cls._from_header(specifier, cart_id, value), end)
+
+    @classmethod
+    def _from_header(
+        cls, specifier: ExperimentInfoSpecifier, cart_id: CartID, value: ExperimentInfoValueT
+    ) -> ExperimentInfoPacket:
         # Special case:
         if specifier == ExperimentInfoSpecifier.FAILURE_MODE:
             assert isinstance(value, int)
@@ -460,7 +668,7 @@ class RequestPacketRealignmentPacket(OnlyIDPacket):
     id_ = byte(0x5E)  # ^
 
 
-CartSpecificPacket = Union[ObservationPacket, ExperimentInfoPacket]
+CartSpecificPacket = Union[ObservationPacket, ObservationBatchPacket, ExperimentInfoPacket]
 
 
 def is_valid_packet(cls: Type[object]) -> TypeGuard[Type[Packet]]:
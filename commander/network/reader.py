@@ -0,0 +1,201 @@
+"""
+Contains a reader draining the serial port on a background thread.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import deque
+from threading import Event, Thread
+from typing import TYPE_CHECKING, Deque, Optional, Type, TypedDict
+
+from commander.network.protocol import ObservationBatchPacket, ObservationPacket, Packet
+
+if TYPE_CHECKING:
+    from commander.network.network import NetworkManager
+
+logger = logging.getLogger(__name__)
+
+
+class ReaderStats(TypedDict):
+    reads: int
+    bytes_read: int
+    packets_read: int
+    packets_dropped: int  # Oldest observations dropped as the queue was full
+    max_read_size: int  # bytes, how far the controller got ahead of the reader
+    max_queue_depth: int  # packets, how far the consumer got behind the reader
+
+
+class SerialReader:
+    """
+    Continuously reads the serial port of a NetworkManager on a background thread,
+    so the controller's buffer is drained even while the consumer is busy.
+
+    The thread blocks on the port with the GIL released and parses what it reads with the
+    buffered parser of the NetworkManager, realigning packets if needed. Decoded packets
+    are handed over through a deque, which is appended to and popped from atomically.
+
+    The queue holds at most `queue_size` packets. When full, the oldest observations are
+    dropped. Other packets are never dropped, as they may be waited for, so the queue
+    grows beyond its size if it holds nothing else.
+    """
+
+    WAIT_TIMEOUT: float = 0.1  # s
+
+    DROPPABLE_PACKETS: tuple[Type[Packet], ...] = (ObservationPacket, ObservationBatchPacket)
+
+    def __init__(self, network_manager: NetworkManager, queue_size: int = 4096) -> None:
+        if queue_size < 1:
+            raise ValueError(f"queue_size has to be at least 1, got {queue_size}")
+
+        self.network_manager = network_manager
+        self.queue_size = queue_size
+
+        self._queue: Deque[Packet] = deque()
+        self._available = Event()
+        self._stopping = False
+        self._thread: Optional[Thread] = None
+
+        self.error: Optional[BaseException] = None
+
+        self._stats: ReaderStats = {
+            "reads": 0,
+            "bytes_read": 0,
+            "packets_read": 0,
+            "packets_dropped": 0,
+            "max_read_size": 0,
+            "max_queue_depth": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def stats(self) -> ReaderStats:
+        return self._stats.copy()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            raise RuntimeError("Reader has already been started.")
+
+        self._thread = Thread(target=self._run, name="serial-reader", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """
+        Stops the thread, raising RuntimeError if it is still running after `timeout`.
+        """
+        if self._thread is None:
+            return
+
+        self._stopping = True
+        self.network_manager.serial.cancel_read()
+        self._thread.join(timeout)
+
+        if self._thread.is_alive():
+            raise RuntimeError(f"Serial reader did not stop within {timeout} s")
+
+    def _run(self) -> None:
+        serial = self.network_manager.serial
+        parser = self.network_manager.parser
+        stats = self._stats
+
+        try:
+            while not self._stopping:
+                # Blocks for at least a byte, or until cancelled
+                data = serial.read(max(serial.in_waiting, 1))
+                if not data:
+                    continue
+
+                stats["reads"] += 1
+                stats["bytes_read"] += len(data)
+                stats["max_read_size"] = max(stats["max_read_size"], len(data))
+
+                parser.feed(data)
+                self._push(self.network_manager.parse_packets(auto_realign=True))
+
+        except BaseException as exc:
+            if not self._stopping:
+                logger.exception("Serial reader failed")
+                self.error = exc
+
+        finally:
+            # Wakes up a waiting consumer, who will find the reader stopped
+            self._available.set()
+
+    def _push(self, packets: list[Packet]) -> None:
+        if not packets:
+            return
+
+        stats = self._stats
+        stats["packets_read"] += len(packets)
+
+        for packet in packets:
+            if len(self._queue) >= self.queue_size:
+                if self._drop_oldest_observation():
+                    stats["packets_dropped"] += 1
+                elif isinstance(packet, self.DROPPABLE_PACKETS):
+                    stats["packets_dropped"] += 1
+                    continue
+
+            self._queue.append(packet)
+
+        stats["max_queue_depth"] = max(stats["max_queue_depth"], len(self._queue))
+
+        self._available.set()
+
+    def _drop_oldest_observation(self) -> bool:
+        # Copied at once, as the consumer may pop meanwhile
+        for packet in list(self._queue):
+            if isinstance(packet, self.DROPPABLE_PACKETS):
+                break
+        else:
+            return False
+
+        try:
+            # By identity, as packets do not define equality
+            self._queue.remove(packet)
+        except ValueError:  # Popped by the consumer meanwhile, which freed up space
+            pass
+
+        return True
+
+    def pop_all(self) -> list[Packet]:
+        """
+        Pops all packets queued so far, regardless of the state of the reader.
+        """
+        packets: list[Packet] = []
+
+        # Only what is queued now, as the reader may keep pushing
+        for _ in range(len(self._queue)):
+            try:
+                packets.append(self._queue.popleft())
+            except IndexError:  # Dropped by the reader meanwhile
+                break
+
+        return packets
+
+    def drain(self, block: bool = False) -> list[Packet]:
+        """
+        Pops all packets queued so far, waiting for at least one if `block`.
+
+        Raises ConnectionError if the reader has stopped because of an error.
+        """
+        if block:
+            # Cleared before checking, so a packet pushed in between still wakes us up
+            while not self._queue and self.error is None and self.running:
+                self._available.clear()
+
+                if not self._queue:
+                    # Timed, in case the thread stops between checking and waiting
+                    self._available.wait(self.WAIT_TIMEOUT)
+
+        if self.error is not None:
+            raise ConnectionError("Serial reader stopped") from self.error
+
+        return self.pop_all()
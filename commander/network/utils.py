@@ -43,6 +43,8 @@ class Format(str, Enum):
     ASCII_CHAR = "A"  # home-made
 
 
+ReadableBuffer = Union[bytes, bytearray, memoryview]
+
 PackableT = Union[str, int, float, bytes, None]
 UnpackableT = PackableT
 
@@ -147,6 +149,15 @@ def unpack(fmt: Formats, serial: Serial) -> UnpackableT:
     return cast(UnpackableT, struct.unpack(fmt_str, buf)[0])
 
 
+def format_struct(*fmts: Format) -> struct.Struct:
+    """
+    Compiles a sequence of fixed-size formats into a single little-endian struct.
+    """
+    fmt_str = "".join(fmt.value.removeprefix(ENDIANNESS) for fmt in fmts if fmt is not Format.NUL)
+
+    return struct.Struct(ENDIANNESS + fmt_str)
+
+
 def pack(fmt: Union[Format, str], obj: PackableT) -> bytes:
     if fmt is Format.NUL:
         return b""
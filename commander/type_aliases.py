@@ -3,6 +3,7 @@ Contains related type aliases.
 """
 from __future__ import annotations
 
+from collections.abc import MutableMapping
 from typing import Any
 
 import numpy.typing as npt
@@ -17,7 +18,7 @@ ExternalState = npt.NDArray[FLOAT_TYPE]
 
 StateChecks = dict[FailureDescriptors, bool]
 
-StepInfo = dict[str, Any]
+StepInfo = MutableMapping[str, Any]  # See `LazyStepInfo`
 StepReturn = tuple[
     dict[AgentNameT, ExternalState],  # Observations
     dict[AgentNameT, float],  # Rewards
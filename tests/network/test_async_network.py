@@ -0,0 +1,254 @@
+"""
+Tests `AsyncNetworkManager` against a controller stood in for by a pseudo-terminal.
+
+The manager opens the terminal end of the pty as its serial port, whereas the tests
+write the bytes of the controller to, and read its requests from, the other end.
+"""
+
+import asyncio
+import os
+import struct
+import time
+import tty
+from collections.abc import Coroutine, Iterator
+from typing import Any
+
+import pytest
+
+from commander.network.async_network import AsyncNetworkManager
+from commander.network.protocol import (
+    FindLimitsPacket,
+    InfoPacket,
+    MessagePacketBase,
+    NullPacket,
+    ObservationBatchPacket,
+    ObservationPacket,
+    PongPacket,
+    RequestPacketRealignmentPacket,
+)
+from commander.network.selectors import message_startswith
+
+
+class PtyController:
+    """
+    The controller end of a pseudo-terminal.
+    """
+
+    def __init__(self) -> None:
+        self.fd, self._terminal_fd = os.openpty()
+
+        tty.setraw(self.fd)
+        tty.setraw(self._terminal_fd)
+        os.set_blocking(self.fd, False)
+
+        self.port = os.ttyname(self._terminal_fd)
+
+    def write(self, data: bytes) -> None:
+        os.write(self.fd, data)
+
+    async def read(self, timeout: float = 1.0) -> bytes:
+        deadline = time.monotonic() + timeout
+
+        while True:
+            try:
+                return os.read(self.fd, 1024)
+            except BlockingIOError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Nothing was sent to the controller.")
+
+                await asyncio.sleep(0.001)
+
+    def hang_up(self) -> None:
+        """
+        Closes the controller end, after which reading the port fails.
+        """
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def close(self) -> None:
+        self.hang_up()
+        os.close(self._terminal_fd)
+
+
+@pytest.fixture
+def controller() -> Iterator[PtyController]:
+    controller = PtyController()
+
+    yield controller
+
+    controller.close()
+
+
+def run(coroutine: Coroutine[Any, Any, None]) -> None:
+    asyncio.run(asyncio.wait_for(coroutine, timeout=10))
+
+
+def observation_bytes(timestamp: int) -> bytes:
+    return ObservationPacket.id_ + struct.pack("<IBif", timestamp, 1, timestamp, 0.0)
+
+
+def test_initial_output_is_skipped(controller: PtyController) -> None:
+    async def test() -> None:
+        async with AsyncNetworkManager(port=controller.port) as network_manager:
+            controller.write(
+                b"boot noise"
+                + AsyncNetworkManager.INITIAL_OUTPUT_STOP_MARKER
+                + PongPacket(timestamp=1).to_bytes()
+            )
+
+            initial_output = await network_manager.read_initial_output(print_=False)
+            assert initial_output.startswith("boot noise")
+
+            pong = await network_manager.get_packet(PongPacket, timeout=1)
+            assert pong.timestamp == 1
+
+    run(test())
+
+
+def test_get_packet_times_out_and_removes_its_waiter(controller: PtyController) -> None:
+    async def test() -> None:
+        async with AsyncNetworkManager(port=controller.port) as network_manager:
+            with pytest.raises(asyncio.TimeoutError):
+                await network_manager.get_packet(FindLimitsPacket, timeout=0.1)
+
+            assert not any(network_manager._waiters.values())
+
+            # Arriving later, it is buffered rather than given to the timed out waiter
+            controller.write(FindLimitsPacket().to_bytes())
+            await network_manager.get_packet(FindLimitsPacket, timeout=1)
+
+    run(test())
+
+
+def test_packets_go_to_the_oldest_matching_waiter_across_types(
+    controller: PtyController,
+) -> None:
+    async def test() -> None:
+        async with AsyncNetworkManager(port=controller.port) as network_manager:
+            any_message = asyncio.create_task(network_manager.get_packet(MessagePacketBase))
+            info = asyncio.create_task(network_manager.get_packet(InfoPacket))
+            info_b = asyncio.create_task(
+                network_manager.get_packet(InfoPacket, message_startswith("B"))
+            )
+            await asyncio.sleep(0.01)
+
+            controller.write(
+                InfoPacket("B1").to_bytes()
+                + InfoPacket("A1").to_bytes()
+                + InfoPacket("B2").to_bytes()
+            )
+
+            assert (await any_message).msg == "B1"
+            assert (await info).msg == "A1"
+            assert (await info_b).msg == "B2"
+
+            assert len(network_manager.packet_buffer) == 0
+
+    run(test())
+
+
+def test_subscription_yields_buffered_and_new_packets(controller: PtyController) -> None:
+    async def test() -> None:
+        network_manager = AsyncNetworkManager(port=controller.port, batch_observations=True)
+
+        async with network_manager:
+            controller.write(PongPacket(timestamp=1).to_bytes())
+            await network_manager.get_packet(PongPacket, timeout=1)
+
+            controller.write(observation_bytes(0))
+            await asyncio.sleep(0.05)
+
+            timestamps: list[int] = []
+            subscription = network_manager.subscribe(ObservationBatchPacket)
+
+            for timestamp in range(1, 100):
+                controller.write(observation_bytes(timestamp))
+
+            async for batch in subscription:
+                timestamps.extend(int(t) for t in batch.observations["timestamp_micros"])
+
+                if len(timestamps) >= 100:
+                    break
+
+            await subscription.aclose()
+
+            assert timestamps == list(range(100))
+            assert not network_manager._subscriptions
+
+            # Buffered again once nothing is subscribed
+            controller.write(observation_bytes(100))
+            await network_manager.get_packet(ObservationBatchPacket, timeout=1)
+
+    run(test())
+
+
+def test_malformed_packet_is_realigned(controller: PtyController) -> None:
+    async def test() -> None:
+        async with AsyncNetworkManager(port=controller.port) as network_manager:
+            controller.write(b"\xff\x00")
+
+            assert isinstance(await network_manager.get_packet(timeout=1), NullPacket)
+            assert await controller.read() == RequestPacketRealignmentPacket().to_bytes()
+
+            # The sequence may arrive in pieces, and whatever comes before it is skipped
+            sequence = AsyncNetworkManager.PACKET_REALIGNMENT_SEQUENCE
+            controller.write(PongPacket(timestamp=1).to_bytes() + sequence[:3])
+            await asyncio.sleep(0.05)
+            controller.write(sequence[3:] + PongPacket(timestamp=2).to_bytes())
+
+            pong = await network_manager.get_packet(PongPacket, timeout=1)
+            assert pong.timestamp == 2
+            assert len(network_manager.packet_buffer) == 0
+
+    run(test())
+
+
+def test_connection_lost_fails_waiters_and_ends_subscriptions(
+    controller: PtyController,
+) -> None:
+    async def test() -> None:
+        async with AsyncNetworkManager(port=controller.port) as network_manager:
+
+            async def consume() -> int:
+                count = 0
+                async for _ in network_manager.subscribe(InfoPacket):
+                    count += 1
+
+                return count
+
+            waiter = asyncio.create_task(network_manager.get_packet(PongPacket))
+            subscription = asyncio.create_task(consume())
+
+            controller.write(InfoPacket("A").to_bytes())
+            await asyncio.sleep(0.05)
+
+            controller.hang_up()
+
+            with pytest.raises(ConnectionError):
+                await waiter
+
+            assert await subscription == 1
+            assert network_manager.transport is not None
+            assert network_manager.transport.is_closing()
+
+            with pytest.raises(ConnectionError):
+                await network_manager.get_packet(PongPacket)
+
+    run(test())
+
+
+def test_close_fails_waiters(controller: PtyController) -> None:
+    async def test() -> None:
+        network_manager = AsyncNetworkManager(port=controller.port)
+        network_manager.open()
+
+        waiter = asyncio.create_task(network_manager.get_packet(PongPacket))
+        await asyncio.sleep(0.01)
+
+        network_manager.close()
+
+        with pytest.raises(ConnectionError):
+            await waiter
+
+    run(test())